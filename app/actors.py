@@ -0,0 +1,109 @@
+"""Per-user session actors: one ordered mailbox per active uid"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from app.config import ACTOR_MAILBOX_SIZE, ACTOR_IDLE_TIMEOUT
+
+
+# Message that makes an actor shut down once everything queued before it is processed
+RETIRE = object()
+
+
+class MailboxFull(Exception):
+    """Raised when a user's mailbox already holds the maximum number of pending messages"""
+
+
+class SessionActor:
+    """Processes one user's messages strictly in arrival order"""
+
+    def __init__(self, uid: str, registry: "ActorRegistry"):
+        self.uid = uid
+        self.registry = registry
+        self.mailbox: asyncio.Queue = asyncio.Queue(registry.mailbox_size)
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            try:
+                message, future = await asyncio.wait_for(
+                    self.mailbox.get(), self.registry.idle_timeout
+                )
+            except asyncio.TimeoutError:
+                # No await between this check and the removal, so no message can slip in
+                if self.mailbox.empty():
+                    self.registry.remove(self)
+                    return
+                continue
+
+            if message is RETIRE:
+                self.registry.remove(self)
+                future.set_result(None)
+                return
+
+            # Keep processing even if the caller went away so the session stays consistent
+            try:
+                result = await self.registry.handler(self.uid, message)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+
+class ActorRegistry:
+    """Routes messages to per-uid actors, creating them on demand and tearing them down when idle"""
+
+    def __init__(self, handler: Callable[[str, Any], Awaitable[Any]],
+                 mailbox_size: int = ACTOR_MAILBOX_SIZE, idle_timeout: float = ACTOR_IDLE_TIMEOUT):
+        self.handler = handler
+        self.mailbox_size = mailbox_size
+        self.idle_timeout = idle_timeout
+        self.actors: Dict[str, SessionActor] = {}
+
+    async def submit(self, uid: str, message: Any, wait: bool = False) -> Any:
+        """
+        Queue a message for the user's actor and wait for its result.
+        A full mailbox raises MailboxFull, or with `wait` (internal messages that must not be
+        dropped) is waited on.
+        """
+        actor = self.actors.get(uid)
+        if actor is None or actor.task.done():
+            actor = SessionActor(uid, self)
+            self.actors[uid] = actor
+
+        future = asyncio.get_running_loop().create_future()
+        if wait:
+            await actor.mailbox.put((message, future))
+        else:
+            try:
+                actor.mailbox.put_nowait((message, future))
+            except asyncio.QueueFull:
+                raise MailboxFull(f"Too many pending transcript batches for user {uid}")
+        return await future
+
+    async def retire(self, uid: str):
+        """Let the user's actor finish its queued messages, then shut it down"""
+        actor = self.actors.get(uid)
+        if actor is None or actor.task.done():
+            return
+        future = asyncio.get_running_loop().create_future()
+        await actor.mailbox.put((RETIRE, future))
+        await future
+
+    def remove(self, actor: SessionActor):
+        """Forget an actor that has shut down"""
+        if self.actors.get(actor.uid) is actor:
+            del self.actors[actor.uid]
+
+    async def stop(self):
+        """Cancel every actor task"""
+        actors = list(self.actors.values())
+        self.actors.clear()
+        for actor in actors:
+            actor.task.cancel()
+        await asyncio.gather(*(actor.task for actor in actors), return_exceptions=True)
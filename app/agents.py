@@ -0,0 +1,168 @@
+"""Durable uid -> Letta agent registry with single-flight agent creation"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.config import DB_PATH, LETTA_AGENT_CACHE_SIZE, LETTA_AGENT_CLAIM_TIMEOUT
+from app.database import get_connection
+
+# Seconds between checks while another process is creating the agent
+CLAIM_POLL_INTERVAL = 0.2
+
+
+class AgentRegistry:
+    """
+    Maps each user to one Letta agent for good. Lookups go through an in-memory LRU, then the
+    letta_agents table, so restarts and other workers reuse the agent (and its memory).
+
+    Creation is single-flight at two levels: concurrent callers in this process wait on the
+    one in-flight creation, and across processes a claim row (agent_id NULL) makes other
+    workers wait for the claimant. A claim older than `claim_timeout` seconds is taken over,
+    so a worker that died mid-creation does not block the user forever.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, cache_size: int = LETTA_AGENT_CACHE_SIZE,
+                 claim_timeout: float = LETTA_AGENT_CLAIM_TIMEOUT):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.claim_timeout = claim_timeout
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()  # guards the LRU and the in-flight maps
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._inflight_threads: Dict[str, threading.Event] = {}
+        self._initialized = False
+
+    def _connect(self):
+        conn = get_connection(self.db_path)
+        if not self._initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS letta_agents (
+                    uid TEXT PRIMARY KEY,
+                    agent_id TEXT,
+                    claimed_at REAL NOT NULL,
+                    created_at REAL
+                )
+            """)
+            self._initialized = True
+        return conn
+
+    def _remember(self, uid: str, agent_id: str):
+        with self._lock:
+            self.cache[uid] = agent_id
+            self.cache.move_to_end(uid)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def lookup(self, uid: str) -> Optional[str]:
+        """The user's agent id from the LRU or the database, or None if it has none yet"""
+        with self._lock:
+            agent_id = self.cache.get(uid)
+            if agent_id is not None:
+                self.cache.move_to_end(uid)
+                return agent_id
+        row = self._connect().execute(
+            "SELECT agent_id FROM letta_agents WHERE uid = ? AND agent_id IS NOT NULL", (uid,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._remember(uid, row[0])
+        return row[0]
+
+    def try_claim(self, uid: str) -> bool:
+        """Take the right to create the user's agent; False while another process holds it"""
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO letta_agents (uid, agent_id, claimed_at) VALUES (?, NULL, ?)", (uid, now)
+        )
+        if cursor.rowcount == 1:
+            return True
+        cursor = conn.execute(
+            "UPDATE letta_agents SET claimed_at = ? WHERE uid = ? AND agent_id IS NULL AND claimed_at < ?",
+            (now, uid, now - self.claim_timeout)
+        )
+        return cursor.rowcount == 1
+
+    def record(self, uid: str, agent_id: str):
+        """Store the agent created under our claim"""
+        self._connect().execute(
+            "UPDATE letta_agents SET agent_id = ?, created_at = ? WHERE uid = ?", (agent_id, time.time(), uid)
+        )
+        self._remember(uid, agent_id)
+
+    def release(self, uid: str):
+        """Drop our claim after a failed creation so the next caller can retry"""
+        self._connect().execute("DELETE FROM letta_agents WHERE uid = ? AND agent_id IS NULL", (uid,))
+
+    async def get_or_create(self, uid: str, create: Callable[[], Awaitable[str]]) -> str:
+        """
+        The user's agent id, calling `create` at most once across concurrent callers.
+        The SQLite work runs in worker threads: a contended claim must not stall the event loop.
+        """
+        agent_id = await asyncio.to_thread(self.lookup, uid)
+        if agent_id is not None:
+            return agent_id
+
+        future = self._inflight.get(uid)
+        if future is not None:
+            agent_id = await asyncio.shield(future)
+            if agent_id is None:
+                raise RuntimeError(f"Letta agent creation for {uid} failed")
+            return agent_id
+
+        future = self._inflight[uid] = asyncio.get_running_loop().create_future()
+        agent_id = None
+        try:
+            while agent_id is None:
+                if await asyncio.to_thread(self.try_claim, uid):
+                    try:
+                        agent_id = await create()
+                    except BaseException:
+                        await asyncio.to_thread(self.release, uid)
+                        raise
+                    await asyncio.to_thread(self.record, uid, agent_id)
+                else:
+                    await asyncio.sleep(CLAIM_POLL_INTERVAL)
+                    agent_id = await asyncio.to_thread(self.lookup, uid)
+            return agent_id
+        finally:
+            del self._inflight[uid]
+            future.set_result(agent_id)
+
+    def get_or_create_sync(self, uid: str, create: Callable[[], str]) -> str:
+        """Blocking get_or_create for the threadpool LettaService"""
+        agent_id = self.lookup(uid)
+        if agent_id is not None:
+            return agent_id
+
+        with self._lock:
+            done = self._inflight_threads.get(uid)
+            leader = done is None
+            if leader:
+                done = self._inflight_threads[uid] = threading.Event()
+        if not leader:
+            done.wait()
+            agent_id = self.lookup(uid)
+            if agent_id is None:
+                raise RuntimeError(f"Letta agent creation for {uid} failed")
+            return agent_id
+
+        try:
+            while agent_id is None:
+                if self.try_claim(uid):
+                    try:
+                        agent_id = create()
+                    except BaseException:
+                        self.release(uid)
+                        raise
+                    self.record(uid, agent_id)
+                else:
+                    time.sleep(CLAIM_POLL_INTERVAL)
+                    agent_id = self.lookup(uid)
+            return agent_id
+        finally:
+            with self._lock:
+                del self._inflight_threads[uid]
+            done.set()
@@ -0,0 +1,112 @@
+"""Incremental parsing of the streamed analyze_date tool call, and its output counters"""
+import json
+import re
+import threading
+from typing import Dict, Optional
+
+from app.context import estimate_tokens
+
+# should_notify is the first tool input field, so its value is usually known after a few tokens
+SHOULD_NOTIFY_PATTERN = re.compile(r'"should_notify"\s*:\s*(true|false)')
+
+
+class AnalysisParseError(ValueError):
+    """The streamed tool input was not a complete, valid analysis"""
+
+
+class AnalysisStreamParser:
+    """
+    Consumes raw Messages API stream events of a forced report_analysis tool call.
+
+    feed() returns True once the rest of the stream is not needed: as soon as should_notify is
+    seen to be false (the caller closes the stream there), or at message_stop. result() then
+    gives the analysis dict, raising AnalysisParseError for missing or malformed tool input.
+    """
+
+    def __init__(self):
+        self.message = None  # the message_start snapshot, carrying the prompt usage
+        self.partial_json = ""
+        self.should_notify: Optional[bool] = None
+        self.stop_reason: Optional[str] = None
+        self.output_tokens: Optional[int] = None  # reported by the API when the stream completes
+        self.stopped_early = False
+        self.tool_seen = False
+
+    def feed(self, event) -> bool:
+        kind = event.type
+        if kind == "message_start":
+            self.message = event.message
+        elif kind == "content_block_start":
+            self.tool_seen = self.tool_seen or event.content_block.type == "tool_use"
+        elif kind == "content_block_delta" and event.delta.type == "input_json_delta":
+            self.partial_json += event.delta.partial_json
+            if self.should_notify is None:
+                match = SHOULD_NOTIFY_PATTERN.search(self.partial_json)
+                if match:
+                    self.should_notify = match.group(1) == "true"
+                    if not self.should_notify:
+                        self.stopped_early = True
+                        return True
+        elif kind == "message_delta":
+            self.stop_reason = event.delta.stop_reason
+            self.output_tokens = event.usage.output_tokens
+        elif kind == "message_stop":
+            return True
+        return False
+
+    def result(self) -> Dict:
+        if self.stopped_early:
+            return {"should_notify": False}
+        if not self.tool_seen:
+            raise AnalysisParseError(f"no tool call in response (stop reason {self.stop_reason})")
+        try:
+            result = json.loads(self.partial_json)
+        except json.JSONDecodeError as e:
+            raise AnalysisParseError(f"invalid tool input (stop reason {self.stop_reason}): {e}") from e
+        if not isinstance(result, dict) or not isinstance(result.get("should_notify"), bool):
+            raise AnalysisParseError(f"tool input without should_notify: {self.partial_json!r}")
+        return result
+
+    def generated_tokens(self) -> int:
+        """Output tokens of the call: API-reported, or estimated from what was read before stopping"""
+        if self.output_tokens is not None:
+            return self.output_tokens
+        return estimate_tokens(self.partial_json)
+
+
+class AnalysisStats:
+    """Counters over analyze_date calls: early stops, parse and API failures, output tokens"""
+
+    def __init__(self):
+        self.calls = 0
+        self.early_stops = 0
+        self.parse_failures = 0
+        self.api_errors = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()  # the blocking service runs calls on several threads
+
+    def record(self, parser: AnalysisStreamParser, parse_failed: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.early_stops += parser.stopped_early
+            self.parse_failures += parse_failed
+            self.output_tokens += parser.generated_tokens()
+
+    def record_api_error(self):
+        with self._lock:
+            self.calls += 1
+            self.api_errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls, early_stops, parse_failures = self.calls, self.early_stops, self.parse_failures
+            api_errors, output_tokens = self.api_errors, self.output_tokens
+        answered = calls - api_errors
+        return {
+            "calls": calls,
+            "early_stops": early_stops,
+            "parse_failures": parse_failures,
+            "api_errors": api_errors,
+            "output_tokens": output_tokens,
+            "output_tokens_per_call": output_tokens / answered if answered else 0.0,
+        }
@@ -0,0 +1,220 @@
+"""
+Record/replay of external service calls, for profiling and benchmarks without the network.
+
+Recordings are taken at the service method level (ClaudeService.analyze_date and friends),
+not at the HTTP transport. A replayed call returns the recorded result after the recorded
+latency, so the code inside those methods does not run. That covers request building,
+streaming, incremental tool parsing and the cache and analysis stats. Replayed profiles show
+the app around the services, not the full pipeline.
+"""
+import asyncio
+import copy
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import CASSETTE_PATH, CASSETTE_LATENCY_SCALE, CASSETTE_STRICT
+
+logger = logging.getLogger(__name__)
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# Calls that reach the external service; other methods (prewarm, aclose) are no-ops on replay
+RECORDED_METHODS = {
+    "claude": ("analyze_date", "summarize_context", "generate_conversation_tip", "summarize_date"),
+    "letta": ("get_or_create_agent", "process_date_end"),
+    "omi": ("create_memory", "create_memories"),
+    "twilio": ("make_emergency_call",),
+}
+
+# Parts of a prompt that change between otherwise identical calls
+VOLATILE_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"), "<datetime>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:[ap]m)?\b", re.IGNORECASE), "<time>"),
+    (re.compile(r"\b1[5-9]\d{8}(?:\.\d+)?\b"), "<epoch>"),
+    (re.compile(r"\s+"), " "),
+]
+
+# Numbers this large are epoch timestamps (e.g. in warning records)
+EPOCH_FLOOR = 1e9
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a call (only raised with CASSETTE_STRICT)"""
+
+
+class Recording(NamedTuple):
+    key: str
+    service: str
+    method: str
+    latency: float  # seconds the live call took
+    response: Any
+
+
+def normalize(value: Any) -> Any:
+    """A JSON-able form of call arguments with timestamps, uuids and whitespace runs masked"""
+    if isinstance(value, str):
+        for pattern, replacement in VOLATILE_PATTERNS:
+            value = pattern.sub(replacement, value)
+        return value.strip()
+    if isinstance(value, float):
+        return "<epoch>" if value >= EPOCH_FLOOR else value
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+def call_key(service: str, method: str, args: Tuple, kwargs: Dict) -> str:
+    """Short digest of a call's normalized arguments"""
+    payload = json.dumps([service, method, normalize(list(args)), normalize(kwargs)],
+                         separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+class Cassette:
+    """
+    An append-only JSON Lines file of recorded calls, one compact line per call:
+    {"k": key, "s": service, "m": method, "t": seconds, "r": response}.
+
+    In record mode every call of a wrapped service goes to the live service and its result
+    and latency are appended. In replay mode calls are answered from the file: recordings
+    with the same key are handed out in recorded order (cycling), after sleeping the original
+    latency times `latency_scale`. A call with no matching key gets the next recording of the
+    same method instead, or raises CassetteMiss when `strict`.
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = RECORD,
+                 latency_scale: float = CASSETTE_LATENCY_SCALE, strict: bool = CASSETTE_STRICT):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"cassette mode must be {RECORD!r} or {REPLAY!r}, not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.by_key: Dict[str, List[Recording]] = defaultdict(list)
+        self.by_method: Dict[Tuple[str, str], List[Recording]] = defaultdict(list)
+        self.positions: Dict[Any, int] = defaultdict(int)
+        self.counters = {"recorded": 0, "replayed": 0, "misses": 0}
+        self._lock = threading.Lock()  # blocking services record from threadpool threads
+        if mode == REPLAY:
+            self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"no cassette at {self.path} to replay")
+        with open(self.path) as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A record interrupted mid-append leaves a partial last line
+                    logger.warning("Skipping unreadable cassette line %d in %s", number, self.path)
+                    continue
+                recording = Recording(entry["k"], entry["s"], entry["m"], entry["t"], entry["r"])
+                self.by_key[recording.key].append(recording)
+                self.by_method[(recording.service, recording.method)].append(recording)
+
+    def append(self, recording: Recording):
+        line = json.dumps({
+            "k": recording.key, "s": recording.service, "m": recording.method,
+            "t": round(recording.latency, 4), "r": recording.response,
+        }, separators=(",", ":"), default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+            self.counters["recorded"] += 1
+
+    def _next(self, pool_key, pool: List[Recording]) -> Recording:
+        position = self.positions[pool_key]
+        self.positions[pool_key] = position + 1
+        return pool[position % len(pool)]
+
+    def lookup(self, service: str, method: str, key: str) -> Recording:
+        """The recording answering this call on replay"""
+        with self._lock:
+            pool = self.by_key.get(key)
+            if pool:
+                self.counters["replayed"] += 1
+                return self._next(key, pool)
+            self.counters["misses"] += 1
+            pool = self.by_method.get((service, method))
+            if self.strict or not pool:
+                raise CassetteMiss(f"no recording of {service}.{method} for key {key}")
+            return self._next((service, method), pool)
+
+    def replay_delay(self, recording: Recording) -> float:
+        return recording.latency * self.latency_scale
+
+    def wrap(self, name: str, service) -> "CassetteService":
+        return CassetteService(self, name, service)
+
+    def stats(self) -> Dict:
+        return {"mode": self.mode, "path": self.path, **self.counters}
+
+
+class CassetteService:
+    """Records or replays the external calls of a service (RECORDED_METHODS[name]) through a Cassette"""
+
+    def __init__(self, cassette: Cassette, name: str, service):
+        self.cassette = cassette
+        self.name = name
+        self.service = service
+
+    def __getattr__(self, method: str):
+        attr = getattr(self.service, method)
+        if not callable(attr):
+            return attr
+        cassette, name = self.cassette, self.name
+        is_async = inspect.iscoroutinefunction(attr)
+
+        if method not in RECORDED_METHODS.get(name, ()):
+            if cassette.mode != REPLAY:
+                return attr
+            if is_async:
+                async def skip(*args, **kwargs):
+                    return None
+                return skip
+            return lambda *args, **kwargs: None
+
+        if cassette.mode == REPLAY:
+            if is_async:
+                async def replay(*args, **kwargs):
+                    recording = cassette.lookup(name, method, call_key(name, method, args, kwargs))
+                    await asyncio.sleep(cassette.replay_delay(recording))
+                    return copy.deepcopy(recording.response)
+                return replay
+
+            def replay_sync(*args, **kwargs):
+                recording = cassette.lookup(name, method, call_key(name, method, args, kwargs))
+                time.sleep(cassette.replay_delay(recording))
+                return copy.deepcopy(recording.response)
+            return replay_sync
+
+        if is_async:
+            async def record(*args, **kwargs):
+                start = time.perf_counter()
+                response = await attr(*args, **kwargs)
+                cassette.append(Recording(call_key(name, method, args, kwargs), name, method,
+                                          time.perf_counter() - start, response))
+                return response
+            return record
+
+        def record_sync(*args, **kwargs):
+            start = time.perf_counter()
+            response = attr(*args, **kwargs)
+            cassette.append(Recording(call_key(name, method, args, kwargs), name, method,
+                                      time.perf_counter() - start, response))
+            return response
+        return record_sync
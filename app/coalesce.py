@@ -0,0 +1,145 @@
+"""Per-user debouncing of transcript batches into merged analyze_date calls"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import ANALYSIS_DEBOUNCE_WINDOW, ANALYSIS_DEBOUNCE_MAX_TOKENS, ANALYSIS_DEBOUNCE_MAX_DELAY
+from app.context import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class PendingAnalysis:
+    """One user's batches waiting for analysis, plus the analysis currently in flight"""
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self.tokens = 0
+        self.since: Optional[float] = None  # when the oldest pending batch arrived
+        self.waiter: Optional[asyncio.Future] = None  # resolved for the newest pending batch
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_texts: List[str] = []
+        self.flush_since: Optional[float] = None
+        self.flush_waiter: Optional[asyncio.Future] = None
+
+
+class AnalysisCoalescer:
+    """
+    Merges a user's transcript batches into one analysis run per `window` seconds, or sooner
+    once `max_tokens` of text is pending. A batch arriving while an analysis is in flight
+    supersedes it: the analysis is cancelled and its text rejoins the next run, unless its
+    oldest batch has already waited `max_delay` seconds (so a steady stream cannot starve it).
+
+    Only the newest batch of each run gets the analysis result; the batches merged into it
+    resolve to None straight away.
+    """
+
+    def __init__(self, run: Callable[[str, str], Awaitable[Any]],
+                 window: float = ANALYSIS_DEBOUNCE_WINDOW,
+                 max_tokens: int = ANALYSIS_DEBOUNCE_MAX_TOKENS,
+                 max_delay: float = ANALYSIS_DEBOUNCE_MAX_DELAY):
+        self.run = run
+        self.window = window
+        self.max_tokens = max_tokens
+        self.max_delay = max_delay
+        self.states: Dict[str, PendingAnalysis] = {}
+        self.counters = {"batches": 0, "runs": 0, "coalesced": 0, "superseded": 0}
+
+    def submit(self, uid: str, text: str) -> asyncio.Future:
+        """Queue a batch for the user's next analysis; the future resolves to its result or None"""
+        loop = asyncio.get_running_loop()
+        state = self.states.setdefault(uid, PendingAnalysis())
+        now = time.monotonic()
+        self.counters["batches"] += 1
+
+        if state.waiter is not None and not state.waiter.done():
+            state.waiter.set_result(None)
+            self.counters["coalesced"] += 1
+        waiter = state.waiter = loop.create_future()
+        if not state.texts:
+            state.since = now
+        state.texts.append(text)
+        state.tokens += estimate_tokens(text)
+
+        task = state.flush_task
+        if task is not None and not task.done() and now - state.flush_since < self.max_delay:
+            # The in-flight answer would be stale on arrival: rerun over its text plus this batch
+            task.cancel()
+            state.texts = state.flush_texts + state.texts
+            state.tokens += sum(estimate_tokens(t) for t in state.flush_texts)
+            state.since = state.flush_since
+            state.flush_texts = []
+            if state.flush_waiter is not None and not state.flush_waiter.done():
+                state.flush_waiter.set_result(None)
+            self.counters["superseded"] += 1
+
+        remaining = self.window - (now - state.since)
+        if state.tokens >= self.max_tokens or remaining <= 0:
+            self._flush(uid)
+        elif state.timer is None:
+            state.timer = loop.call_later(remaining, self._flush, uid)
+        return waiter
+
+    def _flush(self, uid: str):
+        state = self.states.get(uid)
+        if state is None:
+            return
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        if not state.texts:
+            return
+
+        previous = state.flush_task
+        state.flush_texts, state.flush_since, state.flush_waiter = state.texts, state.since, state.waiter
+        state.texts, state.tokens, state.since, state.waiter = [], 0, None, None
+        self.counters["runs"] += 1
+        state.flush_task = asyncio.create_task(
+            self._run(uid, state, " ".join(state.flush_texts), state.flush_waiter, previous)
+        )
+
+    async def _run(self, uid: str, state: PendingAnalysis, text: str,
+                   waiter: asyncio.Future, previous: Optional[asyncio.Task]):
+        try:
+            # Analyses for one user never overlap, including one that is still being cancelled
+            if previous is not None and not previous.done():
+                await asyncio.wait([previous])
+            result = await self.run(uid, text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Analysis failed: %s", e, extra={"uid": uid})
+            if not waiter.done():
+                waiter.set_exception(e)
+        else:
+            if not waiter.done():
+                waiter.set_result(result)
+        finally:
+            if state.flush_task is asyncio.current_task():
+                state.flush_task = None
+                state.flush_texts = []
+            if not state.texts and state.flush_task is None and self.states.get(uid) is state:
+                del self.states[uid]
+
+    def discard(self, uid: str):
+        """Drop a user's pending batches and cancel their in-flight analysis (e.g. the date ended)"""
+        state = self.states.pop(uid, None)
+        if state is None:
+            return
+        if state.timer is not None:
+            state.timer.cancel()
+        if state.flush_task is not None:
+            state.flush_task.cancel()
+        for waiter in (state.waiter, state.flush_waiter):
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+    async def stop(self):
+        """Cancel every pending and in-flight analysis"""
+        tasks = [state.flush_task for state in self.states.values() if state.flush_task is not None]
+        for uid in list(self.states):
+            self.discard(uid)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,140 @@
+"""Single-pass recognition of voice commands and conversation cues in transcript batches"""
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+# Command kinds, in priority order (lower number wins within a segment)
+EDIT_CODE_WORD = "edit_code_word"
+EDIT_PHONE_NUMBER = "edit_phone_number"
+CODE_WORD = "code_word"
+START_DATE = "start_date"
+END_DATE = "end_date"
+STUCK = "stuck"  # "yeah okay so" - user seems stuck, not a command
+
+PRIORITY = {
+    EDIT_CODE_WORD: 0,
+    EDIT_PHONE_NUMBER: 1,
+    CODE_WORD: 2,
+    START_DATE: 3,
+    END_DATE: 4,
+    STUCK: 5,
+}
+
+PHRASES = {
+    "edit code word": EDIT_CODE_WORD,
+    "edit phone number": EDIT_PHONE_NUMBER,
+    "start date": START_DATE,
+    "end date": END_DATE,
+}
+
+# "yeah okay so" with punctuation allowed around the words ("yeah, okay. so")
+STUCK_PATTERN = r"yeah[^\w\s]* [^\w\s]*okay[^\w\s]* [^\w\s]*so"
+STUCK_MAX_LENGTH = 24
+STUCK_PHRASE = "yeah okay so"
+
+
+class CommandMatch(NamedTuple):
+    """A recognized command; offsets are into the batch text (negative if it began in the previous batch)"""
+    kind: str
+    start: int
+    end: int
+    segment: int
+    priority: int
+
+
+class ScanResult:
+    """All matches in one batch plus the lowercased batch text they index into"""
+
+    def __init__(self, text: str, matches: List[CommandMatch], carry: str):
+        self.text = text
+        self.matches = matches
+        self.carry = carry
+
+    def commands(self) -> List[CommandMatch]:
+        """Commands (not cues) in handling order: earliest segment first, then priority"""
+        return sorted(
+            (m for m in self.matches if m.kind != STUCK),
+            key=lambda m: (m.segment, m.priority, m.start)
+        )
+
+    def has(self, kind: str) -> bool:
+        return any(m.kind == kind for m in self.matches)
+
+    def text_after(self, match: CommandMatch) -> str:
+        """Batch text following a match (e.g. the new code word or phone number)"""
+        return self.text[max(match.end, 0):]
+
+
+class CommandMatcher:
+    """
+    One compiled regex for every command phrase, the user's code word and the stuck cue.
+    Phrases split across segments match because segments are scanned as one joined text.
+    """
+
+    def __init__(self, code_word: str):
+        self.code_word = code_word.lower()
+        self.kinds: Dict[str, str] = dict(PHRASES)
+        self.kinds.setdefault(self.code_word, CODE_WORD)
+
+        # Alternatives in priority order so the higher-priority phrase wins at a shared position.
+        # No capture groups: they would disable sre's first-character prefilter.
+        literals = sorted(self.kinds, key=lambda phrase: PRIORITY[self.kinds[phrase]])
+        self.pattern = re.compile(
+            "|".join(re.escape(phrase) for phrase in literals if phrase) + "|" + STUCK_PATTERN
+        )
+        self.carry_length = max(max(map(len, self.kinds)), STUCK_MAX_LENGTH) - 1
+
+    def scan(self, segments: List[str], carry: str = "") -> ScanResult:
+        """
+        Find all commands in a batch in one pass.
+        `carry` is the tail of the previous batch so phrases split across requests still match;
+        matches lying entirely inside it are not reported again.
+        """
+        text = " ".join(segments).lower()
+        prefix = carry + " " if carry else ""
+        haystack = prefix + text
+        offset = len(prefix)
+
+        matches = []
+        starts = None
+        search = self.pattern.search
+        match = search(haystack)
+        while match:
+            start, end = match.start() - offset, match.end() - offset
+            if end > 0:
+                if starts is None:
+                    # Segment start offsets within `text`, for mapping matches back to segments
+                    starts = []
+                    position = 0
+                    for segment in segments:
+                        starts.append(position)
+                        position += len(segment) + 1
+                phrase = match.group()
+                kind = self.kinds.get(phrase, STUCK)
+                segment = max(bisect_left(starts, end) - 1, 0)
+                matches.append(CommandMatch(kind, start, end, segment, PRIORITY[kind]))
+            # Restart one character later so overlapping phrases (e.g. a code word inside "start date") are found
+            match = search(haystack, match.start() + 1)
+
+        return ScanResult(text, matches, haystack[-self.carry_length:])
+
+
+def code_word_conflict(code_word: str) -> Optional[str]:
+    """
+    The built-in phrase a code word collides with, or None if it is free to use.
+    The matcher finds literals anywhere, without word boundaries, so a code word inside a
+    phrase ("art" in "start date") would fire the emergency call whenever the phrase is said,
+    and one containing a phrase would never fire.
+    """
+    word = re.sub(r"[^\w\s]", "", code_word).strip().lower()
+    for phrase in (*PHRASES, STUCK_PHRASE):
+        if word in phrase or phrase in word:
+            return phrase
+    return None
+
+
+@lru_cache(maxsize=1024)
+def get_command_matcher(code_word: str) -> CommandMatcher:
+    """Compiled matcher for a code word; a code word edit just selects another cached matcher"""
+    return CommandMatcher(code_word)
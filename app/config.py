@@ -1,23 +1,26 @@
 """Configuration and environment variables"""
 import os
 from dotenv import load_dotenv
-from anthropic import Anthropic
-from twilio.rest import Client
-from letta_client import Letta
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Log level of the app's loggers (DEBUG shows per-batch lines), and "text" or "json" lines
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+
 # Database configuration
-DB_PATH = "date_summaries.db"
+DB_PATH = os.environ.get("DB_PATH", "date_summaries.db")
 
-# API clients
+# API clients (the SDKs take seconds to import, so each is imported when its first client is built)
 def get_claude_client():
     """Get initialized Claude API client"""
+    from anthropic import Anthropic
     return Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
 
 def get_twilio_client():
     """Get initialized Twilio client"""
+    from twilio.rest import Client
     return Client(
         os.environ.get("TWILIO_ACCOUNT_SID"),
         os.environ.get("TWILIO_AUTH_TOKEN")
@@ -25,21 +28,163 @@ def get_twilio_client():
 
 def get_letta_client():
     """Get initialized Letta API client"""
+    from letta_client import Letta
     return Letta(token=os.environ.get("LETTA_API_KEY"))
 
+def get_async_claude_client():
+    """Get initialized async Claude API client"""
+    from anthropic import AsyncAnthropic
+    return AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+
+def get_async_twilio_client():
+    """Get Twilio client on the aiohttp transport (must be built inside a running event loop)"""
+    from twilio.rest import Client
+    from twilio.http.async_http_client import AsyncTwilioHttpClient
+    return Client(
+        os.environ.get("TWILIO_ACCOUNT_SID"),
+        os.environ.get("TWILIO_AUTH_TOKEN"),
+        http_client=AsyncTwilioHttpClient()
+    )
+
+def get_async_letta_client():
+    """Get initialized async Letta API client"""
+    from letta_client import AsyncLetta
+    return AsyncLetta(token=os.environ.get("LETTA_API_KEY"))
+
 # Environment variables
 def get_env_var(key: str, default=None):
     """Get environment variable with optional default"""
     return os.environ.get(key, default)
 
+def get_bool_env(key: str, default: bool = False) -> bool:
+    """Read a boolean flag from the environment ("1", "true", "yes", "on")"""
+    value = os.environ.get(key)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 # OMI API configuration
 OMI_APP_ID = os.environ.get("OMI_APP_ID")
 OMI_API_KEY = os.environ.get("OMI_API_KEY")
-OMI_BASE_URL = "https://api.omi.me/v2"
+OMI_BASE_URL = os.environ.get("OMI_BASE_URL", "https://api.omi.me/v2")
+# Pooled keep-alive connections, connect/read timeouts in seconds, and retries (exponential
+# backoff with full jitter, capped at OMI_RETRY_MAX_DELAY) on 429/5xx and connection errors
+OMI_POOL_SIZE = int(os.environ.get("OMI_POOL_SIZE", "10"))
+OMI_CONNECT_TIMEOUT = float(os.environ.get("OMI_CONNECT_TIMEOUT", "5"))
+OMI_READ_TIMEOUT = float(os.environ.get("OMI_READ_TIMEOUT", "30"))
+OMI_MAX_RETRIES = int(os.environ.get("OMI_MAX_RETRIES", "3"))
+OMI_RETRY_BASE_DELAY = float(os.environ.get("OMI_RETRY_BASE_DELAY", "0.5"))
+OMI_RETRY_MAX_DELAY = float(os.environ.get("OMI_RETRY_MAX_DELAY", "8"))
 
 # Twilio configuration
 PHONE_NUMBER = os.environ.get("PHONE_NUMBER")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
+# Emergency call lane: retries after a call that could not connect to Twilio (delay doubles each time;
+# other failures may already have dialed, so they are not retried), and seconds
+# between Twilio connection warm-ups (0 warms up once at startup)
+EMERGENCY_CALL_RETRIES = int(os.environ.get("EMERGENCY_CALL_RETRIES", "3"))
+EMERGENCY_RETRY_DELAY = float(os.environ.get("EMERGENCY_RETRY_DELAY", "0.25"))
+EMERGENCY_PREWARM_INTERVAL = float(os.environ.get("EMERGENCY_PREWARM_INTERVAL", "240"))
 
 # Letta API configuration
 LETTA_API_KEY = os.environ.get("LETTA_API_KEY")
+# uid -> agent id entries kept in memory, and seconds before another worker's unfinished
+# agent creation is taken over
+LETTA_AGENT_CACHE_SIZE = int(os.environ.get("LETTA_AGENT_CACHE_SIZE", "1024"))
+LETTA_AGENT_CLAIM_TIMEOUT = float(os.environ.get("LETTA_AGENT_CLAIM_TIMEOUT", "60"))
+
+# Service mode: native async clients, or blocking clients offloaded to the threadpool
+ASYNC_SERVICES = get_bool_env("ASYNC_SERVICES", True)
+# Build the API clients (importing their SDKs) in the background right after startup instead of on
+# the first request that needs each one
+STARTUP_PREWARM = get_bool_env("STARTUP_PREWARM", True)
+
+# External calls: "live", "record" (live, appending each call and its latency to CASSETTE_PATH) or
+# "replay" (answered from CASSETTE_PATH, sleeping the recorded latency times CASSETTE_LATENCY_SCALE;
+# with CASSETTE_STRICT an unrecorded call fails instead of reusing another recording of its method)
+CASSETTE_MODE = os.environ.get("CASSETTE_MODE", "live")
+CASSETTE_PATH = os.environ.get("CASSETTE_PATH", "cassette.jsonl")
+CASSETTE_LATENCY_SCALE = float(os.environ.get("CASSETTE_LATENCY_SCALE", "1.0"))
+CASSETTE_STRICT = get_bool_env("CASSETTE_STRICT", False)
+
+# Background job pipeline (end-of-date summary + OMI upload)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_DELAY = float(os.environ.get("JOB_RETRY_BASE_DELAY", "2.0"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+# A running job is leased to the process that claimed it, which renews the lease while the job runs;
+# after JOB_LEASE_TIMEOUT seconds without renewal (the process died) any worker may claim it again
+JOB_LEASE_TIMEOUT = float(os.environ.get("JOB_LEASE_TIMEOUT", "60"))
+
+# Sharded deployment (`uvicorn app.dispatcher:app`): the dispatcher runs SHARD_WORKERS processes of SHARD_APP on
+# unix sockets in SHARD_SOCKET_DIR (a temporary directory if unset) and routes each uid to one of them by
+# rendezvous hash, waiting up to SHARD_START_TIMEOUT seconds for a worker to start and SHARD_HANDOFF_TIMEOUT
+# for a moving user's requests to finish on a resize. SHARD_WORKER is the name the dispatcher gives a worker.
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", "2"))
+SHARD_APP = os.environ.get("SHARD_APP", "app.main:app")
+SHARD_SOCKET_DIR = os.environ.get("SHARD_SOCKET_DIR")
+SHARD_START_TIMEOUT = float(os.environ.get("SHARD_START_TIMEOUT", "60"))
+SHARD_HANDOFF_TIMEOUT = float(os.environ.get("SHARD_HANDOFF_TIMEOUT", "30"))
+SHARD_WORKER = os.environ.get("SHARD_WORKER")
+
+# Session store: seconds between write-behind flushes of user/date state to SQLite, and whether
+# /livetranscript waits for its changes to be flushed ("sync") or not ("behind"). "behind" is the default
+# whenever one process serves each user: a single process, or a shard worker. "sync" is only needed when
+# several uvicorn workers share the database without sharding, the default when WEB_CONCURRENCY (uvicorn's
+# --workers) is above 1.
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", "0.25"))
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+SESSION_WRITE_MODE = os.environ.get(
+    "SESSION_WRITE_MODE", "sync" if WEB_CONCURRENCY > 1 and not SHARD_WORKER else "behind"
+)
+# Cached users idle for SESSION_IDLE_TTL seconds are evicted (reloaded on their next request), and
+# least recently used ones beyond SESSION_MAX_USERS or SESSION_MEMORY_LIMIT_MB (estimated); checked
+# every SESSION_EVICT_INTERVAL seconds
+SESSION_IDLE_TTL = float(os.environ.get("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_USERS = int(os.environ.get("SESSION_MAX_USERS", "50000"))
+SESSION_MEMORY_LIMIT_MB = float(os.environ.get("SESSION_MEMORY_LIMIT_MB", "512"))
+SESSION_EVICT_INTERVAL = float(os.environ.get("SESSION_EVICT_INTERVAL", "30"))
+
+# Per-user session actors
+ACTOR_MAILBOX_SIZE = int(os.environ.get("ACTOR_MAILBOX_SIZE", "32"))
+ACTOR_IDLE_TIMEOUT = float(os.environ.get("ACTOR_IDLE_TIMEOUT", "300"))
+
+# Transcript context sent with conversation tip requests (most recent words)
+TIP_CONTEXT_TOKENS = int(os.environ.get("TIP_CONTEXT_TOKENS", "2000"))
+# Stream conversation tips and answer with the first complete sentence (false waits for the full tip)
+TIP_STREAMING = get_bool_env("TIP_STREAMING", True)
+# Speculative tips: regenerate in the background after TIP_REFRESH_CHARS of new transcript (at most
+# every TIP_MIN_REFRESH_INTERVAL seconds and TIP_PRECOMPUTE_PER_HOUR times per user per hour); a cached
+# tip is served if at most TIP_MAX_AGE seconds old and TIP_MAX_STALE_CHARS of transcript behind
+TIP_PRECOMPUTE = get_bool_env("TIP_PRECOMPUTE", True)
+TIP_REFRESH_CHARS = int(os.environ.get("TIP_REFRESH_CHARS", "400"))
+TIP_MIN_REFRESH_INTERVAL = float(os.environ.get("TIP_MIN_REFRESH_INTERVAL", "10"))
+TIP_MAX_AGE = float(os.environ.get("TIP_MAX_AGE", "90"))
+TIP_MAX_STALE_CHARS = int(os.environ.get("TIP_MAX_STALE_CHARS", "1500"))
+TIP_PRECOMPUTE_PER_HOUR = int(os.environ.get("TIP_PRECOMPUTE_PER_HOUR", "30"))
+
+# Token-budgeted rolling context for date analysis (tokens are estimated as chars / 4)
+ANALYSIS_TOKEN_BUDGET = int(os.environ.get("ANALYSIS_TOKEN_BUDGET", "4000"))
+ANALYSIS_RECENT_TOKENS = int(os.environ.get("ANALYSIS_RECENT_TOKENS", "1500"))
+ANALYSIS_SUMMARY_REFRESH_BATCHES = int(os.environ.get("ANALYSIS_SUMMARY_REFRESH_BATCHES", "10"))
+ANALYSIS_WARNINGS_LIMIT = int(os.environ.get("ANALYSIS_WARNINGS_LIMIT", "10"))
+ANALYSIS_CACHE_CHUNK_TOKENS = int(os.environ.get("ANALYSIS_CACHE_CHUNK_TOKENS", "256"))
+# Output cap of the analyze_date tool call (a warning is one short sentence)
+ANALYSIS_MAX_TOKENS = int(os.environ.get("ANALYSIS_MAX_TOKENS", "150"))
+
+# Warnings are suppressed locally when their reason was warned about less than WARNING_REASON_COOLDOWN
+# seconds ago or their text is WARNING_SIMILARITY_THRESHOLD similar (0-1) to an earlier one; each date
+# keeps its last WARNING_HISTORY_LIMIT warnings
+WARNING_SIMILARITY_THRESHOLD = float(os.environ.get("WARNING_SIMILARITY_THRESHOLD", "0.6"))
+WARNING_REASON_COOLDOWN = float(os.environ.get("WARNING_REASON_COOLDOWN", "120"))
+WARNING_HISTORY_LIMIT = int(os.environ.get("WARNING_HISTORY_LIMIT", "50"))
+
+# Local pre-filter in front of analyze_date ("lexicon" or "off")
+ANALYSIS_GATE = os.environ.get("ANALYSIS_GATE", "lexicon")
+ANALYSIS_GATE_THRESHOLD = float(os.environ.get("ANALYSIS_GATE_THRESHOLD", "1.0"))
+ANALYSIS_GATE_FORCE_EVERY = int(os.environ.get("ANALYSIS_GATE_FORCE_EVERY", "5"))
+
+# Per-user debouncing of analyze_date calls (seconds / estimated tokens)
+ANALYSIS_DEBOUNCE_WINDOW = float(os.environ.get("ANALYSIS_DEBOUNCE_WINDOW", "2.0"))
+ANALYSIS_DEBOUNCE_MAX_TOKENS = int(os.environ.get("ANALYSIS_DEBOUNCE_MAX_TOKENS", "200"))
+ANALYSIS_DEBOUNCE_MAX_DELAY = float(os.environ.get("ANALYSIS_DEBOUNCE_MAX_DELAY", "6.0"))
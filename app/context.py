@@ -0,0 +1,188 @@
+"""Token-budgeted rolling context for date analysis"""
+import asyncio
+import json
+import logging
+from typing import Dict, List, NamedTuple, Optional
+
+from app.config import (
+    ANALYSIS_TOKEN_BUDGET,
+    ANALYSIS_RECENT_TOKENS,
+    ANALYSIS_SUMMARY_REFRESH_BATCHES,
+    ANALYSIS_WARNINGS_LIMIT,
+    ANALYSIS_CACHE_CHUNK_TOKENS,
+    WARNING_SIMILARITY_THRESHOLD,
+)
+from app.dedup import reason_key, shingles, similarity
+from app.prompts import DATE_ANALYSIS_TOOL, build_date_analysis_request
+from app.transcript import TranscriptBuffer
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+# Smallest verbatim window we send, even if the summary and warnings eat the budget
+MIN_RECENT_TOKENS = 200
+
+# Cached transcript chunks per window before it is restarted; each chunk is one content block
+# and the API only looks back 20 blocks for an earlier cache entry
+MAX_CACHED_CHUNKS = 16
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Cheap token estimate (about four characters per token for English text)"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_request_tokens(system: List[Dict], messages: List[Dict]) -> int:
+    """Token estimate of a messages API request built from text blocks"""
+    total = 0
+    for block in system:
+        total += estimate_tokens(block.get("text"))
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        else:
+            total += sum(estimate_tokens(block.get("text")) for block in content)
+    return total
+
+
+# Static instructions and tool schema of the analysis prompt, which every call pays for (or reads from cache)
+PROMPT_OVERHEAD_TOKENS = (
+    estimate_request_tokens(*build_date_analysis_request("", "", None))
+    + estimate_tokens(json.dumps(DATE_ANALYSIS_TOOL))
+)
+
+
+def warnings_digest(previous_warnings: List[Dict], limit: int,
+                    threshold: float = WARNING_SIMILARITY_THRESHOLD) -> List[Dict]:
+    """The most recent warnings, at most one per reason and none near-duplicating a later one, capped at `limit`"""
+    digest: List[Dict] = []
+    seen_reasons = set()
+    signatures = []
+    for warning in reversed(previous_warnings):
+        reason = reason_key(warning.get("reason", ""))
+        if reason in seen_reasons:
+            continue
+        signature = shingles(warning.get("message", ""))
+        if any(similarity(signature, seen) >= threshold for seen in signatures):
+            continue
+        seen_reasons.add(reason)
+        signatures.append(signature)
+        digest.append(warning)
+        if len(digest) >= limit:
+            break
+    digest.reverse()
+    return digest
+
+
+class ContextWindow(NamedTuple):
+    """What one analyze_date call gets to see"""
+    summary: Optional[str]
+    cached_chunks: List[str]  # stable transcript prefix, identical across calls until the window moves
+    recent_tail: str  # transcript after the last cached chunk
+    warnings: List[Dict]
+    estimated_tokens: int
+
+    @property
+    def recent_transcript(self) -> str:
+        """The whole verbatim window as one string"""
+        return " ".join(part for part in (*self.cached_chunks, self.recent_tail) if part)
+
+
+class RollingContext:
+    """
+    Keeps each analysis prompt within a fixed token budget: a verbatim window of the most
+    recent transcript, a running summary of everything older (refreshed in the background
+    every few batches) and a capped digest of earlier warnings.
+
+    The start of the verbatim window is sticky so the prompt prefix stays byte-identical
+    between calls and can be served from the prompt cache. The window is cut into chunks at
+    checkpoints; once the uncached tail reaches `cache_chunk_tokens` it becomes a new chunk.
+    The window only jumps forward (dropping its checkpoints) when it outgrows the budget or
+    the summary changes.
+    """
+
+    def __init__(self, token_budget: int = ANALYSIS_TOKEN_BUDGET,
+                 recent_tokens: int = ANALYSIS_RECENT_TOKENS,
+                 refresh_batches: int = ANALYSIS_SUMMARY_REFRESH_BATCHES,
+                 warnings_limit: int = ANALYSIS_WARNINGS_LIMIT,
+                 cache_chunk_tokens: int = ANALYSIS_CACHE_CHUNK_TOKENS):
+        self.token_budget = token_budget
+        self.recent_tokens = recent_tokens
+        self.refresh_batches = refresh_batches
+        self.warnings_limit = warnings_limit
+        self.cache_chunk_tokens = cache_chunk_tokens
+        self.summary = ""
+        self.summarized_upto = 0  # transcript segments [0, summarized_upto) are folded into summary
+        self.batches_since_refresh = 0
+        self.refresh_task: Optional[asyncio.Task] = None
+        self.window_start = 0  # first transcript segment of the verbatim window
+        self.checkpoints: List[int] = []  # segment indexes where cached chunks end
+        self._window_summary = ""  # summary the current window and checkpoints were built under
+
+    def build(self, current_text: str, transcript: TranscriptBuffer,
+              previous_warnings: List[Dict]) -> ContextWindow:
+        """Assemble the summary, warnings digest and the largest recent window that fits the budget"""
+        digest = warnings_digest(previous_warnings, self.warnings_limit)
+        fixed_tokens = (
+            PROMPT_OVERHEAD_TOKENS
+            + estimate_tokens(current_text)
+            + estimate_tokens(self.summary)
+            + sum(estimate_tokens(w.get("reason")) + estimate_tokens(w.get("message")) for w in digest)
+        )
+        recent_budget = max(self.token_budget - fixed_tokens, MIN_RECENT_TOKENS)
+
+        self._place_window(transcript, recent_budget)
+
+        boundaries = [self.window_start, *self.checkpoints]
+        cached_chunks = [transcript.text_from(start, end) for start, end in zip(boundaries, boundaries[1:])]
+        recent_tail = transcript.text_from(boundaries[-1])
+        return ContextWindow(
+            self.summary or None,
+            cached_chunks,
+            recent_tail,
+            digest,
+            fixed_tokens + sum(estimate_tokens(chunk) for chunk in cached_chunks) + estimate_tokens(recent_tail),
+        )
+
+    def _place_window(self, transcript: TranscriptBuffer, recent_budget: int):
+        """Keep the window start and checkpoints stable unless the budget or summary forces a move"""
+        fits_from = transcript.start_of_tail(recent_budget * CHARS_PER_TOKEN, floor=self.summarized_upto)
+        if (fits_from > self.window_start or self.summary != self._window_summary
+                or len(self.checkpoints) >= MAX_CACHED_CHUNKS):
+            # Jump to a shorter window than the budget allows, so the next jumps are some batches away
+            jump_tokens = min(self.recent_tokens, recent_budget)
+            self.window_start = transcript.start_of_tail(jump_tokens * CHARS_PER_TOKEN, floor=self.summarized_upto)
+            self.checkpoints = []
+            self._window_summary = self.summary
+
+        last = self.checkpoints[-1] if self.checkpoints else self.window_start
+        tail_chars = transcript.char_count - transcript.chars_before(last)
+        if tail_chars >= self.cache_chunk_tokens * CHARS_PER_TOKEN:
+            self.checkpoints.append(len(transcript.segments))
+
+    def after_batch(self, transcript: TranscriptBuffer, summarizer):
+        """Every `refresh_batches` batches, fold transcript older than the recent window into the summary"""
+        self.batches_since_refresh += 1
+        if self.batches_since_refresh < self.refresh_batches:
+            return
+        if self.refresh_task is not None and not self.refresh_task.done():
+            return
+
+        upto = transcript.start_of_tail(self.recent_tokens * CHARS_PER_TOKEN, floor=self.summarized_upto)
+        if upto <= self.summarized_upto:
+            return  # everything unsummarized still fits in the recent window
+
+        self.batches_since_refresh = 0
+        self.refresh_task = asyncio.create_task(self._refresh(transcript, upto, summarizer))
+
+    async def _refresh(self, transcript: TranscriptBuffer, upto: int, summarizer):
+        older_text = transcript.text_from(self.summarized_upto, upto)
+        summary = await summarizer.summarize_context(self.summary or None, older_text)
+        if summary:
+            self.summary = summary
+            self.summarized_upto = upto
+            logger.debug("Refreshed analysis summary through segment %d (%d tokens)", upto, estimate_tokens(summary))
@@ -1,42 +1,156 @@
-"""Database operations for date summaries"""
+"""Database operations for date summaries, over long-lived per-thread SQLite connections"""
 import sqlite3
-from datetime import datetime
-from typing import Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from app.config import DB_PATH
 
+# Applied to every connection: WAL lets readers run alongside the single writer, NORMAL sync
+# is durable across application crashes in WAL mode, and busy_timeout waits out other writers
+# (other threads or worker processes) instead of failing with "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+)
 
-def init_database():
-    """Initialize the SQLite database and create the table if it doesn't exist"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS date_summaries (
-            uid TEXT PRIMARY KEY,
-            summary TEXT NOT NULL,
-            created_at TIMESTAMP NOT NULL
+# sqlite3 keeps compiled statements per connection keyed by SQL text, so the constant
+# statements below are prepared once per thread and reused
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_all_connections: List[sqlite3.Connection] = []
+_all_connections_lock = threading.Lock()
+_generation = 0  # bumped by close_connections so every thread reopens
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """A new tuned connection in autocommit mode (transactions are explicit)"""
+    conn = sqlite3.connect(
+        db_path,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """This thread's long-lived connection to `db_path`, opened on first use"""
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None or _local.generation != _generation:
+        connections = _local.connections = {}
+        _local.generation = _generation
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = connect(db_path)
+        with _all_connections_lock:
+            _all_connections.append(conn)
+    return conn
+
+
+def close_connections():
+    """Close every pooled connection (on shutdown, or in tests that delete the database file)"""
+    global _generation
+    with _all_connections_lock:
+        _generation += 1
+        for conn in _all_connections:
+            conn.close()
+        _all_connections.clear()
+
+
+@contextmanager
+def transaction(db_path: str = DB_PATH, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+    """
+    Run several statements as one transaction on this thread's connection.
+    BEGIN IMMEDIATE takes the write lock up front so the transaction cannot fail half-way on it.
+    """
+    conn = get_connection(db_path)
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def init_database(db_path: str = DB_PATH):
+    """Create the summary history table and carry over summaries from the old one-row-per-user table"""
+    with transaction(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS date_summaries (
+                uid TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS summary_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT NOT NULL,
+                date_id TEXT,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_summary_history_uid_created ON summary_history (uid, created_at)"
+        )
+        # A retried job saves the same date again: keep one row per (uid, date_id)
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_summary_history_uid_date ON summary_history (uid, date_id)"
         )
-    """)
-    conn.commit()
-    conn.close()
-
-
-def get_previous_summary(uid: str) -> Optional[str]:
-    """Retrieve the previous date summary for a user"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT summary FROM date_summaries WHERE uid = ?", (uid,))
-    result = cursor.fetchone()
-    conn.close()
+
+        if conn.execute("SELECT 1 FROM summary_history LIMIT 1").fetchone() is None:
+            conn.execute("""
+                INSERT INTO summary_history (uid, date_id, summary, created_at)
+                SELECT uid, NULL, summary, CAST(strftime('%s', created_at) AS REAL)
+                FROM date_summaries
+            """)
+
+
+SELECT_LATEST_SUMMARY = """
+    SELECT summary FROM summary_history WHERE uid = ?
+    ORDER BY created_at DESC, id DESC LIMIT 1
+"""
+
+SELECT_SUMMARY_HISTORY = """
+    SELECT date_id, summary, created_at FROM summary_history WHERE uid = ?
+    ORDER BY created_at DESC, id DESC LIMIT ?
+"""
+
+INSERT_SUMMARY = """
+    INSERT OR REPLACE INTO summary_history (uid, date_id, summary, created_at)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def get_previous_summary(uid: str, db_path: str = DB_PATH) -> Optional[str]:
+    """Retrieve the most recent date summary for a user"""
+    result = get_connection(db_path).execute(SELECT_LATEST_SUMMARY, (uid,)).fetchone()
     return result[0] if result else None
 
 
-def save_summary(uid: str, summary: str):
-    """Save or replace the date summary for a user"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT OR REPLACE INTO date_summaries (uid, summary, created_at)
-        VALUES (?, ?, ?)
-    """, (uid, summary, datetime.now()))
-    conn.commit()
-    conn.close()
+def get_summary_history(uid: str, limit: int = 20, db_path: str = DB_PATH) -> List[Dict]:
+    """A user's date summaries, newest first"""
+    rows = get_connection(db_path).execute(SELECT_SUMMARY_HISTORY, (uid, limit)).fetchall()
+    return [{"date_id": row[0], "summary": row[1], "created_at": row[2]} for row in rows]
+
+
+def save_summary(uid: str, summary: str, date_id: Optional[str] = None, db_path: str = DB_PATH):
+    """Record the summary of one date (replacing an earlier one for the same date)"""
+    get_connection(db_path).execute(INSERT_SUMMARY, (uid, date_id, summary, time.time()))
+
+
+def save_summaries(rows: Iterable[Tuple[str, Optional[str], str]], db_path: str = DB_PATH):
+    """Record many (uid, date_id, summary) rows in one transaction"""
+    now = time.time()
+    with transaction(db_path) as conn:
+        conn.executemany(INSERT_SUMMARY, ((uid, date_id, summary, now) for uid, date_id, summary in rows))
@@ -0,0 +1,83 @@
+"""Local near-duplicate detection for coaching warnings, without an extra LLM call"""
+import re
+import time
+from typing import Dict, FrozenSet, Optional, Sequence
+
+from app.config import WARNING_SIMILARITY_THRESHOLD, WARNING_REASON_COOLDOWN
+
+# Character n-grams compared between warnings; short enough to catch rewordings of one-liners
+SHINGLE_SIZE = 4
+
+NON_WORD = re.compile(r"[^a-z0-9]+")
+
+COOLDOWN = "cooldown"
+DUPLICATE = "duplicate"
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase words separated by single spaces (punctuation and emphasis dropped)"""
+    return NON_WORD.sub(" ", text.lower()).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> FrozenSet[str]:
+    """Signature of a warning: the set of its normalized character n-grams"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two signatures"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def reason_key(reason: Optional[str]) -> str:
+    return (reason or "").strip().lower()
+
+
+def warning_time(warning) -> float:
+    """Epoch seconds a warning was sent (0 if unknown, e.g. a hand-built dict)"""
+    timestamp = warning.get("timestamp")
+    return timestamp if isinstance(timestamp, (int, float)) else 0.0
+
+
+class WarningDeduper:
+    """
+    Decides whether a warning analyze_date asked for would repeat one the user already got
+    on this date: it does if the same reason was warned about less than `cooldown` seconds
+    ago, or if its text is at least `threshold` similar (Jaccard over character shingles)
+    to any earlier warning of the date. A warning without a reason is only compared by text.
+    """
+
+    def __init__(self, threshold: float = WARNING_SIMILARITY_THRESHOLD,
+                 cooldown: float = WARNING_REASON_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.counters = {"sent": 0, COOLDOWN: 0, DUPLICATE: 0}
+
+    def check(self, previous_warnings: Sequence, message: str, reason: Optional[str],
+              now: Optional[float] = None) -> Optional[str]:
+        """Why the warning should be suppressed (COOLDOWN or DUPLICATE), or None to send it"""
+        now = time.time() if now is None else now
+        key = reason_key(reason)
+        signature = shingles(message)
+        verdict = None
+        for warning in reversed(previous_warnings):
+            if key and reason_key(warning.get("reason")) == key and now - warning_time(warning) < self.cooldown:
+                verdict = COOLDOWN
+                break
+            if similarity(signature, shingles(warning.get("message", ""))) >= self.threshold:
+                verdict = DUPLICATE
+                break
+        self.counters[verdict or "sent"] += 1
+        return verdict
+
+    def stats(self) -> Dict:
+        checked = sum(self.counters.values())
+        return {
+            **self.counters,
+            "suppressed_rate": (self.counters[COOLDOWN] + self.counters[DUPLICATE]) / checked if checked else 0.0,
+        }
@@ -0,0 +1,75 @@
+"""
+Shard dispatcher: the front process of a sharded deployment, forwarding each user's requests
+to the worker process that owns the uid (app.shard)
+
+    SHARD_WORKERS=4 uvicorn app.dispatcher:app --port 8000
+"""
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+from app.logs import configure_logging
+from app.shard import ShardDispatcher
+
+configure_logging()
+
+# Response headers not copied from a worker (the dispatcher's server sets its own)
+HOP_HEADERS = {"connection", "content-length", "date", "keep-alive", "server", "transfer-encoding"}
+
+dispatcher = ShardDispatcher()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the shard workers for the lifetime of the dispatcher"""
+    await dispatcher.start()
+    yield
+    await dispatcher.stop()
+
+
+app = FastAPI(title="The Rizzistant (shard dispatcher)", lifespan=lifespan)
+
+
+def relay(response: httpx.Response) -> Response:
+    headers = {key: value for key, value in response.headers.items() if key.lower() not in HOP_HEADERS}
+    return Response(response.content, status_code=response.status_code, headers=headers)
+
+
+@app.get("/shard")
+def shard_stats():
+    """Requests served by each worker, resizes, users moved and requests held during handoffs"""
+    return dispatcher.stats()
+
+
+@app.post("/shard/resize")
+async def shard_resize(workers: int):
+    """Rebalance users onto this many workers"""
+    try:
+        return await dispatcher.resize(workers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/livetranscript")
+@app.post("/webhook")
+async def forward_user_request(request: Request, uid: str):
+    """Forward a user's request to the worker that owns the uid"""
+    response = await dispatcher.forward(
+        uid, request.method, request.url.path,
+        params=request.query_params, content=await request.body(),
+        headers={"content-type": request.headers.get("content-type", "application/json")},
+    )
+    return relay(response)
+
+
+@app.get("/{path:path}")
+async def forward_to_worker(path: str, request: Request, worker: Optional[str] = None):
+    """Other endpoints (health check, stats, /metrics) answered by one worker, `?worker=shard-N` (default the first)"""
+    name = worker or dispatcher.names[0]
+    if name not in dispatcher.workers:
+        raise HTTPException(status_code=404, detail=f"no worker {name}")
+    params = [(key, value) for key, value in request.query_params.multi_items() if key != "worker"]
+    return relay(await dispatcher.workers[name].request("GET", f"/{path}", params=params))
@@ -0,0 +1,137 @@
+"""Priority lane for emergency exit calls, isolated from analysis traffic"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from app.config import (
+    EMERGENCY_CALL_RETRIES,
+    EMERGENCY_RETRY_DELAY,
+    EMERGENCY_PREWARM_INTERVAL,
+)
+from app.metrics import Histogram
+from app.services import is_connect_error
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the detection-to-dial latency buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+class EmergencyLane:
+    """
+    Places emergency calls on a dedicated thread with its own event loop, so a dial is never
+    queued behind analysis work on the application loop or its threadpool. The request handler
+    only hands the call over and returns. A call is retried, with a doubling delay, only when
+    it could not connect to Twilio: any other failure may already have dialed the contact (or,
+    like missing numbers, fails the same way again), so it is final.
+
+    The Twilio client is warmed up on the lane (client built, TLS connection open) at start and
+    every `prewarm_interval` seconds, so the first real call does not pay for the handshake.
+    Detection-to-dial latency (code word matched -> Twilio accepted the call) goes into
+    `latency`.
+    """
+
+    def __init__(self, service, retries: int = EMERGENCY_CALL_RETRIES,
+                 retry_delay: float = EMERGENCY_RETRY_DELAY,
+                 prewarm_interval: float = EMERGENCY_PREWARM_INTERVAL):
+        self.service = service
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.prewarm_interval = prewarm_interval
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pending: List[Future] = []
+        self._keepwarm: Optional[Future] = None
+
+    def start(self):
+        """Start the lane thread and warm up the Twilio client"""
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+            self.loop.close()
+
+        self._thread = threading.Thread(target=run, name="emergency-lane", daemon=True)
+        self._thread.start()
+        ready.wait()
+        self._keepwarm = asyncio.run_coroutine_threadsafe(self._keep_warm(), self.loop)
+
+    async def stop(self, timeout: float = 10.0):
+        """Wait (up to `timeout` seconds) for calls in flight, then stop the lane thread"""
+        if self._thread is None:
+            return
+        pending = [asyncio.wrap_future(future) for future in self._pending if not future.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        self._keepwarm.cancel()
+        close = getattr(self.service, "aclose", None)
+        if close is not None:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(close(), self.loop))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    def dispatch(self, phone_number: Optional[str], detected_at: Optional[float] = None) -> Future:
+        """Hand an emergency call to the lane; returns a future resolving to whether it was placed"""
+        if self._thread is None:
+            self.start()
+        detected_at = time.perf_counter() if detected_at is None else detected_at
+        future = asyncio.run_coroutine_threadsafe(self._call(phone_number, detected_at), self.loop)
+        self._pending = [f for f in self._pending if not f.done()]
+        self._pending.append(future)
+        return future
+
+    async def _call(self, phone_number: Optional[str], detected_at: float) -> bool:
+        self.calls += 1
+        for attempt in range(self.retries + 1):
+            self.attempts += 1
+            try:
+                placed = await self.service.make_emergency_call(phone_number)
+            except Exception as e:
+                if not is_connect_error(e):
+                    logger.error("Emergency call attempt %d raised: %s", attempt + 1, e)
+                    break
+                logger.warning("Emergency call attempt %d could not connect: %s", attempt + 1, e)
+                if attempt < self.retries:
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                continue
+            if placed:
+                self.latency.observe(time.perf_counter() - detected_at)
+                return True
+            break
+        self.failures += 1
+        logger.error("Emergency call failed after %d attempts", attempt + 1)
+        return False
+
+    async def _keep_warm(self):
+        prewarm = getattr(self.service, "prewarm", None)
+        if prewarm is None:
+            return
+        while True:
+            try:
+                await prewarm()
+            except Exception as e:
+                logger.warning("Twilio prewarm failed: %s", e)
+            if self.prewarm_interval <= 0:
+                return
+            await asyncio.sleep(self.prewarm_interval)
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "failures": self.failures,
+            "detection_to_dial_seconds": self.latency.snapshot(),
+        }
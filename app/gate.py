@@ -0,0 +1,160 @@
+"""Local pre-filter that decides which transcript batches need a full Claude analysis"""
+import re
+from typing import Dict, NamedTuple, Tuple
+
+from app.config import ANALYSIS_GATE, ANALYSIS_GATE_THRESHOLD, ANALYSIS_GATE_FORCE_EVERY
+
+# Risky-topic terms and their weight. The analysis prompt is mostly about computer science,
+# so those terms carry the weight; ambiguous everyday words only count together.
+RISK_TERMS: Dict[str, float] = {
+    # Computer science and programming
+    "computer science": 1.0,
+    "programming": 1.0,
+    "coding": 1.0,
+    "algorithm": 1.0,
+    "data structure": 1.0,
+    "binary search": 1.0,
+    "binary tree": 1.0,
+    "search tree": 1.0,
+    "linked list": 1.0,
+    "hash map": 1.0,
+    "hash table": 1.0,
+    "recursion": 1.0,
+    "compiler": 1.0,
+    "leetcode": 1.0,
+    "github": 1.0,
+    "python": 1.0,
+    "javascript": 1.0,
+    "typescript": 1.0,
+    "java": 1.0,
+    "golang": 1.0,
+    "kubernetes": 1.0,
+    "docker": 1.0,
+    "linux": 1.0,
+    "sql": 1.0,
+    "database": 1.0,
+    "machine learning": 1.0,
+    "neural network": 1.0,
+    "big o": 1.0,
+    "stack overflow": 1.0,
+    "software engineer": 1.0,
+    "debugging": 1.0,
+    "backend": 1.0,
+    "frontend": 1.0,
+    "api": 0.7,
+    "code": 0.5,
+    "computer": 0.5,
+    "server": 0.5,
+    "bug": 0.5,
+    "react": 0.5,
+    "rust": 0.5,
+    "app": 0.3,
+    "tech": 0.3,
+    "startup": 0.3,
+    # Other topics the coach calls out
+    "anime": 1.0,
+    "one piece": 1.0,
+    "naruto": 1.0,
+    "crypto": 0.7,
+    "bitcoin": 0.7,
+    "my ex": 0.7,
+}
+
+WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+
+class GateDecision(NamedTuple):
+    """Whether a batch goes to Claude, its risk score and whether the check was forced"""
+    escalate: bool
+    score: float
+    forced: bool
+
+
+class LexiconScorer:
+    """
+    Sums the weights of risky terms in a batch (plurals included). The batch is split into
+    words once; a word that starts no term costs one dict lookup, so scoring is linear in
+    the batch length whatever the lexicon size.
+    """
+
+    def __init__(self, terms: Dict[str, float] = RISK_TERMS):
+        self.weights: Dict[Tuple[str, ...], float] = {}
+        self.longest: Dict[str, int] = {}  # first word -> words in the longest term it starts
+        for term, weight in terms.items():
+            words = tuple(term.lower().split())
+            for plural in ("", "s", "es"):
+                variant = words[:-1] + (words[-1] + plural,)
+                self.weights[variant] = weight
+                self.longest[variant[0]] = max(self.longest.get(variant[0], 0), len(variant))
+
+    def score(self, text: str) -> float:
+        words = WORD_PATTERN.findall(text.lower())
+        total = 0.0
+        index = 0
+        while index < len(words):
+            longest = self.longest.get(words[index])
+            if longest is not None:
+                for size in range(min(longest, len(words) - index), 0, -1):
+                    weight = self.weights.get(tuple(words[index:index + size]))
+                    if weight is not None:
+                        total += weight
+                        index += size - 1
+                        break
+            index += 1
+        return total
+
+
+class PassThroughScorer:
+    """Scores every batch as risky, i.e. no gating"""
+
+    def score(self, text: str) -> float:
+        return float("inf")
+
+
+SCORERS = {
+    "lexicon": LexiconScorer,
+    "off": PassThroughScorer,
+}
+
+
+class AnalysisGate:
+    """
+    Escalates a batch to analyze_date only when its risk score reaches `threshold`, or when
+    `force_every` batches in a row have been skipped (0 disables the forced check). Skipped
+    batches stay in the transcript, so a forced check still sees them.
+    """
+
+    def __init__(self, scorer, threshold: float = ANALYSIS_GATE_THRESHOLD,
+                 force_every: int = ANALYSIS_GATE_FORCE_EVERY):
+        self.scorer = scorer
+        self.threshold = threshold
+        self.force_every = force_every
+        self.counters = {"escalated": 0, "forced": 0, "skipped": 0}
+
+    def check(self, text: str, batches_since_analysis: int) -> GateDecision:
+        """Decide for one batch; `batches_since_analysis` counts the skipped batches before it"""
+        score = self.scorer.score(text)
+        if score >= self.threshold:
+            self.counters["escalated"] += 1
+            return GateDecision(True, score, False)
+        if self.force_every and batches_since_analysis + 1 >= self.force_every:
+            self.counters["forced"] += 1
+            return GateDecision(True, score, True)
+        self.counters["skipped"] += 1
+        return GateDecision(False, score, False)
+
+    def stats(self) -> Dict:
+        """Counters plus the share of batches that did not need an LLM call"""
+        total = sum(self.counters.values())
+        return {
+            **self.counters,
+            "total": total,
+            "skip_rate": self.counters["skipped"] / total if total else 0.0,
+        }
+
+
+def build_gate(kind: str = ANALYSIS_GATE) -> AnalysisGate:
+    """Gate with the scorer named by ANALYSIS_GATE ("lexicon" or "off")"""
+    if kind not in SCORERS:
+        raise ValueError(f"Unknown ANALYSIS_GATE {kind!r}, expected one of {sorted(SCORERS)}")
+    return AnalysisGate(SCORERS[kind]())
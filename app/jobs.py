@@ -0,0 +1,344 @@
+"""Persistent background job queue for end-of-date processing"""
+import asyncio
+import json
+import logging
+import os
+import random
+import secrets
+import sqlite3
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.database import get_connection, save_summary, transaction
+from app.services import is_summary_failure
+from app.config import (
+    DB_PATH,
+    JOB_WORKERS,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE_DELAY,
+    JOB_POLL_INTERVAL,
+    JOB_LEASE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DATE_END_JOB = "date_end"
+
+
+class Job:
+    """A claimed job row"""
+
+    def __init__(self, job_id: int, kind: str, uid: str, payload: Dict, attempts: int, max_attempts: int):
+        self.id = job_id
+        self.kind = kind
+        self.uid = uid
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+
+
+def date_end_payload(date) -> Dict:
+    """The date_end job's input: the finalized date's transcript and times"""
+    return {
+        "date_id": date.date_id,
+        "transcript": date.accumulated_transcript,
+        "start_time": date.start_time.isoformat(),
+        "end_time": date.end_time.isoformat() if date.end_time else None,
+    }
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue; jobs survive restarts and are retried with backoff.
+
+    Several processes may share one queue. A claimed job is leased to its claimant (`owner`)
+    until `lease_expires`; the worker renews the lease while the handler runs, and only a job
+    whose lease ran out (its process died) goes back to pending for someone else to claim.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 retry_base_delay: float = JOB_RETRY_BASE_DELAY, lease_timeout: float = JOB_LEASE_TIMEOUT):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.lease_timeout = lease_timeout
+        self.owner = f"{os.getpid()}-{secrets.token_hex(4)}"
+        self.wakeup = asyncio.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        return get_connection(self.db_path)
+
+    def init(self):
+        """Create the jobs table (adding the lease columns to one from before leases)"""
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                uid TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                last_error TEXT,
+                run_after REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                lease_expires REAL
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column in ("owner TEXT", "lease_expires REAL"):
+            if column.split()[0] not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)")
+
+    def _insert(self, kind: str, uid: str, payload: Dict) -> int:
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.execute("""
+            INSERT INTO jobs (kind, uid, payload, status, attempts, max_attempts, run_after, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)
+        """, (kind, uid, json.dumps(payload), PENDING, self.max_attempts, now, now, now))
+        return cursor.lastrowid
+
+    def enqueue(self, kind: str, uid: str, payload: Dict) -> int:
+        """Persist a new job and wake the workers; returns the job id"""
+        job_id = self._insert(kind, uid, payload)
+        self.wakeup.set()
+        return job_id
+
+    async def submit(self, kind: str, uid: str, payload: Dict) -> int:
+        """enqueue() for the event loop: the insert runs in a worker thread"""
+        job_id = await asyncio.to_thread(self._insert, kind, uid, payload)
+        self.wakeup.set()
+        return job_id
+
+    def enqueue_date_end(self, uid: str, date) -> int:
+        """Queue summary generation and OMI upload for a finalized DateObject"""
+        return self.enqueue(DATE_END_JOB, uid, date_end_payload(date))
+
+    async def submit_date_end(self, uid: str, date) -> int:
+        """enqueue_date_end() for the event loop"""
+        return await self.submit(DATE_END_JOB, uid, date_end_payload(date))
+
+    def claim(self) -> Optional[Job]:
+        """Atomically take and lease the oldest runnable job, or None if nothing is due"""
+        now = time.time()
+        with transaction(self.db_path) as conn:
+            # Jobs of a process that died (or rows from before leases) are run again
+            requeued = conn.execute("""
+                UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ?)
+            """, (PENDING, now, RUNNING, now)).rowcount
+            row = conn.execute("""
+                SELECT id, kind, uid, payload, attempts, max_attempts FROM jobs
+                WHERE status = ? AND run_after <= ?
+                ORDER BY run_after, id LIMIT 1
+            """, (PENDING, now)).fetchone()
+            if row is not None:
+                conn.execute("""
+                    UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_expires = ?, updated_at = ?
+                    WHERE id = ?
+                """, (RUNNING, self.owner, now + self.lease_timeout, now, row[0]))
+        if requeued:
+            logger.warning("Requeued %d jobs whose worker stopped renewing their lease", requeued)
+        if row is None:
+            return None
+        return Job(row[0], row[1], row[2], json.loads(row[3]), row[4] + 1, row[5])
+
+    def renew(self, job: Job) -> bool:
+        """Extend our lease on a running job; False if it was lost (expired and claimed by another worker)"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = ? AND owner = ?",
+            (now + self.lease_timeout, now, job.id, RUNNING, self.owner)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, job: Job):
+        """Hand a job we stopped running back to pending, without counting the attempt"""
+        conn = self._connect()
+        conn.execute("""
+            UPDATE jobs SET status = ?, attempts = attempts - 1, owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE id = ? AND status = ? AND owner = ?
+        """, (PENDING, time.time(), job.id, RUNNING, self.owner))
+        self.wakeup.set()
+
+    def save_progress(self, job: Job):
+        """Persist the job payload so a retry resumes after the completed steps"""
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET payload = ?, updated_at = ? WHERE id = ? AND owner = ?",
+            (json.dumps(job.payload), time.time(), job.id, self.owner)
+        )
+
+    def complete(self, job: Job):
+        """Mark a job as done (unless its lease was lost to another worker)"""
+        conn = self._connect()
+        conn.execute("""
+            UPDATE jobs SET status = ?, last_error = NULL, lease_expires = NULL, updated_at = ?
+            WHERE id = ? AND owner = ?
+        """, (DONE, time.time(), job.id, self.owner))
+
+    def retry_or_fail(self, job: Job, error: str):
+        """Reschedule a failed job with exponential backoff, or mark it failed when out of attempts"""
+        now = time.time()
+        conn = self._connect()
+        if job.attempts >= job.max_attempts:
+            conn.execute("""
+                UPDATE jobs SET status = ?, last_error = ?, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND owner = ?
+            """, (FAILED, error, now, job.id, self.owner))
+        else:
+            delay = self.retry_base_delay * (2 ** (job.attempts - 1))
+            delay += random.uniform(0, delay / 2)
+            conn.execute("""
+                UPDATE jobs SET status = ?, last_error = ?, run_after = ?, owner = NULL, lease_expires = NULL,
+                                updated_at = ?
+                WHERE id = ? AND owner = ?
+            """, (PENDING, error, now + delay, now, job.id, self.owner))
+
+    def status(self, limit: int = 50) -> Dict:
+        """Job counts by status plus the most recent pending, running and failed jobs"""
+        conn = self._connect()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        rows = conn.execute("""
+            SELECT id, kind, uid, status, attempts, max_attempts, last_error, run_after, created_at, updated_at,
+                   owner, lease_expires
+            FROM jobs WHERE status != ? ORDER BY updated_at DESC LIMIT ?
+        """, (DONE, limit)).fetchall()
+
+        jobs: List[Dict] = [
+            {
+                "id": row[0],
+                "kind": row[1],
+                "uid": row[2],
+                "status": row[3],
+                "attempts": row[4],
+                "max_attempts": row[5],
+                "last_error": row[6],
+                "run_after": row[7],
+                "created_at": row[8],
+                "updated_at": row[9],
+                "owner": row[10],
+                "lease_expires": row[11],
+            }
+            for row in rows
+        ]
+        return {"counts": counts, "jobs": jobs}
+
+
+JobHandler = Callable[[Job, JobQueue], Awaitable[None]]
+
+
+def date_end_handler(letta_service, omi_service) -> JobHandler:
+    """
+    Build the handler for date_end jobs: Letta summary, local history, then OMI upload.
+    The summary is checkpointed in the payload so a retry never re-sends the date to the agent.
+    """
+    async def handle(job: Job, queue: JobQueue):
+        payload = job.payload
+        if not payload.get("summary"):
+            summary = await letta_service.process_date_end(job.uid, payload["transcript"])
+            if is_summary_failure(summary):
+                raise RuntimeError(summary)
+            logger.info("Generated date summary via Letta", extra={"uid": job.uid})
+            payload["summary"] = summary
+            await asyncio.to_thread(save_summary, job.uid, summary, payload.get("date_id"))
+            await asyncio.to_thread(queue.save_progress, job)
+
+        # Send to OMI for external memory storage; the key makes a retried upload of this date a no-op
+        idempotency_key = f"{job.uid}:{payload.get('date_id') or job.id}"
+        if not await omi_service.create_memory(job.uid, payload["summary"], idempotency_key):
+            raise RuntimeError("OMI memory upload failed")
+
+    return handle
+
+
+class JobWorkerPool:
+    """In-process asyncio workers draining a JobQueue"""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler],
+                 concurrency: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Spawn the worker tasks on the running event loop"""
+        self.queue.wakeup = asyncio.Event()
+        self.tasks = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+
+    async def stop(self):
+        """Cancel the workers; jobs they were running go back to pending for another process to claim"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _worker(self, index: int):
+        while True:
+            # SQLite work runs in worker threads, never on the event loop serving requests
+            job = await self._claim()
+            if job is None:
+                self.queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.queue.wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    async def _claim(self) -> Optional[Job]:
+        claim = asyncio.ensure_future(asyncio.to_thread(self.queue.claim))
+        try:
+            return await asyncio.shield(claim)
+        except asyncio.CancelledError:
+            # The claim still commits in its thread: give back whatever it took
+            job = await claim
+            if job is not None:
+                await asyncio.to_thread(self.queue.release, job)
+            raise
+
+    async def run_job(self, job: Job):
+        """Run one claimed job through its handler and record the outcome"""
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            await asyncio.to_thread(self.queue.retry_or_fail, job, f"No handler for job kind '{job.kind}'")
+            return
+        heartbeat = asyncio.create_task(self._keep_lease(job))
+        try:
+            await handler(job, self.queue)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(self.queue.release, job)
+            raise
+        except Exception as e:
+            logger.warning(
+                "Job %d (%s) attempt %d/%d failed: %s", job.id, job.kind, job.attempts, job.max_attempts, e,
+                extra={"uid": job.uid},
+            )
+            await asyncio.to_thread(self.queue.retry_or_fail, job, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+        await asyncio.to_thread(self.queue.complete, job)
+        logger.info("Job %d (%s) completed", job.id, job.kind, extra={"uid": job.uid})
+
+    async def _keep_lease(self, job: Job):
+        """Renew the job's lease while its handler runs, so no other process takes it over"""
+        while True:
+            await asyncio.sleep(self.queue.lease_timeout / 3)
+            if not await asyncio.to_thread(self.queue.renew, job):
+                logger.warning("Lost the lease on job %d (%s)", job.id, job.kind, extra={"uid": job.uid})
+                return
@@ -1,18 +1,124 @@
 """FastAPI application and route handlers"""
+import asyncio
+import logging
 import re
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+from app.actors import ActorRegistry, MailboxFull
+from app.coalesce import AnalysisCoalescer
+from app.commands import (
+    code_word_conflict,
+    get_command_matcher,
+    EDIT_CODE_WORD,
+    EDIT_PHONE_NUMBER,
+    CODE_WORD,
+    START_DATE,
+    END_DATE,
+    STUCK,
+)
+from app.config import SHARD_WORKER, STARTUP_PREWARM, TIP_CONTEXT_TOKENS
+from app.database import init_database, close_connections
+from app.dedup import WarningDeduper
+from app.emergency import EmergencyLane
+from app.gate import build_gate
+from app.jobs import JobQueue, JobWorkerPool, DATE_END_JOB, date_end_handler
+from app.logs import configure_logging
+from app.metrics import (
+    ACTIVE_DATES,
+    BATCHES_SKIPPED,
+    CACHED_USERS,
+    CONTENT_TYPE,
+    NOTIFICATIONS,
+    REGISTRY,
+    WARNINGS_SUPPRESSED,
+    MetricsMiddleware,
+    stage,
+)
+from app.models import DateObject, User
+from app.shard import rendezvous_owner
+from app.store import SessionStore
+from app.tips import TipPrecomputer
+from app.services import (
+    TIP_FALLBACK,
+    prewarm_clients,
+    async_claude_service as claude_service,
+    async_twilio_service as twilio_service,
+    async_omi_service as omi_service,
+    async_letta_service as letta_service,
+)
+
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Persistent queue for end-of-date summary + OMI upload
+job_queue = JobQueue()
 
-from app.database import init_database
-from app.models import get_or_create_user, DateObject
-from app.services import claude_service, twilio_service, omi_service, letta_service
+# User/date state shared through SQLite so several workers can serve the same users
+session_store = SessionStore()
+
+# Local pre-filter deciding which batches are worth an analyze_date call
+analysis_gate = build_gate()
+
+# Drops warnings that repeat one the user already got on this date
+warning_deduper = WarningDeduper()
+
+# Emergency calls run on their own thread and event loop, never behind analysis traffic
+emergency_lane = EmergencyLane(twilio_service)
+REGISTRY.register(
+    "rizz_emergency_detection_to_dial_seconds",
+    "Code word detected to Twilio accepting the emergency call",
+    emergency_lane.latency,
+)
+
+# Gauges read from the session cache when /metrics is scraped, so the request path pays nothing
+CACHED_USERS.set_function(lambda: len(session_store.cache))
+ACTIVE_DATES.set_function(
+    lambda: sum(1 for user in list(session_store.cache.values()) if user.current_date_id is not None)
+)
 
 
-# Initialize database on startup
-init_database()
+def init_storage():
+    """Create the SQLite tables if missing (run at startup rather than on import)"""
+    init_database()
+    job_queue.init()
+    session_store.init()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the tables, then run the background job workers for the lifetime of the app"""
+    init_storage()
+    prewarm = None
+    if STARTUP_PREWARM:
+        # Off the event loop: importing an SDK there on a first request would stall every user
+        prewarm = asyncio.create_task(asyncio.to_thread(
+            prewarm_clients, claude_service, letta_service, omi_service, twilio_service
+        ))
+    workers = JobWorkerPool(job_queue, {
+        DATE_END_JOB: date_end_handler(letta_service, omi_service),
+    })
+    emergency_lane.start()
+    workers.start()
+    session_store.start()
+    yield
+    if prewarm is not None:
+        await asyncio.gather(prewarm, return_exceptions=True)
+    await session_actors.stop()
+    await emergency_lane.stop()
+    await analysis_coalescer.stop()
+    await tip_precomputer.stop()
+    await workers.stop()
+    await session_store.stop()
+    close_connections()
+
 
 # Create FastAPI app
-app = FastAPI(title="The Rizzistant", description="Real-time Dating Coach")
+app = FastAPI(title="The Rizzistant", description="Real-time Dating Coach", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -23,6 +129,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request time for /metrics
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get('/')
 def root():
@@ -33,91 +142,187 @@ def root():
 @app.post("/webhook")
 def webhook(memory: dict, uid: str):
     """Webhook endpoint for receiving memories"""
-    print(memory)
-    print(uid)
+    logger.info("Webhook memory: %s", memory, extra={"uid": uid})
     return {"message": "we got it"}
 
 
+@app.get("/metrics")
+def metrics():
+    """Stage, external call and request latency histograms, counters and gauges (Prometheus text format)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/jobs")
+def jobs_status(limit: int = 50):
+    """Background job counts plus recent pending, running and failed jobs"""
+    return job_queue.status(limit)
+
+
+@app.get("/analysis")
+async def analysis_stats():
+    """analyze_date calls, early stops on should_notify false, parse failures and output tokens"""
+    return claude_service.analysis_stats.snapshot()
+
+
+@app.get("/sessions")
+async def session_stats():
+    """Cached users and their estimated memory, evictions, reloads and archived dates"""
+    # async so it runs on the event loop that owns the cache, not beside it in the threadpool
+    return session_store.stats()
+
+
+@app.get("/tips")
+async def tip_stats():
+    """Speculative tip hit rate, stale candidates, generations and budget skips"""
+    return tip_precomputer.stats()
+
+
+@app.get("/emergency")
+def emergency_stats():
+    """Emergency calls placed, retried and failed, with the detection-to-dial latency histogram"""
+    return emergency_lane.stats()
+
+
+@app.get("/warnings")
+async def warning_stats():
+    """Warnings sent, and suppressed as a repeat of the same reason (cooldown) or of similar text"""
+    return warning_deduper.stats()
+
+
+@app.post("/shard/release")
+async def shard_release(workers: List[str]):
+    """After a resize to `workers`: drain, flush and drop the cached users another shard worker now owns"""
+    if SHARD_WORKER is None:
+        raise HTTPException(status_code=409, detail="not running as a shard worker")
+    uids = [uid for uid in list(session_store.cache) if rendezvous_owner(uid, workers) != SHARD_WORKER]
+    await asyncio.gather(*(session_actors.retire(uid) for uid in uids))
+    for uid in uids:
+        analysis_coalescer.discard(uid)
+    # Their tips go with them (see forget_user)
+    await session_store.release(uids)
+    logger.info("Released %d users to other shard workers", len(uids))
+    return {"worker": SHARD_WORKER, "released": len(uids)}
+
+
+@app.get("/gate")
+async def gate_stats():
+    """Batches escalated to analyze_date, forced checks and batches skipped by the pre-filter"""
+    return analysis_gate.stats()
+
+
+async def end_current_date(user: User):
+    """Finalize the user's active date and queue its summary and OMI upload"""
+    current_date = user.dates[user.current_date_id]
+    current_date.finalize()
+    analysis_coalescer.discard(user.uid)
+    tip_precomputer.discard(user.uid)
+
+    # Summary generation (Letta) and OMI upload run on the background job workers
+    if current_date.transcript.has_content():
+        job_id = await job_queue.submit_date_end(user.uid, current_date)
+        logger.info("Queued date summary job %d", job_id, extra={"uid": user.uid})
+
+    user.current_date_id = None
+
+
 @app.post("/livetranscript")
-def livetranscript(transcript: dict, uid: str):
+async def livetranscript(transcript: dict, uid: str):
     """
     Process live transcript segments from the user.
+    Batches for one uid are handled one at a time, in arrival order, by that user's actor.
+    Conversation analysis is debounced per uid: a batch merged into a later analysis returns null.
+    """
+    try:
+        result = await session_actors.submit(uid, transcript)
+    except MailboxFull as e:
+        BATCHES_SKIPPED.labels("mailbox_full").inc()
+        raise HTTPException(status_code=429, detail=str(e))
+
+    # Other workers may serve this user's next batch, so make this one visible to them first
+    await session_store.sync()
+
+    # Analysis runs outside the actor, so commands in later batches are not held up by it
+    if isinstance(result, asyncio.Future):
+        result = await result
+        # The analysis recorded its warning and context on the date; flush that too before answering
+        await session_store.sync()
+    if result and result.get("should_notify"):
+        NOTIFICATIONS.labels(result.get("event_type", "warning")).inc()
+    return result
+
+
+async def process_transcript(uid: str, transcript: dict):
+    """
+    Handle one transcript batch for a user.
     Handles commands (start date, end date, code word) and analyzes conversation.
     """
     # Get or create user
-    user = get_or_create_user(uid)
+    user = await session_store.get(uid)
+
+    logger.debug("Received %d segments in this request", len(transcript["segments"]), extra={"uid": uid})
 
-    print(f"Received {len(transcript['segments'])} segments in this request")
+    segment_texts = [segment["text"] for segment in transcript["segments"]]
 
-    # First pass: check for start/end date commands and code word
-    for segment in transcript["segments"]:
-        text = segment["text"]
-        text_lower = text.lower()
+    # First pass: find every command in the batch with one scan, then handle them in order
+    with stage("command_parse"):
+        scan = get_command_matcher(user.code_word).scan(segment_texts, user.command_carry)
+    user.command_carry = scan.carry
 
+    for command in scan.commands():
         # Check for "omi edit code word" command
-        if "edit code word" in text_lower:
-            parts = text_lower.split("edit code word")
-            if len(parts) > 1 and parts[1].strip():
-                remaining_text = parts[1].strip()
-                words = remaining_text.split()
-                if len(words) > 0:
-                    new_code_word = words[0]
-                    user.code_word = new_code_word
-                    print(f"Updated code word for user {uid} to: {new_code_word}")
+        if command.kind == EDIT_CODE_WORD:
+            words = scan.text_after(command).split()
+            if len(words) > 0:
+                new_code_word = words[0]
+                # A code word inside a command phrase would never fire (or fire on the command)
+                conflict = code_word_conflict(new_code_word)
+                if conflict is not None:
+                    logger.info("Rejected code word %s (collides with '%s')", new_code_word, conflict,
+                                extra={"uid": uid})
                     return {
-                        "message": f"Code word has been updated to: {new_code_word}",
+                        "message": f"Can't use '{new_code_word}' as the code word, it is part of the "
+                                   f"'{conflict}' command. Your code word is still: {user.code_word}",
                         "should_notify": True,
-                        "event_type": "code_word_updated"
+                        "event_type": "code_word_rejected"
                     }
+                user.code_word = new_code_word
+                logger.info("Updated code word to: %s", new_code_word, extra={"uid": uid})
+                return {
+                    "message": f"Code word has been updated to: {new_code_word}",
+                    "should_notify": True,
+                    "event_type": "code_word_updated"
+                }
 
         # Check for "edit phone number" command
-        if "edit phone number" in text_lower:
-            parts = text_lower.split("edit phone number")
-            if len(parts) > 1 and parts[1].strip():
-                remaining_text = parts[1].strip()
-                # Extract digits only from the remaining text
-                digits = re.sub(r'\D', '', remaining_text)
-                # Check if we have exactly 10 digits
-                if len(digits) >= 10:
-                    phone_number = digits[:10]  # Take first 10 digits
-                    user.phone_number = phone_number
-                    print(f"Updated phone number for user {uid} to: {phone_number}")
-                    return {
-                        "message": f"Phone number has been updated to: {phone_number}",
-                        "event_type": "phone_number_updated"
-                    }
-            print(f"Unable to update phone number for user {uid}. We heard: {remaining_text}")
+        elif command.kind == EDIT_PHONE_NUMBER:
+            remaining_text = scan.text_after(command).strip()
+            # Extract digits only from the remaining text
+            digits = re.sub(r'\D', '', remaining_text)
+            # Check if we have exactly 10 digits
+            if len(digits) >= 10:
+                phone_number = digits[:10]  # Take first 10 digits
+                user.phone_number = phone_number
+                logger.info("Updated phone number to: %s", phone_number, extra={"uid": uid})
+                return {
+                    "message": f"Phone number has been updated to: {phone_number}",
+                    "event_type": "phone_number_updated"
+                }
+            logger.info("Unable to update phone number. We heard: %s", remaining_text, extra={"uid": uid})
             return {
                 "message": f"Unable to update phone number. We received: {remaining_text}",
                 "event_type": "phone_number_not_updated"
             }
 
         # Check if code word is said (emergency exit)
-        if user.code_word.lower() in text_lower:
-            print(f"Code word '{user.code_word}' detected for user {uid}")
+        elif command.kind == CODE_WORD:
+            logger.warning("Code word '%s' detected", user.code_word, extra={"uid": uid})
 
-            # Make the emergency phone call using user's saved phone number
-            twilio_service.make_emergency_call(user.phone_number)
+            # Dial the user's saved phone number on the priority lane; ending the date doesn't wait for it
+            emergency_lane.dispatch(user.phone_number)
 
             # End the date if active
             if user.current_date_id and user.current_date_id in user.dates:
-                current_date = user.dates[user.current_date_id]
-                current_date.finalize()
-
-                # Generate summary with tips using Letta
-                if current_date.accumulated_transcript.strip():
-                    # Use Letta agent to generate summary with full historical context
-                    # Letta automatically has access to all previous dates via its memory
-                    summary = letta_service.process_date_end(
-                        uid,
-                        current_date.accumulated_transcript
-                    )
-                    print(f"Generated date summary for user {uid} via Letta")
-
-                    # Send to OMI for external memory storage
-                    omi_service.create_memory(uid, summary)
-
-                user.current_date_id = None
+                await end_current_date(user)
 
             return {
                 "message": "Date ended! Your date summary has been saved.",
@@ -126,12 +331,12 @@ def livetranscript(transcript: dict, uid: str):
             }
 
         # Check if "start date" is said
-        if "start date" in text_lower:
-            print(f"Starting new date for user {uid}")
+        elif command.kind == START_DATE:
+            logger.info("Starting new date", extra={"uid": uid})
             user.date_counter += 1
-            date_id = f"date_{user.date_counter}"
-            user.dates[date_id] = DateObject(date_id)
-            user.current_date_id = date_id
+            date = DateObject(f"date_{user.date_counter}")
+            user.dates[date.date_id] = date
+            user.current_date_id = date.date_id
 
             return {
                 "message": "Date started! Good luck and have fun!",
@@ -140,27 +345,10 @@ def livetranscript(transcript: dict, uid: str):
             }
 
         # Check if "end date" is said
-        if "end date" in text_lower:
-            print(f"Ending date for user {uid}")
+        elif command.kind == END_DATE:
+            logger.info("Ending date", extra={"uid": uid})
             if user.current_date_id and user.current_date_id in user.dates:
-                current_date = user.dates[user.current_date_id]
-                current_date.finalize()
-
-                # Generate summary with tips using Letta
-                if current_date.accumulated_transcript.strip():
-                    # Use Letta agent to generate summary with full historical context
-                    # Letta automatically has access to all previous dates via its memory
-                    summary = letta_service.process_date_end(
-                        uid,
-                        current_date.accumulated_transcript
-                    )
-                    print(f"Generated date summary for user {uid} via Letta")
-
-                    # Send to OMI for external memory storage
-                    print(f"Sending summary to OMI: {summary}")
-                    omi_service.create_memory(uid, summary)
-
-                user.current_date_id = None
+                await end_current_date(user)
 
                 return {
                     "message": "Date ended! Your date summary has been saved.",
@@ -174,48 +362,178 @@ def livetranscript(transcript: dict, uid: str):
 
         if current_date.is_active:
             # Concatenate all segment texts
-            concatenated_text = " ".join([segment["text"] for segment in transcript["segments"]])
+            concatenated_text = " ".join(segment_texts)
 
             if concatenated_text.strip():
                 current_date.count += 1
-                print(f"got transcript batch {current_date.count}")
+                logger.debug("Got transcript batch %d", current_date.count, extra={"uid": uid})
 
                 # Add to accumulated transcript
-                current_date.add_transcript(concatenated_text)
+                current_date.add_transcript(concatenated_text, transcript["segments"])
 
                 # Check for "yeah okay so" phrase (user seems stuck)
-                text_normalized = re.sub(r'[^\w\s]', '', concatenated_text.lower())
-                if "yeah okay so" in text_normalized:
-                    print(f"Detected 'yeah okay so' - generating conversation tip")
-                    tip = claude_service.generate_conversation_tip(
-                        current_date.accumulated_transcript
-                    )
+                if scan.has(STUCK):
+                    logger.info("Detected 'yeah okay so' - generating conversation tip", extra={"uid": uid})
+                    # A fresh precomputed tip answers at once; otherwise generate one now
+                    tip = tip_precomputer.take(uid, current_date)
+                    if tip is None:
+                        tip = await claude_service.generate_conversation_tip(
+                            current_date.transcript.tail(TIP_CONTEXT_TOKENS)
+                        )
                     return {
                         "message": tip,
                         "should_notify": True,
                         "event_type": "conversation_tip"
                     }
 
-                # Analyze conversation with Claude
-                analysis = claude_service.analyze_date(
-                    concatenated_text,
-                    current_date.accumulated_transcript,
-                    current_date.previous_warnings
-                )
-                print(f"analyzed batch {current_date.count}")
+                # Keep a candidate tip ready for the next time the user gets stuck
+                tip_precomputer.observe(uid, current_date)
+
+                # Only batches the local pre-filter flags (or a periodic forced check) go to Claude
+                with stage("gate"):
+                    decision = analysis_gate.check(concatenated_text, current_date.batches_since_analysis)
+                if not decision.escalate:
+                    current_date.batches_since_analysis += 1
+                    BATCHES_SKIPPED.labels("gate").inc()
+                    logger.debug(
+                        "Skipped batch %d (risk score %.1f)", current_date.count, decision.score, extra={"uid": uid}
+                    )
+                    return None
+                current_date.batches_since_analysis = 0
 
-                # If intervention is needed, send warning
-                if analysis.get("should_notify", False):
-                    warning_message = analysis.get("message", "Please change the topic!")
-                    reason = analysis.get("reason", "")
+                # Bursts are merged into one analysis; the route awaits the result off the actor
+                return analysis_coalescer.submit(uid, concatenated_text)
 
-                    # Save warning to prevent repetition
-                    current_date.add_warning(warning_message, reason)
+    # return {"message": "transcript processed", "should_notify": False}
 
-                    return {
-                        "message": warning_message,
-                        "reason": reason,
-                        "should_notify": True
-                    }
 
-    # return {"message": "transcript processed", "should_notify": False}
+def active_date(user: User, date_id: Optional[str] = None) -> Optional[DateObject]:
+    """The user's current date if it is still active (and is `date_id`, when given)"""
+    current_date = user.dates.get(user.current_date_id) if user.current_date_id else None
+    if current_date is None or not current_date.is_active:
+        return None
+    if date_id is not None and current_date.date_id != date_id:
+        return None
+    return current_date
+
+
+async def analyze_batches(uid: str, text: str):
+    """
+    Analyze the merged text of one or more batches against the user's active date.
+    Reading the date and recording the outcome are messages to the user's actor, so they are
+    ordered with the user's batches; only the Claude call runs outside it.
+    """
+    prepared = await session_actors.submit(uid, lambda: prepare_analysis(uid, text), wait=True)
+    if prepared is None:
+        return None
+    date_id, context = prepared
+
+    analysis = await claude_service.analyze_date(
+        text,
+        context.recent_tail,
+        context.warnings,
+        earlier_summary=context.summary,
+        cached_transcript=context.cached_chunks
+    )
+
+    superseded = False
+
+    async def record():
+        return None if superseded else await record_analysis(uid, date_id, analysis)
+
+    try:
+        return await session_actors.submit(uid, record, wait=True)
+    except asyncio.CancelledError:
+        # A newer batch superseded this analysis and reruns its text, so nothing is recorded
+        superseded = True
+        raise
+
+
+async def prepare_analysis(uid: str, text: str):
+    """On the actor: the active date's id and its token-budgeted context for the analysis"""
+    user = await session_store.get(uid)
+    current_date = active_date(user)
+    if current_date is None:
+        return None
+
+    # Analyze conversation with Claude over a token-budgeted view of the date
+    with stage("context_build"):
+        context = current_date.context.build(
+            text,
+            current_date.transcript,
+            current_date.previous_warnings
+        )
+    logger.debug(
+        "Analyzing through batch %d (~%d prompt tokens)", current_date.count, context.estimated_tokens,
+        extra={"uid": uid},
+    )
+    return current_date.date_id, context
+
+
+async def record_analysis(uid: str, date_id: str, analysis: dict):
+    """On the actor: update the analyzed date and turn the analysis into the warning to send, if any"""
+    user = await session_store.get(uid)
+    current_date = active_date(user, date_id)
+    if current_date is None:
+        return None
+
+    # Periodically compress older transcript into the summary, off the request path
+    current_date.context.after_batch(current_date.transcript, claude_service)
+
+    # If intervention is needed, send warning
+    if analysis.get("should_notify", False):
+        warning_message = analysis.get("message", "Please change the topic!")
+        reason = analysis.get("reason", "")
+
+        # The model sometimes repeats itself; don't roast the user twice for the same thing
+        suppressed = warning_deduper.check(current_date.previous_warnings, warning_message, reason)
+        if suppressed:
+            WARNINGS_SUPPRESSED.labels(suppressed).inc()
+            logger.info("Suppressed %s warning (%s): %s", suppressed, reason, warning_message, extra={"uid": uid})
+            return None
+
+        # Save warning to prevent repetition
+        current_date.add_warning(warning_message, reason)
+
+        return {
+            "message": warning_message,
+            "reason": reason,
+            "should_notify": True
+        }
+
+
+async def handle_session_message(uid: str, message):
+    """Actor handler: a transcript batch, or a coroutine function that reads or changes the user's state"""
+    if callable(message):
+        return await message()
+    return await process_transcript(uid, message)
+
+
+# One ordered mailbox per active uid; different users are processed concurrently
+session_actors = ActorRegistry(handle_session_message)
+
+# Debounces each user's escalated batches into merged analyze_date calls
+analysis_coalescer = AnalysisCoalescer(analyze_batches)
+
+
+async def precompute_tip(uid: str, text: str):
+    """Background tip generation for TipPrecomputer; None on failure so the fallback is never cached"""
+    tip = await claude_service.generate_conversation_tip(text)
+    return None if tip == TIP_FALLBACK else tip
+
+
+tip_precomputer = TipPrecomputer(precompute_tip)
+
+
+def session_in_use(uid: str) -> bool:
+    """Whether the user still has batches queued or an analysis pending (so must stay cached)"""
+    return uid in session_actors.actors or uid in analysis_coalescer.states
+
+
+def forget_user(uid: str):
+    """Drop the user's speculative tip once the session store evicts or releases them"""
+    tip_precomputer.discard(uid)
+
+
+session_store.pinned = session_in_use
+session_store.on_evict = forget_user
@@ -0,0 +1,265 @@
+"""In-process counters, gauges and histograms, exposed in the Prometheus text format"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the default latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """Monotonic count; `set_function` instead reads an existing counter at scrape time"""
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(Counter):
+    """Value that goes up and down (in-flight calls), or is computed at scrape time (active dates)"""
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram:
+    """Fixed-bucket histogram; the last bucket counts everything above the largest bound"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            self.max = max(self.max, seconds)
+
+    def time(self) -> "Timer":
+        """Context manager observing the seconds spent in its block"""
+        return Timer(self)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (the observed max for the overflow bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class Timer:
+    """Times a block into a histogram, optionally counting it in an in-flight gauge meanwhile"""
+
+    __slots__ = ("histogram", "in_flight", "start")
+
+    def __init__(self, histogram: Histogram, in_flight: Optional[Gauge] = None):
+        self.histogram = histogram
+        self.in_flight = in_flight
+
+    def __enter__(self):
+        if self.in_flight is not None:
+            self.in_flight.inc()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        if self.in_flight is not None:
+            self.in_flight.dec()
+        return False
+
+
+class Family:
+    """A named metric and its children, one per combination of label values"""
+
+    def __init__(self, kind: str, name: str, help: str, labelnames: Sequence[str], factory: Callable):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """The child for these label values (created on first use)"""
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self.children.setdefault(values, self.factory())
+        return child
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(child.buckets, child.counts):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{self._label_text(values, le)} {child.count}")
+                lines.append(f"{self.name}_sum{self._label_text(values)} {child.sum}")
+                lines.append(f"{self.name}_count{self._label_text(values)} {child.count}")
+            else:
+                lines.append(f"{self.name}{self._label_text(values)} {child.get()}")
+        return lines
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    """
+    The metrics of this process. counter(), gauge() and histogram() return the metric itself
+    when it has no labels, or its Family (use .labels(...)) when it does; register() exposes
+    a histogram created elsewhere.
+    """
+
+    def __init__(self):
+        self.families: Dict[str, Family] = {}
+
+    def _add(self, kind: str, name: str, help: str, labels: Sequence[str], factory: Callable):
+        if name in self.families:
+            raise ValueError(f"metric {name} already registered")
+        family = self.families[name] = Family(kind, name, help, labels, factory)
+        return family if labels else family.labels()
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()):
+        return self._add("counter", name, help, labels, Counter)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()):
+        return self._add("gauge", name, help, labels, Gauge)
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS):
+        return self._add("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def register(self, name: str, help: str, histogram: Histogram):
+        self.families.pop(name, None)
+        self._add("histogram", name, help, (), lambda: histogram)
+
+    def render(self) -> str:
+        lines = []
+        for family in list(self.families.values()):
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "rizz_request_seconds", "HTTP request handling time by route", labels=("method", "route"))
+STAGE_SECONDS = REGISTRY.histogram(
+    "rizz_stage_seconds", "Time spent in one in-process stage of transcript handling", labels=("stage",))
+EXTERNAL_CALL_SECONDS = REGISTRY.histogram(
+    "rizz_external_call_seconds", "Claude, Letta, OMI and Twilio call time", labels=("service", "call"))
+EXTERNAL_CALL_ERRORS = REGISTRY.counter(
+    "rizz_external_call_errors_total", "External calls that raised", labels=("service", "call"))
+EXTERNAL_CALLS_IN_FLIGHT = REGISTRY.gauge(
+    "rizz_external_calls_in_flight", "External calls currently waiting on the service", labels=("service",))
+NOTIFICATIONS = REGISTRY.counter(
+    "rizz_notifications_total", "Responses that notified the user", labels=("event_type",))
+BATCHES_SKIPPED = REGISTRY.counter(
+    "rizz_batches_skipped_total", "Transcript batches not sent to analyze_date", labels=("reason",))
+WARNINGS_SUPPRESSED = REGISTRY.counter(
+    "rizz_warnings_suppressed_total", "Warnings not sent because they repeated an earlier one", labels=("why",))
+ANALYSIS_PARSE_FAILURES = REGISTRY.counter(
+    "rizz_analysis_parse_failures_total", "analyze_date answers without a valid tool call")
+# Read at scrape time from the session cache (see app.main)
+ACTIVE_DATES = REGISTRY.gauge("rizz_active_dates", "Dates in progress among the cached users")
+CACHED_USERS = REGISTRY.gauge("rizz_cached_users", "Users held in the session cache")
+
+
+def stage(name: str) -> Timer:
+    """Time an in-process stage: `with stage("command_parse"): ...`"""
+    return Timer(STAGE_SECONDS.labels(name))
+
+
+class ExternalCall(Timer):
+    """Time an external call and count it in flight; calls that raise are counted as errors"""
+
+    __slots__ = ("errors",)
+
+    def __init__(self, service: str, call: str):
+        super().__init__(EXTERNAL_CALL_SECONDS.labels(service, call), EXTERNAL_CALLS_IN_FLIGHT.labels(service))
+        self.errors = EXTERNAL_CALL_ERRORS.labels(service, call)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.errors.inc()
+        return super().__exit__(exc_type, exc, tb)
+
+
+def external_call(service: str, call: str) -> ExternalCall:
+    """`with external_call("claude", "analyze_date"): ...`"""
+    return ExternalCall(service, call)
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing each HTTP request's time under its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], path).observe(time.perf_counter() - start)
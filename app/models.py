@@ -1,42 +1,107 @@
 """Data models for users and dates"""
+import sys
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from app.config import WARNING_HISTORY_LIMIT
+from app.context import RollingContext
+from app.transcript import TranscriptBuffer
+
+
+class WarningRecord(NamedTuple):
+    """A warning sent during a date; also readable like the dict it replaces (w["reason"], w.get(...))"""
+    message: str
+    reason: str
+    timestamp: float  # epoch seconds
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            # Only the fields are keys: tuple methods such as count and index are not
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._fields else default
+
+    @classmethod
+    def load(cls, value: Union[Dict, List]) -> "WarningRecord":
+        """A record from its JSON form: a [message, reason, timestamp] list, or an older dict with an ISO timestamp"""
+        if isinstance(value, dict):
+            timestamp = value.get("timestamp")
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp).timestamp()
+            return cls(value.get("message", ""), value.get("reason", ""), timestamp or 0.0)
+        return cls(*value)
 
 
 class DateObject:
     """Represents a single date session"""
 
+    __slots__ = (
+        "date_id", "started_at", "ended_at", "transcript", "is_active", "count",
+        "previous_warnings", "context", "batches_since_analysis",
+    )
+
     def __init__(self, date_id: str):
-        self.date_id = date_id
-        self.start_time = datetime.now()
-        self.accumulated_transcript = ""
+        self.date_id = sys.intern(date_id)
+        self.started_at = time.time()  # epoch seconds; start_time/end_time give datetimes
+        self.ended_at: Optional[float] = None
+        self.transcript = TranscriptBuffer()
         self.is_active = True
         self.count = 0
-        self.end_time = None
-        self.previous_warnings: List[Dict] = []  # Store previous warnings to avoid repetition
+        self.previous_warnings: List[WarningRecord] = []  # Store previous warnings to avoid repetition
+        self.context = RollingContext()  # Token-budgeted view of the date for analysis
+        self.batches_since_analysis = 0  # batches the gate let through without analyze_date
+
+    @property
+    def start_time(self) -> datetime:
+        return datetime.fromtimestamp(self.started_at)
 
-    def add_transcript(self, text: str):
-        """Add text to accumulated transcript"""
+    @start_time.setter
+    def start_time(self, value: datetime):
+        self.started_at = value.timestamp()
+
+    @property
+    def end_time(self) -> Optional[datetime]:
+        return None if self.ended_at is None else datetime.fromtimestamp(self.ended_at)
+
+    @end_time.setter
+    def end_time(self, value: Optional[datetime]):
+        self.ended_at = None if value is None else value.timestamp()
+
+    @property
+    def accumulated_transcript(self) -> str:
+        """Full transcript text (joined on each access, not cached)"""
+        return self.transcript.text()
+
+    def add_transcript(self, text: str, segments: Optional[List[Dict]] = None):
+        """Add a batch to the transcript, keeping per-segment metadata when available"""
         if self.is_active:
-            self.accumulated_transcript += " " + text
+            if segments:
+                self.transcript.extend(segments)
+            else:
+                self.transcript.append(text)
 
     def add_warning(self, warning_message: str, reason: str):
-        """Add a warning to the history"""
-        self.previous_warnings.append({
-            "message": warning_message,
-            "reason": reason,
-            "timestamp": datetime.now().isoformat()
-        })
+        """Add a warning to the history (the oldest are dropped beyond WARNING_HISTORY_LIMIT)"""
+        self.previous_warnings.append(WarningRecord(warning_message, sys.intern(reason), time.time()))
+        if len(self.previous_warnings) > WARNING_HISTORY_LIMIT:
+            del self.previous_warnings[:-WARNING_HISTORY_LIMIT]
 
     def finalize(self):
         """Mark this date as ended"""
         self.is_active = False
-        self.end_time = datetime.now()
+        self.ended_at = time.time()
 
 
 class User:
     """Represents a user with their date history"""
 
+    __slots__ = ("uid", "dates", "current_date_id", "date_counter", "code_word", "phone_number", "command_carry")
+
     def __init__(self, uid: str):
         self.uid = uid
         self.dates: Dict[str, DateObject] = {}  # Dictionary of date_id -> DateObject
@@ -44,14 +109,8 @@ class User:
         self.date_counter = 0
         self.code_word = "peanuts"  # Default code word
         self.phone_number: Optional[str] = None  # User's phone number
+        self.command_carry = ""  # Tail of the last batch, for commands split across requests
 
 
-# In-memory storage for user objects
+# Live user objects of this process; app.store.SessionStore loads them from and writes them to SQLite
 users: Dict[str, User] = {}
-
-
-def get_or_create_user(uid: str) -> User:
-    """Get existing user or create new one"""
-    if uid not in users:
-        users[uid] = User(uid)
-    return users[uid]
@@ -1,36 +1,26 @@
 """Claude API prompt templates"""
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 
-def build_date_analysis_prompt(
-    current_text: str,
-    accumulated_transcript: str,
-    previous_warnings: List[Dict] = None
-) -> str:
-    """Build prompt for analyzing date conversation and determining if intervention is needed"""
-    previous_warnings_text = ""
-    if previous_warnings and len(previous_warnings) > 0:
-        previous_warnings_text = "\n\nPrevious warnings already sent (DO NOT repeat similar warnings):\n"
-        for warning in previous_warnings:
-            previous_warnings_text += f"- {warning['reason']}: {warning['message']}\n"
+# Marks the end of a prompt prefix that the API should cache
+CACHE_BREAKPOINT = {"type": "ephemeral"}
 
-    return f"""You are monitoring a date conversation. Analyze the following transcript and determine if the person is discussing something really wrong that needs urgent changing. Keep track of the flow of the conversation and only give suggestions based on what the male is saying.
 
-SPECIAL RULE: If they are talking about computer science topics, this is considered a really wrong topic that urgently needs to be changed.
+def text_block(text: str, cache: bool = False) -> Dict:
+    """A text content block, optionally ending a cached prompt prefix"""
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = CACHE_BREAKPOINT
+    return block
 
-IMPORTANT: You have already sent the warnings listed below. DO NOT send similar or duplicate warnings. Only notify if there is a NEW issue that hasn't been warned about yet.{previous_warnings_text}
 
-Current segment: {current_text}
+DATE_ANALYSIS_INSTRUCTIONS = """You are monitoring a date conversation. Analyze the transcript you are given and determine if the person is discussing something really wrong that needs urgent changing. Keep track of the flow of the conversation and only give suggestions based on what the male is saying.
 
-Full accumulated date transcript so far:
-{accumulated_transcript}
+SPECIAL RULE: If they are talking about computer science topics, this is considered a really wrong topic that urgently needs to be changed.
 
-Respond ONLY with valid JSON, no other text. Use this exact format:
-{{
-    "should_notify": true,
-    "reason": "brief reason if notification needed",
-    "message": "the warning message to send to user if notification needed"
-}}
+IMPORTANT: Warnings you have already sent are listed after the transcript. DO NOT send similar or duplicate warnings. Only notify if there is a NEW issue that hasn't been warned about yet.
+
+Report your decision with the report_analysis tool. Set should_notify first; only when it is true, also give a brief reason and the warning message to send to the user.
 
 CRITICAL: The warning message must be a SINGLE CASUAL SENTENCE that is funny and nonchalant. Be roasting and playful like a friend calling them out. Examples:
 - "yo shut up about one piece bro"
@@ -41,9 +31,108 @@ CRITICAL: The warning message must be a SINGLE CASUAL SENTENCE that is funny and
 Be strict about computer science topics - any mention of programming, algorithms, data structures, etc. should trigger a notification. However, do NOT send duplicate warnings for issues you've already warned about."""
 
 
-def build_conversation_tip_prompt(accumulated_transcript: str) -> str:
-    """Build prompt for generating a helpful conversation tip when user seems stuck"""
-    return f"""You are a real-time dating coach. The person on a date just said something like "yeah okay so" which suggests they might be stuck or transitioning awkwardly in the conversation.
+# Schema-constrained output of analyze_date. should_notify comes first so a streamed "false"
+# can end the call before anything else is generated.
+DATE_ANALYSIS_TOOL = {
+    "name": "report_analysis",
+    "description": "Report whether the user needs to be warned about the conversation right now.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "should_notify": {
+                "type": "boolean",
+                "description": "true only for a new issue that has not been warned about yet",
+            },
+            "reason": {
+                "type": "string",
+                "description": "brief reason, only when should_notify is true",
+            },
+            "message": {
+                "type": "string",
+                "description": "the single casual sentence to send to the user, only when should_notify is true",
+            },
+        },
+        "required": ["should_notify"],
+    },
+}
+
+DATE_ANALYSIS_TOOL_CHOICE = {"type": "tool", "name": DATE_ANALYSIS_TOOL["name"]}
+
+
+def build_date_analysis_request(
+    current_text: str,
+    accumulated_transcript: str,
+    previous_warnings: List[Dict] = None,
+    earlier_summary: Optional[str] = None,
+    cached_transcript: Optional[List[str]] = None
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Build the system prompt and messages for analyzing the date and deciding if intervention is needed.
+
+    The static instructions are a cached system prompt. `cached_transcript` holds the
+    already-seen, append-only part of the transcript as stable chunks; the cache breakpoint
+    goes on the last one, so a repeat call only pays full price for `accumulated_transcript`
+    (the new tail) and the current segment. When `earlier_summary` is given, the transcript
+    is only the most recent part of the date.
+    """
+    system = [text_block(DATE_ANALYSIS_INSTRUCTIONS, cache=True)]
+
+    if earlier_summary:
+        header = f"""Summary of the earlier part of the date:
+{earlier_summary}
+
+Most recent part of the date transcript:
+"""
+    else:
+        header = "Date transcript so far:\n"
+    content = [text_block(header)]
+
+    cached_transcript = [chunk for chunk in (cached_transcript or []) if chunk]
+    for index, chunk in enumerate(cached_transcript):
+        content.append(text_block(chunk + "\n", cache=index == len(cached_transcript) - 1))
+    if accumulated_transcript:
+        content.append(text_block(accumulated_transcript + "\n"))
+
+    previous_warnings_text = ""
+    if previous_warnings and len(previous_warnings) > 0:
+        previous_warnings_text = "Previous warnings already sent (DO NOT repeat similar warnings):\n"
+        for warning in previous_warnings:
+            previous_warnings_text += f"- {warning['reason']}: {warning['message']}\n"
+        previous_warnings_text += "\n"
+
+    content.append(text_block(
+        f"""{previous_warnings_text}Current segment: {current_text}
+
+Report your analysis with the report_analysis tool."""
+    ))
+
+    return system, [{"role": "user", "content": content}]
+
+
+CONTEXT_SUMMARY_INSTRUCTIONS = """You are keeping running notes on a date conversation so a live coach can follow it without rereading the whole transcript.
+
+Rewrite the notes you are given to cover everything so far in at most 150 words. Keep: topics discussed (especially any computer science, programming or other awkward topics and whether they were dropped), interests and personal details the date mentioned, and the overall vibe. Drop filler and exact wording.
+
+Respond with ONLY the updated notes, no preamble."""
+
+
+def build_context_summary_request(
+    previous_summary: Optional[str],
+    new_transcript: str
+) -> Tuple[List[Dict], List[Dict]]:
+    """Build the system prompt and messages for folding older transcript into the running analysis summary"""
+    previous_summary_text = previous_summary or "(nothing yet - this is the start of the date)"
+
+    system = [text_block(CONTEXT_SUMMARY_INSTRUCTIONS, cache=True)]
+    content = f"""Current notes:
+{previous_summary_text}
+
+New transcript since those notes:
+{new_transcript}"""
+    return system, [{"role": "user", "content": content}]
+
+
+CONVERSATION_TIP_INSTRUCTIONS = """You are a real-time dating coach. The person on a date just said something like "yeah okay so" which suggests they might be stuck or transitioning awkwardly in the conversation.
 
 Based on the conversation so far, provide ONE short, actionable tip (very short sentences) to help them continue the conversation naturally and engagingly.
 
@@ -55,12 +144,17 @@ Make the tip specific to their current conversation context if possible. Focus o
 - For example, if the girl mentioned an interest earlier in the date say "ask her to expand more on figure skating"
 Keep it casual and conversational, not robotic. Don't mention that they said "yeah okay so".
 
-Date transcript so far:
-{accumulated_transcript}
-
 Respond with ONLY the tip, no extra formatting or preamble."""
 
 
+def build_conversation_tip_request(accumulated_transcript: str) -> Tuple[List[Dict], List[Dict]]:
+    """Build the system prompt and messages for a conversation tip when the user seems stuck"""
+    system = [text_block(CONVERSATION_TIP_INSTRUCTIONS, cache=True)]
+    content = f"""Date transcript so far:
+{accumulated_transcript}"""
+    return system, [{"role": "user", "content": content}]
+
+
 def build_date_summary_prompt(
     accumulated_transcript: str,
     previous_summary: Optional[str] = None
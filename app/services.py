@@ -1,92 +1,389 @@
 """External service integrations (Claude, Twilio, OMI)"""
-import json
+import asyncio
+import logging
+import random
 import re
-import requests
-from typing import Dict, List, Optional
+import socket
+import threading
+import time
+import uuid
+import httpx
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+from starlette.concurrency import run_in_threadpool
 
 from app.config import (
     get_claude_client,
     get_twilio_client,
     get_letta_client,
+    get_async_claude_client,
+    get_async_twilio_client,
+    get_async_letta_client,
     OMI_APP_ID,
     OMI_API_KEY,
     OMI_BASE_URL,
+    OMI_POOL_SIZE,
+    OMI_CONNECT_TIMEOUT,
+    OMI_READ_TIMEOUT,
+    OMI_MAX_RETRIES,
+    OMI_RETRY_BASE_DELAY,
+    OMI_RETRY_MAX_DELAY,
+    ANALYSIS_MAX_TOKENS,
+    TIP_STREAMING,
     PHONE_NUMBER,
     TWILIO_PHONE_NUMBER,
     LETTA_API_KEY,
+    ASYNC_SERVICES,
+    CASSETTE_MODE,
 )
+from app.agents import AgentRegistry
+from app.analysis import AnalysisParseError, AnalysisStats, AnalysisStreamParser
+from app.cassette import LIVE, REPLAY, Cassette, CassetteService
+from app.context import estimate_request_tokens
+from app.metrics import ANALYSIS_PARSE_FAILURES, external_call, stage
+if TYPE_CHECKING:
+    import requests
+
 from app.prompts import (
-    build_date_analysis_prompt,
-    build_conversation_tip_prompt,
+    DATE_ANALYSIS_TOOL,
+    DATE_ANALYSIS_TOOL_CHOICE,
+    build_date_analysis_request,
+    build_context_summary_request,
+    build_conversation_tip_request,
     build_date_summary_prompt,
 )
 
+logger = logging.getLogger(__name__)
+
+CLAUDE_MODEL = "claude-3-5-haiku-20241022"
+
+EMERGENCY_CALL_TWIML = '<Response><Say>You have an urgent phone call. This is your emergency exit.</Say></Response>'
+
+LETTA_AGENT_MODEL = "anthropic/claude-3-5-sonnet-20241022"
+LETTA_AGENT_EMBEDDING = "openai/text-embedding-3-small"
+# Every fallback summary returned by LettaService.process_date_end starts with this
+SUMMARY_FAILURE_PREFIX = "Unable to generate date summary"
+
+LETTA_PERSONA = "I am The Rizzistant, an AI dating coach. I help users improve their dating conversations by tracking progress across all their dates. I provide honest, actionable feedback with a casual, friendly tone. I remember patterns, celebrate improvements, and call out recurring issues. I'm supportive but direct - I care about helping them succeed."
+
+
+def report_prompt_tokens(call: str, message, system: List[Dict], messages: List[Dict]) -> Optional[int]:
+    """
+    Log the prompt size of a Claude call, including prompt-cache reads and writes,
+    and return the total prompt tokens (API-reported when available).
+    """
+    usage = getattr(message, "usage", None)
+    input_tokens = getattr(usage, "input_tokens", None)
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    prompt_tokens = None if input_tokens is None else input_tokens + cache_read + cache_write
+    logger.debug(
+        "%s prompt tokens: %s (cache read %s, cache write %s, estimated %s)",
+        call, prompt_tokens, cache_read, cache_write, estimate_request_tokens(system, messages),
+        extra={"call": call, "prompt_tokens": prompt_tokens},
+    )
+    return prompt_tokens
+
+
+def finish_analysis(parser: AnalysisStreamParser, stats: AnalysisStats,
+                    system: List[Dict], messages: List[Dict]) -> Dict:
+    """Turn a consumed analyze_date stream into its result dict, counting parse failures and output tokens"""
+    prompt_tokens = report_prompt_tokens("analyze_date", parser.message, system, messages)
+    try:
+        result = parser.result()
+    except AnalysisParseError as e:
+        logger.warning("Error parsing analyze_date output: %s", e)
+        ANALYSIS_PARSE_FAILURES.inc()
+        stats.record(parser, parse_failed=True)
+        return {"should_notify": False, "prompt_tokens": prompt_tokens, "parse_failed": True}
+
+    stats.record(parser)
+    result["prompt_tokens"] = prompt_tokens
+    result["output_tokens"] = parser.generated_tokens()
+    return result
+
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets) before whitespace, or a line break
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)|\n')
+
+TIP_FALLBACK = "Try asking them about something they're passionate about!"
+
+
+def first_sentence(text: str) -> Optional[str]:
+    """The first complete sentence of streamed text, or None while it is still unfinished"""
+    for match in SENTENCE_END.finditer(text):
+        sentence = text[:match.end()].strip()
+        if sentence:
+            return sentence
+    return None
+
+
+def is_summary_failure(summary: str) -> bool:
+    """Whether a date summary is one of the Letta fallback error messages"""
+    return not summary or summary.startswith(SUMMARY_FAILURE_PREFIX)
+
+
+def build_memory_request(user_id: str, summaries: Sequence[str], idempotency_key: str) -> Tuple[str, Dict, Dict]:
+    """Build the URL, headers and payload for an OMI memory import of one or more summaries"""
+    url = f"{OMI_BASE_URL}/integrations/{OMI_APP_ID}/user/memories?uid={user_id}"
+
+    headers = {
+        "Authorization": f"Bearer {OMI_API_KEY}",
+        "Content-Type": "application/json",
+        # Same key on every attempt, so a retry after a lost response is not stored twice
+        "Idempotency-Key": idempotency_key,
+    }
+
+    payload = {
+        "text": "\n\n".join(summaries),
+        "memories": [
+            {
+                "content": summary,
+                "tags": ["date", "dating-coach", "summary"]
+            }
+            for summary in summaries
+        ]
+    }
+    return url, headers, payload
+
+
+# OMI responses worth retrying: rate limiting and transient server errors
+OMI_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry `attempt` (0-based): full-jitter exponential backoff, or Retry-After if longer"""
+    delay = random.uniform(0, min(OMI_RETRY_MAX_DELAY, OMI_RETRY_BASE_DELAY * 2 ** attempt))
+    try:
+        delay = max(delay, min(float(retry_after), OMI_RETRY_MAX_DELAY))
+    except (TypeError, ValueError):
+        pass
+    return delay
+
+
+# Exceptions (by class name, so the SDKs need not be imported) meaning a connection was never
+# established: requests/urllib3, aiohttp (Twilio's async transport) and httpx
+CONNECT_ERRORS = frozenset({"ConnectTimeout", "NewConnectionError", "ClientConnectorError", "ConnectError"})
+
+
+def is_connect_error(error: Optional[BaseException]) -> bool:
+    """Whether a request failed before it was sent (so sending it again cannot duplicate it)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (ConnectionRefusedError, socket.gaierror)) or type(error).__name__ in CONNECT_ERRORS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def build_omi_session() -> "requests.Session":
+    """A keep-alive session with a bounded connection pool (retries are handled by OMIService)"""
+    # Only the blocking services use requests, so it is imported with their first session
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OMI_POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_async_omi_client() -> httpx.AsyncClient:
+    """Async counterpart of build_omi_session"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=OMI_POOL_SIZE, max_keepalive_connections=OMI_POOL_SIZE),
+        timeout=httpx.Timeout(OMI_READ_TIMEOUT, connect=OMI_CONNECT_TIMEOUT),
+    )
+
+
+class LazyClient:
+    """
+    Service attribute holding an API client that is built by `factory()` on first use, so
+    constructing a service (at import) neither imports its SDK nor opens anything. Assigning
+    a client (e.g. a test double) replaces it; assigning None leaves it to be built.
+    An `on_loop` client must be built inside the running event loop, so prewarm_clients leaves it.
+    """
+
+    _lock = threading.Lock()  # the blocking services build clients from threadpool threads
+
+    def __init__(self, factory: Callable, on_loop: bool = False):
+        self.factory = factory
+        self.on_loop = on_loop
+
+    def __set_name__(self, owner, name: str):
+        self.attr = "_" + name
+
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        client = service.__dict__.get(self.attr)
+        if client is None:
+            with self._lock:
+                client = service.__dict__.get(self.attr)
+                if client is None:
+                    client = service.__dict__[self.attr] = self.factory()
+        return client
+
+    def __set__(self, service, client):
+        service.__dict__[self.attr] = client
+
+
+def build_agent_memory_blocks(user_id: str) -> List[Dict]:
+    """Initial core memory blocks for a user's Letta agent"""
+    return [
+        {
+            "label": "human",
+            "value": f"User ID: {user_id}. Dating goals: Unknown (will be learned over time). Current focus: Improving conversation skills and avoiding problematic topics."
+        },
+        {
+            "label": "persona",
+            "value": LETTA_PERSONA
+        }
+    ]
+
+
+def extract_agent_summary(response) -> str:
+    """Extract only the FINAL assistant message (skip internal thoughts and tool calls)"""
+    summary = ""
+    for message in reversed(response.messages):
+        # Find the last AssistantMessage with actual content
+        if message.message_type == 'assistant_message' and hasattr(message, 'content'):
+            if isinstance(message.content, str):
+                summary = message.content
+                break
+            elif isinstance(message.content, list):
+                for block in message.content:
+                    if hasattr(block, 'text'):
+                        summary += block.text
+                if summary:
+                    break
+    return summary
+
 
 class ClaudeService:
     """Service for interacting with Claude API"""
 
-    def __init__(self):
-        self.client = get_claude_client()
-        self.model = "claude-3-5-haiku-20241022"
+    client = LazyClient(get_claude_client)
+
+    def __init__(self, client=None):
+        self.client = client
+        self.model = CLAUDE_MODEL
+        self.analysis_stats = AnalysisStats()
 
     def analyze_date(
         self,
         current_text: str,
         accumulated_transcript: str,
-        previous_warnings: Optional[List[Dict]] = None
+        previous_warnings: Optional[List[Dict]] = None,
+        earlier_summary: Optional[str] = None,
+        cached_transcript: Optional[List[str]] = None
     ) -> Dict:
         """
         Analyze the date progress and determine if intervention is needed.
-        Returns a dict with 'should_notify' (bool) and 'message' (str) if notification needed.
+        Returns a dict with 'should_notify' (bool) and 'message' (str) if notification needed,
+        plus 'prompt_tokens' as reported by the API and 'output_tokens'.
+        `cached_transcript` is the already-seen transcript prefix, sent as cacheable chunks.
+        The answer is a forced report_analysis tool call, streamed and parsed as it arrives;
+        the stream is closed as soon as should_notify turns out false.
         """
-        prompt = build_date_analysis_prompt(
-            current_text,
-            accumulated_transcript,
-            previous_warnings
-        )
+        with stage("prompt_build"):
+            system, messages = build_date_analysis_request(
+                current_text,
+                accumulated_transcript,
+                previous_warnings,
+                earlier_summary,
+                cached_transcript
+            )
 
+        parser = AnalysisStreamParser()
         try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with external_call("claude", "analyze_date"):
+                stream = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=ANALYSIS_MAX_TOKENS,
+                    system=system,
+                    messages=messages,
+                    tools=[DATE_ANALYSIS_TOOL],
+                    tool_choice=DATE_ANALYSIS_TOOL_CHOICE,
+                    stream=True
+                )
+                # Closing the stream early stops reading (and paying for) the rest of the answer
+                try:
+                    for event in stream:
+                        if parser.feed(event):
+                            break
+                finally:
+                    stream.close()
+        except Exception as e:
+            logger.error("Error calling Claude API: %s", e)
+            self.analysis_stats.record_api_error()
+            return {"should_notify": False}
 
-            response_text = message.content[0].text
+        return finish_analysis(parser, self.analysis_stats, system, messages)
 
-            # Try to extract JSON from the response
-            json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                result = json.loads(json_str)
-            else:
-                result = json.loads(response_text)
+    def summarize_context(self, previous_summary: Optional[str], new_transcript: str) -> Optional[str]:
+        """
+        Fold older transcript into the running summary used by analyze_date.
+        Returns None on failure so the caller keeps its current summary.
+        """
+        system, messages = build_context_summary_request(previous_summary, new_transcript)
 
-            return result
+        try:
+            with external_call("claude", "summarize_context"):
+                message = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=300,
+                    system=system,
+                    messages=messages
+                )
+
+            report_prompt_tokens("summarize_context", message, system, messages)
+            return message.content[0].text.strip()
         except Exception as e:
-            print(f"Error calling Claude API: {e}")
-            print(f"Response text was: {response_text if 'response_text' in locals() else 'N/A'}")
-            return {"should_notify": False}
+            logger.error("Error calling Claude API for context summary: %s", e)
+            return None
 
-    def generate_conversation_tip(self, accumulated_transcript: str) -> str:
+    def generate_conversation_tip(self, accumulated_transcript: str, streaming: bool = TIP_STREAMING) -> str:
         """
         Generate a helpful conversation tip when the user seems stuck.
         Returns a string with a helpful tip to continue the conversation.
+        With `streaming`, returns the first complete sentence as soon as it has been
+        generated and closes the stream, cutting the rest of the generation off.
         """
-        prompt = build_conversation_tip_prompt(accumulated_transcript)
+        system, messages = build_conversation_tip_request(accumulated_transcript)
 
         try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=256,
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            tip = message.content[0].text.strip()
-            return tip
+            with external_call("claude", "conversation_tip"):
+                if not streaming:
+                    message = self.client.messages.create(
+                        model=self.model,
+                        max_tokens=256,
+                        system=system,
+                        messages=messages
+                    )
+                    return message.content[0].text.strip()
+
+                stream = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=256,
+                    system=system,
+                    messages=messages,
+                    stream=True
+                )
+                text = ""
+                try:
+                    for event in stream:
+                        if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                            text += event.delta.text
+                            sentence = first_sentence(text)
+                            if sentence:
+                                return sentence
+                finally:
+                    stream.close()
+                return text.strip() or TIP_FALLBACK
         except Exception as e:
-            print(f"Error calling Claude API for conversation tip: {e}")
-            return "Try asking them about something they're passionate about!"
+            logger.error("Error calling Claude API for conversation tip: %s", e)
+            return TIP_FALLBACK
 
     def summarize_date(
         self,
@@ -100,94 +397,343 @@ class ClaudeService:
         prompt = build_date_summary_prompt(accumulated_transcript, previous_summary)
 
         try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=2048,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with external_call("claude", "summarize_date"):
+                message = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=2048,
+                    messages=[{"role": "user", "content": prompt}]
+                )
 
             summary = message.content[0].text
             return summary
         except Exception as e:
-            print(f"Error calling Claude API for summary: {e}")
+            logger.error("Error calling Claude API for summary: %s", e)
+            return "Unable to generate date summary."
+
+
+class AsyncClaudeService:
+    """Async variant of ClaudeService backed by AsyncAnthropic"""
+
+    client = LazyClient(get_async_claude_client)
+
+    def __init__(self, client=None):
+        self.client = client
+        self.model = CLAUDE_MODEL
+        self.analysis_stats = AnalysisStats()
+
+    async def analyze_date(
+        self,
+        current_text: str,
+        accumulated_transcript: str,
+        previous_warnings: Optional[List[Dict]] = None,
+        earlier_summary: Optional[str] = None,
+        cached_transcript: Optional[List[str]] = None
+    ) -> Dict:
+        """Async version of ClaudeService.analyze_date"""
+        with stage("prompt_build"):
+            system, messages = build_date_analysis_request(
+                current_text,
+                accumulated_transcript,
+                previous_warnings,
+                earlier_summary,
+                cached_transcript
+            )
+
+        parser = AnalysisStreamParser()
+        try:
+            with external_call("claude", "analyze_date"):
+                stream = await self.client.messages.create(
+                    model=self.model,
+                    max_tokens=ANALYSIS_MAX_TOKENS,
+                    system=system,
+                    messages=messages,
+                    tools=[DATE_ANALYSIS_TOOL],
+                    tool_choice=DATE_ANALYSIS_TOOL_CHOICE,
+                    stream=True
+                )
+                try:
+                    async for event in stream:
+                        if parser.feed(event):
+                            break
+                finally:
+                    await stream.close()
+        except Exception as e:
+            logger.error("Error calling Claude API: %s", e)
+            self.analysis_stats.record_api_error()
+            return {"should_notify": False}
+
+        return finish_analysis(parser, self.analysis_stats, system, messages)
+
+    async def summarize_context(self, previous_summary: Optional[str], new_transcript: str) -> Optional[str]:
+        """Async version of ClaudeService.summarize_context"""
+        system, messages = build_context_summary_request(previous_summary, new_transcript)
+
+        try:
+            with external_call("claude", "summarize_context"):
+                message = await self.client.messages.create(
+                    model=self.model,
+                    max_tokens=300,
+                    system=system,
+                    messages=messages
+                )
+
+            report_prompt_tokens("summarize_context", message, system, messages)
+            return message.content[0].text.strip()
+        except Exception as e:
+            logger.error("Error calling Claude API for context summary: %s", e)
+            return None
+
+    async def generate_conversation_tip(self, accumulated_transcript: str, streaming: bool = TIP_STREAMING) -> str:
+        """Async version of ClaudeService.generate_conversation_tip"""
+        system, messages = build_conversation_tip_request(accumulated_transcript)
+
+        try:
+            with external_call("claude", "conversation_tip"):
+                if not streaming:
+                    message = await self.client.messages.create(
+                        model=self.model,
+                        max_tokens=256,
+                        system=system,
+                        messages=messages
+                    )
+                    return message.content[0].text.strip()
+
+                stream = await self.client.messages.create(
+                    model=self.model,
+                    max_tokens=256,
+                    system=system,
+                    messages=messages,
+                    stream=True
+                )
+                text = ""
+                try:
+                    async for event in stream:
+                        if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                            text += event.delta.text
+                            sentence = first_sentence(text)
+                            if sentence:
+                                return sentence
+                finally:
+                    await stream.close()
+                return text.strip() or TIP_FALLBACK
+        except Exception as e:
+            logger.error("Error calling Claude API for conversation tip: %s", e)
+            return TIP_FALLBACK
+
+    async def summarize_date(
+        self,
+        accumulated_transcript: str,
+        previous_summary: Optional[str] = None
+    ) -> str:
+        """Async version of ClaudeService.summarize_date"""
+        prompt = build_date_summary_prompt(accumulated_transcript, previous_summary)
+
+        try:
+            with external_call("claude", "summarize_date"):
+                message = await self.client.messages.create(
+                    model=self.model,
+                    max_tokens=2048,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+
+            return message.content[0].text
+        except Exception as e:
+            logger.error("Error calling Claude API for summary: %s", e)
             return "Unable to generate date summary."
 
 
 class TwilioService:
     """Service for making phone calls via Twilio"""
 
-    def __init__(self):
-        self.client = get_twilio_client()
+    client = LazyClient(get_twilio_client)
+
+    def __init__(self, client=None):
+        self.client = client
 
     def make_emergency_call(self, phone_number: Optional[str] = None) -> bool:
-        """Make an emergency phone call using Twilio when code word is detected"""
+        """
+        Make an emergency phone call using Twilio when code word is detected.
+        Connect errors are raised, since the call was certainly not placed and may be retried;
+        any other failure (missing numbers, an error once the request was sent) returns False.
+        """
         try:
             # Use provided phone number or fall back to environment variable
             target_phone = phone_number or PHONE_NUMBER
 
             if not target_phone or not TWILIO_PHONE_NUMBER:
-                print("Error: PHONE_NUMBER or TWILIO_PHONE_NUMBER not set in environment")
+                logger.error("PHONE_NUMBER or TWILIO_PHONE_NUMBER not set in environment")
                 return False
 
-            call = self.client.calls.create(
-                to=target_phone,
-                from_=TWILIO_PHONE_NUMBER,
-                twiml='<Response><Say>You have an urgent phone call. This is your emergency exit.</Say></Response>'
-            )
+            with external_call("twilio", "emergency_call"):
+                call = self.client.calls.create(
+                    to=target_phone,
+                    from_=TWILIO_PHONE_NUMBER,
+                    twiml=EMERGENCY_CALL_TWIML
+                )
 
-            print(f"Phone call initiated successfully to {target_phone}. Call SID: {call.sid}")
+            logger.info("Phone call initiated successfully to %s", target_phone, extra={"call_sid": call.sid})
             return True
         except Exception as e:
-            print(f"Error making phone call: {e}")
+            if is_connect_error(e):
+                raise
+            logger.error("Error making phone call: %s", e)
             return False
 
+    def prewarm(self) -> bool:
+        """Open the connection to Twilio ahead of the first call with a cheap authenticated fetch"""
+        if not TWILIO_PHONE_NUMBER:
+            return False
+        self.client.api.v2010.account.fetch()
+        return True
+
+
+class AsyncTwilioService:
+    """Async variant of TwilioService using Twilio's aiohttp transport"""
+
+    # The aiohttp session needs a running loop, so the client is built on the first call or prewarm()
+    client = LazyClient(get_async_twilio_client, on_loop=True)
+
+    def __init__(self, client=None):
+        self.client = client
+
+    async def make_emergency_call(self, phone_number: Optional[str] = None) -> bool:
+        """Async version of TwilioService.make_emergency_call"""
+        try:
+            target_phone = phone_number or PHONE_NUMBER
+
+            if not target_phone or not TWILIO_PHONE_NUMBER:
+                logger.error("PHONE_NUMBER or TWILIO_PHONE_NUMBER not set in environment")
+                return False
+
+            with external_call("twilio", "emergency_call"):
+                call = await self.client.calls.create_async(
+                    to=target_phone,
+                    from_=TWILIO_PHONE_NUMBER,
+                    twiml=EMERGENCY_CALL_TWIML
+                )
+
+            logger.info("Phone call initiated successfully to %s", target_phone, extra={"call_sid": call.sid})
+            return True
+        except Exception as e:
+            if is_connect_error(e):
+                raise
+            logger.error("Error making phone call: %s", e)
+            return False
+
+    async def prewarm(self) -> bool:
+        """Async version of TwilioService.prewarm; builds the client on the calling loop"""
+        if not TWILIO_PHONE_NUMBER:
+            return False
+        await self.client.api.v2010.account.fetch_async()
+        return True
+
+    async def aclose(self):
+        """Close the aiohttp session (before its event loop goes away)"""
+        client = vars(self).get("_client")
+        if client is not None:
+            await client.http_client.close()
+            self.client = None
+
 
 class OMIService:
-    """Service for creating memories in OMI"""
+    """Service for creating memories in OMI over a pooled keep-alive session"""
+
+    session = LazyClient(build_omi_session)
 
-    def create_memory(self, user_id: str, summary: str) -> bool:
+    def __init__(self, session: Optional["requests.Session"] = None, max_retries: int = OMI_MAX_RETRIES):
+        self.session = session
+        self.timeout = (OMI_CONNECT_TIMEOUT, OMI_READ_TIMEOUT)
+        self.max_retries = max_retries
+
+    def create_memory(self, user_id: str, summary: str, idempotency_key: Optional[str] = None) -> bool:
         """Create a memory in OMI using the Import API"""
+        return self.create_memories(user_id, [summary], idempotency_key)
+
+    def create_memories(self, user_id: str, summaries: Sequence[str], idempotency_key: Optional[str] = None) -> bool:
+        """Upload several memories for one user in a single request, retrying 429/5xx and connection errors"""
         if not OMI_APP_ID or not OMI_API_KEY:
-            print("Error: OMI_APP_ID or OMI_API_KEY not set in environment")
+            logger.error("OMI_APP_ID or OMI_API_KEY not set in environment")
             return False
 
-        url = f"{OMI_BASE_URL}/integrations/{OMI_APP_ID}/user/memories?uid={user_id}"
+        from requests import RequestException
 
-        headers = {
-            "Authorization": f"Bearer {OMI_API_KEY}",
-            "Content-Type": "application/json"
-        }
+        url, headers, payload = build_memory_request(user_id, summaries, idempotency_key or str(uuid.uuid4()))
 
-        payload = {
-            "text": summary,
-            "memories": [
-                {
-                    "content": summary,
-                    "tags": ["date", "dating-coach", "summary"]
-                }
-            ]
-        }
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                with external_call("omi", "create_memories"):
+                    response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            except RequestException as e:
+                error = e
+            else:
+                if response.ok:
+                    logger.info("Created %d OMI memories", len(summaries), extra={"uid": user_id})
+                    return True
+                error = f"HTTP {response.status_code}: {response.text}"
+                if response.status_code not in OMI_RETRY_STATUSES:
+                    break
+                retry_after = response.headers.get("Retry-After")
+            if attempt < self.max_retries:
+                time.sleep(retry_delay(attempt, retry_after))
 
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            print(f"Successfully created OMI memory for user {user_id}")
-            return True
-        except Exception as e:
-            print(f"Error creating OMI memory: {e}")
-            if hasattr(e, 'response') and hasattr(e.response, 'text'):
-                print(f"Response: {e.response.text}")
+        logger.error("Error creating OMI memory: %s", error, extra={"uid": user_id})
+        return False
+
+
+class AsyncOMIService:
+    """Async variant of OMIService on a shared, pooled httpx.AsyncClient"""
+
+    client = LazyClient(build_async_omi_client)
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, max_retries: int = OMI_MAX_RETRIES):
+        self.client = client
+        self.max_retries = max_retries
+
+    async def create_memory(self, user_id: str, summary: str, idempotency_key: Optional[str] = None) -> bool:
+        """Async version of OMIService.create_memory"""
+        return await self.create_memories(user_id, [summary], idempotency_key)
+
+    async def create_memories(self, user_id: str, summaries: Sequence[str],
+                              idempotency_key: Optional[str] = None) -> bool:
+        """Async version of OMIService.create_memories"""
+        if not OMI_APP_ID or not OMI_API_KEY:
+            logger.error("OMI_APP_ID or OMI_API_KEY not set in environment")
             return False
 
+        url, headers, payload = build_memory_request(user_id, summaries, idempotency_key or str(uuid.uuid4()))
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                with external_call("omi", "create_memories"):
+                    response = await self.client.post(url, headers=headers, json=payload)
+            except httpx.HTTPError as e:
+                error = e
+            else:
+                if response.is_success:
+                    logger.info("Created %d OMI memories", len(summaries), extra={"uid": user_id})
+                    return True
+                error = f"HTTP {response.status_code}: {response.text}"
+                if response.status_code not in OMI_RETRY_STATUSES:
+                    break
+                retry_after = response.headers.get("Retry-After")
+            if attempt < self.max_retries:
+                await asyncio.sleep(retry_delay(attempt, retry_after))
+
+        logger.error("Error creating OMI memory: %s", error, extra={"uid": user_id})
+        return False
+
 
 class LettaService:
     """Service for managing Letta AI agents for persistent memory"""
 
-    def __init__(self):
-        self.client = get_letta_client()
-        # In-memory mapping of user_id to agent_id
-        # In production, store this in a database
-        self.user_agents: Dict[str, str] = {}
+    client = LazyClient(get_letta_client)
+
+    def __init__(self, client=None, registry: Optional[AgentRegistry] = None):
+        self.client = client
+        # Durable user_id -> agent_id mapping shared with restarts and other workers
+        self.agents = registry or AgentRegistry()
 
     def get_or_create_agent(self, user_id: str) -> Optional[str]:
         """
@@ -195,39 +741,27 @@ class LettaService:
         Returns the agent_id or None if creation fails.
         """
         if not LETTA_API_KEY:
-            print("Error: LETTA_API_KEY not set in environment")
+            logger.error("LETTA_API_KEY not set in environment")
             return None
 
-        # Check if agent already exists for this user
-        if user_id in self.user_agents:
-            return self.user_agents[user_id]
-
-        try:
+        def create() -> str:
             # Create a new agent for this user
             # Letta agents get built-in tools including archival_memory_search by default
-            agent_state = self.client.agents.create(
-                model="anthropic/claude-3-5-sonnet-20241022",
-                embedding="openai/text-embedding-3-small",
-                memory_blocks=[
-                    {
-                        "label": "human",
-                        "value": f"User ID: {user_id}. Dating goals: Unknown (will be learned over time). Current focus: Improving conversation skills and avoiding problematic topics."
-                    },
-                    {
-                        "label": "persona",
-                        "value": "I am The Rizzistant, an AI dating coach. I help users improve their dating conversations by tracking progress across all their dates. I provide honest, actionable feedback with a casual, friendly tone. I remember patterns, celebrate improvements, and call out recurring issues. I'm supportive but direct - I care about helping them succeed."
-                    }
-                ],
-                tools=[]
-            )
-
-            agent_id = agent_state.id
-            self.user_agents[user_id] = agent_id
-            print(f"Created new Letta agent {agent_id} for user {user_id}")
-            return agent_id
-
+            with external_call("letta", "create_agent"):
+                agent_state = self.client.agents.create(
+                    model=LETTA_AGENT_MODEL,
+                    embedding=LETTA_AGENT_EMBEDDING,
+                    memory_blocks=build_agent_memory_blocks(user_id),
+                    tools=[]
+                )
+            logger.info("Created new Letta agent %s", agent_state.id, extra={"uid": user_id})
+            return agent_state.id
+
+        # Reuses the user's existing agent; concurrent callers share one creation
+        try:
+            return self.agents.get_or_create_sync(user_id, create)
         except Exception as e:
-            print(f"Error creating Letta agent: {e}")
+            logger.error("Error creating Letta agent: %s", e, extra={"uid": user_id})
             return None
 
     def process_date_end(self, user_id: str, transcript: str) -> str:
@@ -246,49 +780,170 @@ class LettaService:
             message_content = build_date_summary_prompt(transcript, previous_summary=None)
 
             # Send message to the agent
-            response = self.client.agents.messages.create(
-                agent_id=agent_id,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": message_content
-                    }
-                ]
-            )
+            with external_call("letta", "process_date_end"):
+                response = self.client.agents.messages.create(
+                    agent_id=agent_id,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": message_content
+                        }
+                    ]
+                )
 
-            print(f"Response: {response}")
-
-            # Extract only the FINAL assistant message (skip internal thoughts and tool calls)
-            summary = ""
-            for message in reversed(response.messages):
-                # Find the last AssistantMessage with actual content
-                if message.message_type == 'assistant_message' and hasattr(message, 'content'):
-                    if isinstance(message.content, str):
-                        summary = message.content
-                        break
-                    elif isinstance(message.content, list):
-                        for block in message.content:
-                            if hasattr(block, 'text'):
-                                summary += block.text
-                        if summary:
-                            break
+            logger.debug("Letta response: %s", response)
+
+            summary = extract_agent_summary(response)
 
             if not summary:
                 return "Unable to generate date summary - no response from agent."
 
-            print(f"Generated date summary for user {user_id} via Letta agent {agent_id}")
+            logger.info("Generated date summary via Letta agent %s", agent_id, extra={"uid": user_id})
 
             # Note: Summary is automatically stored in message history (recall memory)
             # Agent can use conversation_search tool to find previous dates
             return summary.strip()
 
         except Exception as e:
-            print(f"Error processing date with Letta: {e}")
+            logger.error("Error processing date with Letta: %s", e, extra={"uid": user_id})
             return f"Unable to generate date summary due to error: {str(e)}"
 
 
-# Service instances
+class AsyncLettaService:
+    """Async variant of LettaService backed by AsyncLetta"""
+
+    client = LazyClient(get_async_letta_client)
+
+    def __init__(self, client=None, registry: Optional[AgentRegistry] = None):
+        self.client = client
+        self.agents = registry or AgentRegistry()
+
+    async def get_or_create_agent(self, user_id: str) -> Optional[str]:
+        """Async version of LettaService.get_or_create_agent"""
+        if not LETTA_API_KEY:
+            logger.error("LETTA_API_KEY not set in environment")
+            return None
+
+        async def create() -> str:
+            with external_call("letta", "create_agent"):
+                agent_state = await self.client.agents.create(
+                    model=LETTA_AGENT_MODEL,
+                    embedding=LETTA_AGENT_EMBEDDING,
+                    memory_blocks=build_agent_memory_blocks(user_id),
+                    tools=[]
+                )
+            logger.info("Created new Letta agent %s", agent_state.id, extra={"uid": user_id})
+            return agent_state.id
+
+        try:
+            return await self.agents.get_or_create(user_id, create)
+        except Exception as e:
+            logger.error("Error creating Letta agent: %s", e, extra={"uid": user_id})
+            return None
+
+    async def process_date_end(self, user_id: str, transcript: str) -> str:
+        """Async version of LettaService.process_date_end"""
+        agent_id = await self.get_or_create_agent(user_id)
+        if not agent_id:
+            return "Unable to generate date summary - Letta agent unavailable."
+
+        try:
+            message_content = build_date_summary_prompt(transcript, previous_summary=None)
+
+            with external_call("letta", "process_date_end"):
+                response = await self.client.agents.messages.create(
+                    agent_id=agent_id,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": message_content
+                        }
+                    ]
+                )
+
+            logger.debug("Letta response: %s", response)
+
+            summary = extract_agent_summary(response)
+
+            if not summary:
+                return "Unable to generate date summary - no response from agent."
+
+            logger.info("Generated date summary via Letta agent %s", agent_id, extra={"uid": user_id})
+            return summary.strip()
+
+        except Exception as e:
+            logger.error("Error processing date with Letta: %s", e, extra={"uid": user_id})
+            return f"Unable to generate date summary due to error: {str(e)}"
+
+
+class ThreadedService:
+    """Expose a blocking service through awaitable methods run on the threadpool"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def __getattr__(self, name):
+        attr = getattr(self.service, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(attr, *args, **kwargs)
+
+        return call
+
+
+# Service instances (cheap: API clients are built on first use, see LazyClient)
 claude_service = ClaudeService()
 twilio_service = TwilioService()
 omi_service = OMIService()
 letta_service = LettaService()
+
+# Record or replay every external call instead of (only) going live
+cassette = None if CASSETTE_MODE == LIVE else Cassette(mode=CASSETTE_MODE)
+if cassette is not None:
+    claude_service = cassette.wrap("claude", claude_service)
+    twilio_service = cassette.wrap("twilio", twilio_service)
+    omi_service = cassette.wrap("omi", omi_service)
+    letta_service = cassette.wrap("letta", letta_service)
+
+# Awaitable service instances used by the async request handlers
+if ASYNC_SERVICES:
+    async_claude_service = AsyncClaudeService()
+    async_twilio_service = AsyncTwilioService()
+    async_omi_service = AsyncOMIService()
+    async_letta_service = AsyncLettaService()
+    if cassette is not None:
+        async_claude_service = cassette.wrap("claude", async_claude_service)
+        async_twilio_service = cassette.wrap("twilio", async_twilio_service)
+        async_omi_service = cassette.wrap("omi", async_omi_service)
+        async_letta_service = cassette.wrap("letta", async_letta_service)
+else:
+    async_claude_service = ThreadedService(claude_service)
+    async_twilio_service = ThreadedService(twilio_service)
+    async_omi_service = ThreadedService(omi_service)
+    async_letta_service = ThreadedService(letta_service)
+
+
+def lazy_clients(service_class: type) -> Dict[str, LazyClient]:
+    """The LazyClient attributes of a service class, including inherited ones"""
+    clients = {}
+    for cls in reversed(service_class.__mro__):
+        clients.update((name, attr) for name, attr in vars(cls).items() if isinstance(attr, LazyClient))
+    return clients
+
+
+def prewarm_clients(*services):
+    """
+    Build the services' API clients now, importing their SDKs, instead of on each service's
+    first call (run in a thread after startup). Replayed services never need one, and clients
+    tied to the event loop are left to the service's own prewarm().
+    """
+    if cassette is not None and cassette.mode == REPLAY:
+        return
+    for service in services:
+        while isinstance(service, (ThreadedService, CassetteService)):
+            service = service.service
+        for name, lazy in lazy_clients(type(service)).items():
+            if not lazy.on_loop:
+                getattr(service, name)
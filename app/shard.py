@@ -0,0 +1,266 @@
+"""
+uid-sharded deployment: routing each user to one of N worker processes (see app.dispatcher)
+
+Each worker is a full app (SHARD_APP) on its own unix socket and the only process serving its
+users, so their User/DateObject state stays in that worker's memory and its session store
+skips the cross-process version checks and per-request flushes. Users are assigned by
+rendezvous hashing over the worker names, so resizing from N to M workers only moves the
+users whose highest-scoring worker changed (about |N - M| / max(N, M) of them).
+
+Every worker also runs end-of-date jobs from the shared queue. Jobs are leased to the process
+running them, so a restarted or newly added worker never takes over a job another one is still
+running: a stopped worker hands its jobs back, and those of a worker that died are run again
+once their lease expires (JOB_LEASE_TIMEOUT).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from app.config import (
+    SHARD_APP,
+    SHARD_HANDOFF_TIMEOUT,
+    SHARD_SOCKET_DIR,
+    SHARD_START_TIMEOUT,
+    SHARD_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker keeps an idle connection open: longer than the dispatcher client's keep-alive
+# expiry (5 s), so the dispatcher never sends a request on a connection the worker is closing
+WORKER_KEEP_ALIVE = 75
+
+
+def worker_name(index: int) -> str:
+    return f"shard-{index}"
+
+
+def rendezvous_score(uid: str, worker: str) -> int:
+    digest = hashlib.blake2b(f"{worker}\x00{uid}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def rendezvous_owner(uid: str, workers: Sequence[str]) -> str:
+    """The worker with the highest hash score for this uid (highest random weight hashing)"""
+    return max(workers, key=lambda worker: rendezvous_score(uid, worker))
+
+
+class ShardWorker:
+    """One worker process of the app, serving HTTP on a unix socket"""
+
+    def __init__(self, name: str, socket_path: str, app_path: str = SHARD_APP):
+        self.name = name
+        self.socket_path = socket_path
+        self.app_path = app_path
+        self.process: Optional[subprocess.Popen] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.restarts = 0
+        self._restart_lock = asyncio.Lock()
+
+    def spawn(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        env = dict(os.environ, SHARD_WORKER=self.name)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app_path, "--uds", self.socket_path,
+             "--timeout-keep-alive", str(WORKER_KEEP_ALIVE), "--no-access-log", "--log-level", "warning"],
+            env=env,
+        )
+        if self.client is None:
+            transport = httpx.AsyncHTTPTransport(uds=self.socket_path)
+            self.client = httpx.AsyncClient(transport=transport, base_url=f"http://{self.name}", timeout=None)
+
+    async def start(self, timeout: float = SHARD_START_TIMEOUT):
+        """Spawn the process and wait until it answers the health check"""
+        self.spawn()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with status {self.process.returncode}")
+            try:
+                if (await self.client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"{self.name} did not start within {timeout:.0f}s")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    async def restart(self):
+        """Start the process again if it died (its users reload from SQLite)"""
+        async with self._restart_lock:
+            if self.alive():
+                return
+            logger.error("%s exited with status %s, restarting", self.name, self.process.returncode)
+            self.restarts += 1
+            await self.start()
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        self.requests += 1
+        try:
+            return await self.client.request(method, path, **kwargs)
+        except httpx.TransportError:
+            if self.alive():
+                raise
+            await self.restart()
+            return await self.client.request(method, path, **kwargs)
+
+    async def stop(self, timeout: float = 30.0):
+        """SIGTERM, so the worker's lifespan flushes its sessions and hands back its jobs before it exits"""
+        if self.alive():
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                await asyncio.to_thread(self.process.wait, timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class ShardDispatcher:
+    """
+    Routes each uid to its rendezvous-hash owner among the running workers.
+
+    resize() rebalances without losing or reordering a user's batches: new workers start
+    first, then requests of the users that change owner are held while their in-flight
+    requests finish, every old worker hands off the users it no longer owns (POST
+    /shard/release: their actors drain, the sessions are flushed and dropped from its cache),
+    and the held requests go to the new owners, which load the users from SQLite. Removed
+    workers are stopped last. Users that keep their owner are served throughout.
+    """
+
+    def __init__(self, workers: int = SHARD_WORKERS, socket_dir: Optional[str] = SHARD_SOCKET_DIR,
+                 app_path: str = SHARD_APP, handoff_timeout: float = SHARD_HANDOFF_TIMEOUT):
+        if workers < 1:
+            raise ValueError("a sharded deployment needs at least one worker")
+        self.size = workers
+        self.socket_dir = socket_dir
+        self.app_path = app_path
+        self.handoff_timeout = handoff_timeout
+        self.workers: Dict[str, ShardWorker] = {}
+        self.names: List[str] = []
+        self.target: Optional[List[str]] = None  # worker names being resized to
+        self.handoff_done: Optional[asyncio.Event] = None
+        self.in_flight: Dict[str, int] = defaultdict(int)  # uid -> requests being served
+        self.idle = asyncio.Condition()
+        self.counters = {"resizes": 0, "users_moved": 0, "held_requests": 0}
+        self._owned_dir: Optional[str] = None
+        self._resize_lock = asyncio.Lock()
+
+    def _worker(self, name: str) -> ShardWorker:
+        worker = self.workers.get(name)
+        if worker is None:
+            if self.socket_dir is None:
+                self._owned_dir = self.socket_dir = tempfile.mkdtemp(prefix="rizz-shards-")
+            worker = self.workers[name] = ShardWorker(
+                name, os.path.join(self.socket_dir, f"{name}.sock"), self.app_path
+            )
+        return worker
+
+    async def start(self):
+        names = [worker_name(i) for i in range(self.size)]
+        await asyncio.gather(*(self._worker(name).start() for name in names))
+        self.names = names
+        logger.info("Started %d shard workers", len(names))
+
+    async def stop(self):
+        await asyncio.gather(*(worker.stop() for worker in self.workers.values()))
+        self.workers.clear()
+        if self._owned_dir is not None:
+            shutil.rmtree(self._owned_dir, ignore_errors=True)
+
+    def owner(self, uid: str) -> str:
+        return rendezvous_owner(uid, self.names)
+
+    def moving(self, uid: str) -> bool:
+        """Whether a resize in progress changes this user's owner"""
+        return self.target is not None and rendezvous_owner(uid, self.target) != self.owner(uid)
+
+    async def forward(self, uid: str, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a user's request to its owner, holding it while the user is being handed off"""
+        while self.moving(uid):
+            self.counters["held_requests"] += 1
+            await self.handoff_done.wait()
+        self.in_flight[uid] += 1
+        try:
+            return await self.workers[self.owner(uid)].request(method, path, **kwargs)
+        finally:
+            self.in_flight[uid] -= 1
+            if not self.in_flight[uid]:
+                del self.in_flight[uid]
+                async with self.idle:
+                    self.idle.notify_all()
+
+    async def resize(self, size: int) -> Dict:
+        """Rebalance users onto `size` workers"""
+        if size < 1:
+            raise ValueError("a sharded deployment needs at least one worker")
+        async with self._resize_lock:
+            old = list(self.names)
+            new = [worker_name(i) for i in range(size)]
+            if new == old:
+                return {"workers": size, "users_moved": 0}
+            start = time.perf_counter()
+            await asyncio.gather(*(self._worker(name).start() for name in new if name not in old))
+
+            self.handoff_done = asyncio.Event()
+            self.target = new
+            handoff_start = time.perf_counter()
+            try:
+                # Requests already at an old owner finish there before that owner lets go
+                async with self.idle:
+                    await asyncio.wait_for(
+                        self.idle.wait_for(lambda: not any(self.moving(uid) for uid in self.in_flight)),
+                        self.handoff_timeout,
+                    )
+                released = await asyncio.gather(*(
+                    self.workers[name].request("POST", "/shard/release", json=new) for name in old
+                ))
+                moved = 0
+                for name, response in zip(old, released):
+                    response.raise_for_status()
+                    moved += response.json()["released"]
+                self.names = new
+            except Exception:
+                added = [self.workers.pop(name) for name in new if name not in old]
+                await asyncio.gather(*(worker.stop() for worker in added))
+                raise
+            finally:
+                self.target = None
+                self.handoff_done.set()
+            handoff = time.perf_counter() - handoff_start
+
+            removed = [self.workers.pop(name) for name in old if name not in new]
+            await asyncio.gather(*(worker.stop() for worker in removed))
+            self.size = size
+            self.counters["resizes"] += 1
+            self.counters["users_moved"] += moved
+            seconds = time.perf_counter() - start
+            logger.info("Resized from %d to %d shard workers in %.2fs, moved %d users (%.3fs handoff)",
+                        len(old), size, seconds, moved, handoff)
+            return {"workers": size, "users_moved": moved, "seconds": seconds, "handoff_seconds": handoff}
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "workers": {
+                name: {"requests": worker.requests, "restarts": worker.restarts, "alive": worker.alive()}
+                for name, worker in self.workers.items()
+            },
+            "in_flight_users": len(self.in_flight),
+        }
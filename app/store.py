@@ -0,0 +1,529 @@
+"""SQLite-backed session store for User/DateObject state with a write-behind cache"""
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import (
+    DB_PATH,
+    SESSION_FLUSH_INTERVAL,
+    SESSION_WRITE_MODE,
+    SESSION_IDLE_TTL,
+    SESSION_MAX_USERS,
+    SESSION_MEMORY_LIMIT_MB,
+    SESSION_EVICT_INTERVAL,
+    SHARD_WORKER,
+)
+from app.database import connect, get_connection
+from app.models import DateObject, User, WarningRecord, users
+
+logger = logging.getLogger(__name__)
+
+# Rough in-memory cost of a cached user, a date and a transcript segment beyond its text
+USER_OVERHEAD_BYTES = 1500
+DATE_OVERHEAD_BYTES = 3000
+SEGMENT_OVERHEAD_BYTES = 150
+
+# _read() result for a cached user whose row has not changed
+CURRENT = object()
+
+
+def estimate_user_bytes(user: User) -> int:
+    """Approximate memory held by a cached user and its dates"""
+    total = USER_OVERHEAD_BYTES
+    for date in user.dates.values():
+        transcript = date.transcript
+        total += DATE_OVERHEAD_BYTES + transcript.char_count + SEGMENT_OVERHEAD_BYTES * len(transcript.segments)
+    return total
+
+
+def archive_date(date: DateObject) -> bytes:
+    """A finished date (fields, warnings and transcript segments) as compressed JSON"""
+    record = {
+        "start_time": date.start_time.isoformat(),
+        "end_time": date.end_time.isoformat() if date.end_time else None,
+        "count": date.count,
+        "previous_warnings": date.previous_warnings,
+        "context_summary": date.context.summary,
+        "segments": [list(segment) for segment in date.transcript.segments],
+    }
+    return zlib.compress(json.dumps(record, separators=(",", ":")).encode(), 6)
+
+
+def restore_date(date_id: str, data: bytes) -> DateObject:
+    """The finished DateObject stored by archive_date"""
+    record = json.loads(zlib.decompress(data))
+    date = DateObject(date_id)
+    date.start_time = datetime.fromisoformat(record["start_time"])
+    date.end_time = datetime.fromisoformat(record["end_time"]) if record["end_time"] else None
+    date.is_active = False
+    date.count = record["count"]
+    date.previous_warnings = [WarningRecord.load(w) for w in record["previous_warnings"]]
+    date.context.summary = record["context_summary"]
+    for text, speaker, start, end in record["segments"]:
+        date.transcript.append(text, speaker, start, end)
+    return date
+
+
+class SessionStore:
+    """
+    Keeps live User objects in an in-process cache and writes them behind to SQLite (WAL mode),
+    so several worker processes on one node share sessions and a restart resumes active dates.
+
+    Every user handed out by get_or_create() is marked dirty and written in the next batched
+    flush, one transaction for all dirty users. Transcripts are append-only, so a flush only
+    inserts the segments added since the last one.
+
+    Each flush stores a fresh random version on the user row. On access the cached version is
+    compared with the row, and a user changed by another worker is reloaded (unless this worker
+    still has unflushed changes for it); get(), used on the event loop, does that check and any
+    load in a worker thread. User and date fields are last-writer-wins; segments are
+    only ever inserted, so no worker overwrites another's transcript. Changes become visible to
+    other workers after at most one flush interval, or before the response in "sync" write
+    mode, where requests await sync(): concurrent requests share one flush (group commit), so a
+    device's next batch sees this one whichever worker serves it. Only the current date is
+    loaded back.
+
+    Memory stays bounded: a finished date is written once to session_archive as compressed
+    JSON (its live rows are deleted) and dropped from the cache, and evict() drops users idle
+    for `idle_ttl` seconds, then least recently used ones while there are more than
+    `max_users` or their estimated size exceeds `memory_limit_mb`. Evicted users are reloaded
+    on their next request; archived dates are read back with load_date(). Users with unflushed
+    changes, or for which `pinned(uid)` is true (work still in flight), are never evicted.
+    `on_evict(uid)` is called for every evicted or released user, so state kept beside the
+    cache can go with it.
+
+    An `exclusive` store (a shard worker, the only process serving its users) skips the
+    version check on access; release() flushes and drops users handed to another worker.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, flush_interval: float = SESSION_FLUSH_INTERVAL,
+                 write_mode: str = SESSION_WRITE_MODE, cache: Optional[Dict[str, User]] = None,
+                 idle_ttl: float = SESSION_IDLE_TTL, max_users: int = SESSION_MAX_USERS,
+                 memory_limit_mb: float = SESSION_MEMORY_LIMIT_MB,
+                 evict_interval: float = SESSION_EVICT_INTERVAL, exclusive: bool = SHARD_WORKER is not None):
+        if write_mode not in ("sync", "behind"):
+            raise ValueError(f"Unknown SESSION_WRITE_MODE {write_mode!r}, expected 'sync' or 'behind'")
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.write_mode = write_mode
+        self.cache: Dict[str, User] = users if cache is None else cache
+        self.versions: Dict[str, int] = {}  # uid -> version of the row the cached user matches
+        self.persisted_segments: Dict[Tuple[str, str], int] = {}  # (uid, date_id) -> segments on disk
+        self.dirty: Set[str] = set()
+        self.flushing: Set[str] = set()  # uids whose rows are being written right now
+        self.flushes = 0
+        self.idle_ttl = idle_ttl
+        self.max_users = max_users
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.evict_interval = evict_interval
+        self.exclusive = exclusive
+        self.last_access: "OrderedDict[str, float]" = OrderedDict()  # uid -> monotonic time, oldest first
+        self.pinned: Optional[Callable[[str], bool]] = None
+        self.on_evict: Optional[Callable[[str], None]] = None
+        self.counters = {"evicted_idle": 0, "evicted_pressure": 0, "reloads": 0, "dates_archived": 0, "released": 0}
+        self._last_evict = time.monotonic()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        return connect(self.db_path)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    @property
+    def flush_lock(self) -> asyncio.Lock:
+        """Serializes flushes; made for the running loop, as tests and benchmarks run one store on several"""
+        loop = asyncio.get_running_loop()
+        if self._flush_lock_loop is not loop:
+            self._flush_lock, self._flush_lock_loop = asyncio.Lock(), loop
+        return self._flush_lock
+
+    def init(self):
+        """Create the session tables"""
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS session_users (
+                uid TEXT PRIMARY KEY,
+                code_word TEXT NOT NULL,
+                phone_number TEXT,
+                date_counter INTEGER NOT NULL,
+                current_date_id TEXT,
+                command_carry TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS session_dates (
+                uid TEXT NOT NULL,
+                date_id TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT,
+                is_active INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                batches_since_analysis INTEGER NOT NULL,
+                previous_warnings TEXT NOT NULL,
+                context_summary TEXT NOT NULL,
+                context_summarized_upto INTEGER NOT NULL,
+                PRIMARY KEY (uid, date_id)
+            );
+            CREATE TABLE IF NOT EXISTS session_segments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT NOT NULL,
+                date_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                speaker TEXT,
+                start REAL,
+                end REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_session_segments_date ON session_segments (uid, date_id, id);
+            CREATE TABLE IF NOT EXISTS session_archive (
+                uid TEXT NOT NULL,
+                date_id TEXT NOT NULL,
+                data BLOB NOT NULL,
+                archived_at REAL NOT NULL,
+                PRIMARY KEY (uid, date_id)
+            );
+        """)
+        conn.close()
+
+    def get_or_create(self, uid: str) -> User:
+        """The user's live object (loaded or created on first use); marks it for the next flush"""
+        user = self.cache.get(uid)
+        if user is None or self._check_version(uid):
+            user = self._install(uid, user, self._read(self.conn, uid, user is not None, self.versions.get(uid)))
+        return self._touch(uid)
+
+    async def get(self, uid: str) -> User:
+        """
+        get_or_create() for the event loop: a cached user that needs no version check (this
+        worker has unflushed changes, or the store is exclusive) is returned without touching
+        SQLite; otherwise the version check and any load run in a worker thread.
+        """
+        user = self.cache.get(uid)
+        if user is None or self._check_version(uid):
+            read = await asyncio.to_thread(
+                self._read_pooled, uid, user is not None, self.versions.get(uid)
+            )
+            # Changes made to the cached user while we were reading win over what was read
+            if uid in self.cache and (uid in self.dirty or uid in self.flushing):
+                return self._touch(uid)
+            user = self._install(uid, self.cache.get(uid, user), read)
+        return self._touch(uid)
+
+    def _check_version(self, uid: str) -> bool:
+        """Whether the cached user must be compared with its row (another worker may have changed it)"""
+        return not self.exclusive and uid not in self.dirty and uid not in self.flushing
+
+    def _touch(self, uid: str) -> User:
+        self.dirty.add(uid)
+        self.last_access[uid] = time.monotonic()
+        self.last_access.move_to_end(uid)
+        return self.cache[uid]
+
+    def _install(self, uid: str, cached: Optional[User], read) -> User:
+        """Put what _read() returned in the cache"""
+        if read is CURRENT:
+            user = cached
+        elif read is None:
+            user = User(uid)
+        else:
+            user, version, segments = read
+            self.versions[uid] = version
+            if segments is not None:
+                self.persisted_segments[(uid, user.current_date_id)] = segments
+            if cached is None:
+                self.counters["reloads"] += 1
+        self.cache[uid] = user
+        return user
+
+    def _read_pooled(self, uid: str, cached: bool, version: Optional[int]):
+        return self._read(get_connection(self.db_path), uid, cached, version)
+
+    def _read(self, conn: sqlite3.Connection, uid: str, cached: bool, version: Optional[int]):
+        """
+        CURRENT if the cached user still matches its row, else the user read from the database
+        as (user, row version, segments of its current date on disk), or None if it has no row.
+        Leaves the store untouched, so it can run in a worker thread.
+        """
+        if cached:
+            row = conn.execute("SELECT version FROM session_users WHERE uid = ?", (uid,)).fetchone()
+            if row is None or row[0] == version:
+                return CURRENT
+        return self._read_user(conn, uid)
+
+    def _read_user(self, conn: sqlite3.Connection, uid: str) -> Optional[Tuple[User, int, Optional[int]]]:
+        row = conn.execute("""
+            SELECT code_word, phone_number, date_counter, current_date_id, command_carry, version
+            FROM session_users WHERE uid = ?
+        """, (uid,)).fetchone()
+        if row is None:
+            return None
+
+        user = User(uid)
+        user.code_word, user.phone_number, user.date_counter, user.current_date_id, user.command_carry = row[:5]
+        segments = None
+        if user.current_date_id is not None:
+            user.current_date_id = sys.intern(user.current_date_id)
+            loaded = self._read_date(conn, uid, user.current_date_id)
+            if loaded is None:
+                user.current_date_id = None
+            else:
+                date, segments = loaded
+                user.dates[date.date_id] = date
+        return user, row[5], segments
+
+    def _read_date(self, conn: sqlite3.Connection, uid: str, date_id: str) -> Optional[Tuple[DateObject, int]]:
+        """The date and the number of its segments on disk"""
+        row = conn.execute("""
+            SELECT start_time, end_time, is_active, count, batches_since_analysis,
+                   previous_warnings, context_summary, context_summarized_upto
+            FROM session_dates WHERE uid = ? AND date_id = ?
+        """, (uid, date_id)).fetchone()
+        if row is None:
+            return None
+
+        date = DateObject(date_id)
+        date.start_time = datetime.fromisoformat(row[0])
+        date.end_time = datetime.fromisoformat(row[1]) if row[1] else None
+        date.is_active = bool(row[2])
+        date.count = row[3]
+        date.batches_since_analysis = row[4]
+        date.previous_warnings = [WarningRecord.load(w) for w in json.loads(row[5])]
+        date.context.summary = row[6]
+        date.context.summarized_upto = row[7]
+
+        segments = conn.execute("""
+            SELECT text, speaker, start, end FROM session_segments
+            WHERE uid = ? AND date_id = ? ORDER BY id
+        """, (uid, date_id)).fetchall()
+        for text, speaker, start, end in segments:
+            date.transcript.append(text, speaker, start, end)
+        return date, len(segments)
+
+    def _load_date(self, uid: str, date_id: str) -> Optional[DateObject]:
+        loaded = self._read_date(self.conn, uid, date_id)
+        if loaded is None:
+            return None
+        date, segments = loaded
+        self.persisted_segments[(uid, date_id)] = segments
+        return date
+
+    def load_date(self, uid: str, date_id: str) -> Optional[DateObject]:
+        """Any of the user's dates: cached, live in the database, or read back from the archive"""
+        user = self.cache.get(uid)
+        if user is not None and date_id in user.dates:
+            return user.dates[date_id]
+        date = self._load_date(uid, date_id)
+        if date is not None:
+            return date
+        row = self.conn.execute(
+            "SELECT data FROM session_archive WHERE uid = ? AND date_id = ?", (uid, date_id)
+        ).fetchone()
+        return restore_date(date_id, row[0]) if row else None
+
+    def _snapshot(self, uids: Set[str]):
+        """Rows to write for the dirty users, taken on the event loop so nothing changes under us"""
+        now = time.time()
+        user_rows, date_rows, segment_rows, archive_rows = [], [], [], []
+        versions: Dict[str, int] = {}
+        persisted: Dict[Tuple[str, str], int] = {}
+        for uid in uids:
+            user = self.cache.get(uid)
+            if user is None:
+                continue
+            versions[uid] = random.getrandbits(62)
+            user_rows.append((
+                uid, user.code_word, user.phone_number, user.date_counter, user.current_date_id,
+                user.command_carry, versions[uid], now,
+            ))
+            for date in user.dates.values():
+                if not date.is_active and date.date_id != user.current_date_id:
+                    # Finished: archived whole, then dropped from memory once the flush commits
+                    archive_rows.append((uid, date.date_id, archive_date(date), now))
+                    continue
+                date_rows.append((
+                    uid, date.date_id, date.start_time.isoformat(),
+                    date.end_time.isoformat() if date.end_time else None,
+                    int(date.is_active), date.count, date.batches_since_analysis,
+                    json.dumps(date.previous_warnings), date.context.summary, date.context.summarized_upto,
+                ))
+                key = (uid, date.date_id)
+                done = self.persisted_segments.get(key, 0)
+                new_segments = date.transcript.segments[done:]
+                segment_rows.extend(
+                    (uid, date.date_id, s.text, s.speaker, s.start, s.end) for s in new_segments
+                )
+                persisted[key] = done + len(new_segments)
+        return user_rows, date_rows, segment_rows, archive_rows, versions, persisted
+
+    def _write(self, user_rows: List[tuple], date_rows: List[tuple], segment_rows: List[tuple],
+               archive_rows: List[tuple] = ()):
+        conn = self.writer
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("""
+                INSERT OR REPLACE INTO session_users
+                (uid, code_word, phone_number, date_counter, current_date_id, command_carry, version, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, user_rows)
+            conn.executemany("""
+                INSERT OR REPLACE INTO session_dates
+                (uid, date_id, start_time, end_time, is_active, count, batches_since_analysis,
+                 previous_warnings, context_summary, context_summarized_upto)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, date_rows)
+            conn.executemany("""
+                INSERT INTO session_segments (uid, date_id, text, speaker, start, end)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, segment_rows)
+            if archive_rows:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO session_archive (uid, date_id, data, archived_at) VALUES (?, ?, ?, ?)",
+                    archive_rows
+                )
+                keys = [(uid, date_id) for uid, date_id, _, _ in archive_rows]
+                conn.executemany("DELETE FROM session_dates WHERE uid = ? AND date_id = ?", keys)
+                conn.executemany("DELETE FROM session_segments WHERE uid = ? AND date_id = ?", keys)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def flush(self):
+        """Write every dirty user in one transaction (off the event loop)"""
+        async with self.flush_lock:
+            if not self.dirty:
+                return
+            uids, self.dirty = self.dirty, set()
+            user_rows, date_rows, segment_rows, archive_rows, versions, persisted = self._snapshot(uids)
+            self.flushing = uids
+            try:
+                await asyncio.to_thread(self._write, user_rows, date_rows, segment_rows, archive_rows)
+            except Exception as e:
+                logger.error("Session flush of %d users failed, will retry: %s", len(uids), e)
+                self.dirty |= uids
+                return
+            else:
+                self.versions.update(versions)
+                self.persisted_segments.update(persisted)
+                self._drop_archived(archive_rows)
+                self.flushes += 1
+            finally:
+                self.flushing = set()
+
+    def _drop_archived(self, archive_rows: List[tuple]):
+        for uid, date_id, _, _ in archive_rows:
+            self.persisted_segments.pop((uid, date_id), None)
+            user = self.cache.get(uid)
+            date = user.dates.get(date_id) if user is not None else None
+            if date is not None and not date.is_active and date_id != user.current_date_id:
+                del user.dates[date_id]
+                self.counters["dates_archived"] += 1
+
+    def _evictable(self, uid: str) -> bool:
+        return (
+            uid not in self.dirty
+            and uid not in self.flushing
+            and not (self.pinned is not None and self.pinned(uid))
+        )
+
+    def _evict_user(self, uid: str):
+        user = self.cache.pop(uid, None)
+        self.last_access.pop(uid, None)
+        self.versions.pop(uid, None)
+        if user is not None:
+            for date_id in user.dates:
+                self.persisted_segments.pop((uid, date_id), None)
+        if self.on_evict is not None:
+            self.on_evict(uid)
+
+    def evict(self) -> int:
+        """Drop idle users, then least recently used ones while over the user or memory ceiling"""
+        now = time.monotonic()
+        evicted = 0
+        for uid, accessed in list(self.last_access.items()):
+            if now - accessed < self.idle_ttl:
+                break
+            if self._evictable(uid):
+                self._evict_user(uid)
+                self.counters["evicted_idle"] += 1
+                evicted += 1
+
+        over_users = len(self.cache) - self.max_users
+        memory = sum(estimate_user_bytes(user) for user in self.cache.values())
+        if over_users <= 0 and memory <= self.memory_limit:
+            return evicted
+        for uid in list(self.last_access):
+            if over_users <= 0 and memory <= self.memory_limit:
+                break
+            if not self._evictable(uid):
+                continue
+            memory -= estimate_user_bytes(self.cache[uid]) if uid in self.cache else 0
+            over_users -= 1
+            self._evict_user(uid)
+            self.counters["evicted_pressure"] += 1
+            evicted += 1
+        return evicted
+
+    async def release(self, uids: List[str]):
+        """Write the users' changes and drop them from the cache, for another worker to load"""
+        await self.flush()
+        for uid in uids:
+            if uid in self.cache:
+                self._evict_user(uid)
+                self.counters["released"] += 1
+
+    def stats(self) -> Dict:
+        users = list(self.cache.values())
+        return {
+            **self.counters,
+            "cached_users": len(users),
+            "estimated_bytes": sum(estimate_user_bytes(user) for user in users),
+        }
+
+    async def sync(self):
+        """In "sync" write mode, return once changes made so far are on disk"""
+        if self.write_mode == "sync":
+            await self.flush()
+
+    @property
+    def writer(self) -> sqlite3.Connection:
+        """Connection used by flushes, which run in a worker thread"""
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - self._last_evict >= self.evict_interval:
+                self._last_evict = time.monotonic()
+                self.evict()
+
+    def start(self):
+        """Start the periodic write-behind flush"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write whatever is still dirty"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
@@ -0,0 +1,165 @@
+"""Speculative precomputation of conversation tips for active dates"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, NamedTuple, Optional
+
+from app.config import (
+    TIP_CONTEXT_TOKENS,
+    TIP_PRECOMPUTE,
+    TIP_REFRESH_CHARS,
+    TIP_MIN_REFRESH_INTERVAL,
+    TIP_MAX_AGE,
+    TIP_MAX_STALE_CHARS,
+    TIP_PRECOMPUTE_PER_HOUR,
+)
+from app.models import DateObject
+
+logger = logging.getLogger(__name__)
+
+# Transcript needed before a tip is worth precomputing
+MIN_TRANSCRIPT_CHARS = 200
+
+BUDGET_WINDOW = 3600.0
+
+
+class CandidateTip(NamedTuple):
+    text: str
+    date_id: str
+    transcript_chars: int  # transcript length the tip was generated from
+    created_at: float
+
+
+class TipState:
+    """One user's cached tip, the generation in flight and the recent generation times"""
+
+    def __init__(self):
+        self.candidate: Optional[CandidateTip] = None
+        self.task: Optional[asyncio.Task] = None
+        self.generated_chars = -1  # transcript length of the newest generation started
+        self.date_id: Optional[str] = None
+        self.started: Deque[float] = deque()
+
+
+class TipPrecomputer:
+    """
+    Keeps a fresh candidate tip per active date so the stuck trigger answers from memory.
+
+    observe() runs after every transcript batch and starts a background generation when the
+    transcript has grown by `refresh_chars` since the last one (or there is no candidate),
+    at most once per `min_interval` seconds and `per_hour` times per user per hour. take()
+    hands out the candidate only if it is at most `max_age` seconds old and at most
+    `max_stale_chars` of transcript behind; otherwise the caller generates on demand.
+    """
+
+    def __init__(self, generate: Callable[[str, str], Awaitable[Optional[str]]],
+                 enabled: bool = TIP_PRECOMPUTE,
+                 context_tokens: int = TIP_CONTEXT_TOKENS,
+                 refresh_chars: int = TIP_REFRESH_CHARS,
+                 min_interval: float = TIP_MIN_REFRESH_INTERVAL,
+                 max_age: float = TIP_MAX_AGE,
+                 max_stale_chars: int = TIP_MAX_STALE_CHARS,
+                 per_hour: int = TIP_PRECOMPUTE_PER_HOUR):
+        self.generate = generate
+        self.enabled = enabled
+        self.context_tokens = context_tokens
+        self.refresh_chars = refresh_chars
+        self.min_interval = min_interval
+        self.max_age = max_age
+        self.max_stale_chars = max_stale_chars
+        self.per_hour = per_hour
+        self.states: Dict[str, TipState] = {}
+        self.counters = {
+            "precomputed": 0, "failed": 0, "unused": 0, "budget_skips": 0,
+            "hits": 0, "misses": 0, "stale_age": 0, "stale_transcript": 0,
+        }
+
+    def observe(self, uid: str, date: DateObject):
+        """Start a background tip generation for the user's date if the cached one has fallen behind"""
+        if not self.enabled or not date.is_active:
+            return
+        chars = len(date.transcript)
+        if chars < MIN_TRANSCRIPT_CHARS:
+            return
+        state = self.states.setdefault(uid, TipState())
+        if state.task is not None and not state.task.done():
+            return
+        if state.date_id != date.date_id:
+            state.date_id, state.candidate, state.generated_chars = date.date_id, None, -1
+        if state.candidate is not None and chars - state.generated_chars < self.refresh_chars:
+            return
+
+        now = time.monotonic()
+        if state.started and now - state.started[-1] < self.min_interval:
+            return
+        while state.started and now - state.started[0] > BUDGET_WINDOW:
+            state.started.popleft()
+        if len(state.started) >= self.per_hour:
+            self.counters["budget_skips"] += 1
+            return
+
+        state.started.append(now)
+        state.generated_chars = chars
+        text = date.transcript.tail(self.context_tokens)
+        state.task = asyncio.create_task(self._generate(uid, state, date.date_id, chars, text))
+
+    async def _generate(self, uid: str, state: TipState, date_id: str, chars: int, text: str):
+        try:
+            tip = await self.generate(uid, text)
+        except Exception as e:
+            logger.warning("Tip precompute failed: %s", e, extra={"uid": uid})
+            tip = None
+        if not tip:
+            self.counters["failed"] += 1
+            return
+        if state.date_id != date_id:
+            return
+        if state.candidate is not None:
+            self.counters["unused"] += 1
+        state.candidate = CandidateTip(tip, date_id, chars, time.monotonic())
+        self.counters["precomputed"] += 1
+
+    def take(self, uid: str, date: DateObject) -> Optional[str]:
+        """The cached tip for the user's date if it is still fresh (consumed), else None"""
+        state = self.states.get(uid)
+        candidate = state.candidate if state is not None else None
+        if candidate is None or candidate.date_id != date.date_id:
+            self.counters["misses"] += 1
+            return None
+
+        state.candidate = None
+        if time.monotonic() - candidate.created_at > self.max_age:
+            self.counters["stale_age"] += 1
+        elif len(date.transcript) - candidate.transcript_chars > self.max_stale_chars:
+            self.counters["stale_transcript"] += 1
+        else:
+            self.counters["hits"] += 1
+            return candidate.text
+        self.counters["misses"] += 1
+        return None
+
+    def discard(self, uid: str):
+        """Forget the user's tip and cancel its generation (e.g. the date ended)"""
+        state = self.states.pop(uid, None)
+        if state is not None and state.task is not None:
+            state.task.cancel()
+
+    async def stop(self):
+        """Cancel every tip generation in flight"""
+        tasks = [state.task for state in self.states.values() if state.task is not None]
+        for task in tasks:
+            task.cancel()
+        self.states.clear()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            "precomputes_per_hit": (
+                self.counters["precomputed"] / self.counters["hits"] if self.counters["hits"] else None
+            ),
+        }
@@ -0,0 +1,101 @@
+"""Append-only transcript storage for a date"""
+from array import array
+from typing import Dict, List, NamedTuple, Optional
+
+
+class TranscriptSegment(NamedTuple):
+    """One transcribed segment with the metadata the device sent along"""
+    text: str
+    speaker: Optional[str] = None
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+
+class TranscriptBuffer:
+    """
+    Chunked transcript: segments are appended without copying earlier text.
+    The full text is joined on demand and not kept, so a date holds each character once;
+    the request path uses the tail and window views, which only touch the segments they return.
+    """
+
+    def __init__(self):
+        self.segments: List[TranscriptSegment] = []
+        self.token_count = 0  # whitespace-separated words, maintained on append
+        self.char_count = 0
+        self._has_content = False
+        self._offsets = array("q")  # character offset of each segment in text()
+
+    def append(self, text: str, speaker: Optional[str] = None,
+               start: Optional[float] = None, end: Optional[float] = None):
+        """Append one segment"""
+        self._offsets.append(self.char_count + (1 if self.segments else 0))
+        self.segments.append(TranscriptSegment(text, speaker, start, end))
+        self.token_count += len(text.split())
+        self.char_count += len(text) + (1 if len(self.segments) > 1 else 0)
+        if not self._has_content and text.strip():
+            self._has_content = True
+
+    def extend(self, segments: List[Dict]):
+        """Append device segments (dicts with text and optional speaker/start/end)"""
+        for segment in segments:
+            self.append(
+                segment.get("text", ""),
+                segment.get("speaker"),
+                segment.get("start"),
+                segment.get("end"),
+            )
+
+    def has_content(self) -> bool:
+        """Whether any non-whitespace text has been recorded"""
+        return self._has_content
+
+    def text(self) -> str:
+        """Full transcript text, joined on every call (only the end-of-date summary needs it)"""
+        return " ".join(segment.text for segment in self.segments)
+
+    def tail(self, max_tokens: int) -> str:
+        """The last `max_tokens` words, built from the newest segments only"""
+        if max_tokens <= 0:
+            return ""
+        chunks: List[List[str]] = []
+        count = 0
+        for segment in reversed(self.segments):
+            segment_words = segment.text.split()
+            chunks.append(segment_words)
+            count += len(segment_words)
+            if count >= max_tokens:
+                break
+        words = [word for chunk in reversed(chunks) for word in chunk]
+        return " ".join(words[-max_tokens:])
+
+    def start_of_tail(self, max_chars: int, floor: int = 0) -> int:
+        """
+        Index of the first segment of the longest tail fitting in `max_chars` (never before `floor`).
+        The last segment is always included.
+        """
+        index = len(self.segments)
+        used = 0
+        while index > floor:
+            used += len(self.segments[index - 1].text) + 1
+            if used > max_chars and index < len(self.segments):
+                break
+            index -= 1
+        return index
+
+    def chars_before(self, index: int) -> int:
+        """Character offset in text() where segment `index` starts (char_count past the end)"""
+        if index >= len(self.segments):
+            return self.char_count
+        return self._offsets[index]
+
+    def text_from(self, start: int, end: Optional[int] = None) -> str:
+        """Text of segments[start:end]"""
+        if start == 0 and end is None:
+            return self.text()
+        return " ".join(segment.text for segment in self.segments[start:end])
+
+    def __len__(self) -> int:
+        return self.char_count
+
+    def __str__(self) -> str:
+        return self.text()
@@ -0,0 +1 @@
+"""Benchmarks for The Rizzistant (run with `python -m benchmarks.<name>`)"""
@@ -0,0 +1,107 @@
+"""
+analyze_date calls per minute per user, without and with per-user debouncing.
+
+Every simulated device posts bursts of small batches (a few in quick succession, then a
+pause) to /livetranscript for --duration seconds. "before" analyzes every batch as it
+arrives (the previous behaviour); "after" uses the configured debounce window and token
+threshold. The pre-filter gate is off in both modes so only debouncing is measured.
+
+    python -m benchmarks.bench_analysis_debounce --users 50 --duration 20
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+import app.main as main
+from app import models
+from app.coalesce import AnalysisCoalescer
+from app.gate import build_gate
+from benchmarks import stubs
+
+
+class CountingClaude(stubs.AsyncStubClaudeService):
+    """Async stub that tells started analyses apart from ones that ran to completion"""
+
+    def __init__(self, latency: float):
+        super().__init__(latency)
+        self.started = 0
+        self.completed = 0
+
+    async def analyze_date(self, *args, **kwargs):
+        self.started += 1
+        result = await super().analyze_date(*args, **kwargs)
+        self.completed += 1
+        return result
+
+
+async def run(mode: str, users: int, duration: float, burst: int, pause: float, latency: float) -> dict:
+    claude = CountingClaude(latency)
+    main.claude_service = claude
+    main.analysis_gate = build_gate("off")
+    if mode == "before":
+        main.analysis_coalescer = AnalysisCoalescer(main.analyze_batches, window=0, max_delay=0)
+    else:
+        main.analysis_coalescer = AnalysisCoalescer(main.analyze_batches)
+    models.users.clear()
+    # The ASGI transport skips the lifespan, which creates the tables
+    main.init_storage()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def post(uid: str, text: str):
+            response = await client.post(
+                "/livetranscript", params={"uid": uid}, json={"segments": [{"text": text}]}
+            )
+            response.raise_for_status()
+
+        async def device(uid: str, rng: random.Random):
+            await post(uid, "start date")
+            requests = []
+            deadline = time.perf_counter() + duration
+            n = 0
+            while time.perf_counter() < deadline:
+                for _ in range(rng.randint(1, burst)):
+                    n += 1
+                    requests.append(asyncio.create_task(post(uid, f"so anyway batch {n} was about the food")))
+                    await asyncio.sleep(rng.uniform(0.05, 0.3))
+                await asyncio.sleep(rng.uniform(0.5, pause))
+            await asyncio.gather(*requests)
+            return n
+
+        start = time.perf_counter()
+        batches = sum(await asyncio.gather(*(device(f"user-{i}", random.Random(i)) for i in range(users))))
+        elapsed = time.perf_counter() - start
+    await main.analysis_coalescer.stop()
+
+    minutes = elapsed / 60
+    return {
+        "mode": mode,
+        "batches_per_min": batches / users / minutes,
+        "calls_per_min": claude.started / users / minutes,
+        "completed_per_min": claude.completed / users / minutes,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds each device keeps posting")
+    parser.add_argument("--burst", type=int, default=4, help="max batches per burst")
+    parser.add_argument("--pause", type=float, default=3.0, help="max pause between bursts in seconds")
+    parser.add_argument("--latency", type=float, default=0.8, help="stubbed Claude latency in seconds")
+    args = parser.parse_args()
+
+    for mode in ("before", "after"):
+        result = asyncio.run(run(mode, args.users, args.duration, args.burst, args.pause, args.latency))
+        print(
+            f"{result['mode']:>6}: {result['batches_per_min']:5.1f} batches/min/user -> "
+            f"{result['calls_per_min']:5.1f} analyze_date calls/min/user "
+            f"({result['completed_per_min']:5.1f} completed)"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
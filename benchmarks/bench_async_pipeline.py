@@ -0,0 +1,86 @@
+"""
+Compare /livetranscript throughput with threadpool-offloaded vs native async services.
+
+Both modes run the same async route against stubbed services with identical latency;
+"threaded" wraps blocking stubs in ThreadedService (the old sync-handler behaviour),
+"async" awaits async stubs directly on the event loop. Every batch goes to Claude: the
+pre-filter is off and analyses are not debounced, so both modes pay the stubbed latency.
+
+    python -m benchmarks.bench_async_pipeline --users 1000 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import app.main as main
+from app import models
+from app.coalesce import AnalysisCoalescer
+from app.gate import build_gate
+from app.services import ThreadedService
+from benchmarks import stubs
+
+
+def install_services(mode: str, latency: float):
+    """Swap the route's services for stubs of the requested mode"""
+    if mode == "threaded":
+        main.claude_service = ThreadedService(stubs.StubClaudeService(latency))
+        main.emergency_lane.service = ThreadedService(stubs.StubTwilioService(latency))
+        main.omi_service = ThreadedService(stubs.StubOMIService(latency))
+        main.letta_service = ThreadedService(stubs.StubLettaService(latency))
+    else:
+        main.claude_service = stubs.AsyncStubClaudeService(latency)
+        main.emergency_lane.service = stubs.AsyncStubTwilioService(latency)
+        main.omi_service = stubs.AsyncStubOMIService(latency)
+        main.letta_service = stubs.AsyncStubLettaService(latency)
+    # The gate would skip the harmless benchmark text, and the debounce window would dominate the latency
+    main.analysis_gate = build_gate("off")
+    main.analysis_coalescer = AnalysisCoalescer(main.analyze_batches, window=0.0)
+
+
+async def run(mode: str, users: int, latency: float) -> dict:
+    install_services(mode, latency)
+    models.users.clear()
+    # The ASGI transport skips the lifespan, which creates the tables
+    main.init_storage()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post(uid: str, text: str):
+            response = await client.post(
+                "/livetranscript", params={"uid": uid},
+                json={"segments": [{"text": text}]}
+            )
+            response.raise_for_status()
+
+        # Start a date for every user (no external calls on this path)
+        await asyncio.gather(*(post(f"user-{i}", "start date") for i in range(users)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post(f"user-{i}", "so what do you do for fun") for i in range(users)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "requests": users,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(users / elapsed, 1),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="concurrent in-flight requests")
+    parser.add_argument("--latency", type=float, default=0.2, help="stubbed Claude latency in seconds")
+    args = parser.parse_args()
+
+    for mode in ("threaded", "async"):
+        result = asyncio.run(run(mode, args.users, args.latency))
+        print(
+            f"{result['mode']:>8}: {result['requests']} requests in {result['seconds']}s "
+            f"({result['requests_per_second']} req/s)"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
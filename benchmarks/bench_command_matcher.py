@@ -0,0 +1,71 @@
+"""
+Microbenchmark: single-pass CommandMatcher vs the original chained per-segment scans.
+
+    python -m benchmarks.bench_command_matcher --segments 500 --words 12
+"""
+import argparse
+import random
+import re
+import timeit
+
+from app.commands import get_command_matcher
+
+VOCABULARY = (
+    "so what do you do for fun i like hiking and movies the weather is nice today "
+    "we should get food maybe later okay yeah honestly that sounds great where did you grow up"
+).split()
+
+
+def chained_scan(segments, code_word):
+    """The original livetranscript detection: per-segment substring checks, then a regex pass"""
+    for text in segments:
+        text_lower = text.lower()
+        if "edit code word" in text_lower:
+            return "edit_code_word"
+        if "edit phone number" in text_lower:
+            return "edit_phone_number"
+        if code_word.lower() in text_lower:
+            return "code_word"
+        if "start date" in text_lower:
+            return "start_date"
+        if "end date" in text_lower:
+            return "end_date"
+    concatenated_text = " ".join(segments)
+    text_normalized = re.sub(r'[^\w\s]', '', concatenated_text.lower())
+    return "yeah okay so" in text_normalized
+
+
+def make_batch(segments: int, words: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+        for _ in range(segments)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--segments", type=int, default=500)
+    parser.add_argument("--words", type=int, default=12)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    batch = make_batch(args.segments, args.words)
+    code_word = "peanuts"
+    matcher = get_command_matcher(code_word)
+
+    # No command in the batch is the common (and worst) case: every scan runs to the end
+    cases = {
+        "chained": lambda: chained_scan(batch, code_word),
+        "matcher": lambda: matcher.scan(batch),
+    }
+    results = {}
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=args.number, repeat=5)) / args.number
+        results[name] = best
+        print(f"{name:>8}: {best * 1e6:9.1f} us/batch ({args.segments} segments)")
+    print(f" speedup: {results['chained'] / results['matcher']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
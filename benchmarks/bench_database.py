@@ -0,0 +1,119 @@
+"""
+Summary reads and writes per second under concurrent access: a fresh connection per call
+with default journaling (the previous database.py) vs pooled per-thread WAL connections.
+
+Each thread loops for --duration seconds doing --read-ratio reads (latest summary of a
+random user) and otherwise writes (one summary per date), like the job workers and request
+handlers sharing the database.
+
+    python -m benchmarks.bench_database --threads 1 4 8 --duration 3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from app import database
+
+USERS = 1000
+
+
+class PerCallDatabase:
+    """The previous access pattern: connect, execute, commit and close on every call"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS date_summaries (
+                uid TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at TIMESTAMP NOT NULL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def read(self, uid: str):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("SELECT summary FROM date_summaries WHERE uid = ?", (uid,)).fetchone()
+        conn.close()
+
+    def write(self, uid: str, date_id: str, summary: str):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute(
+            "INSERT OR REPLACE INTO date_summaries (uid, summary, created_at) VALUES (?, ?, ?)",
+            (uid, summary, datetime.now())
+        )
+        conn.commit()
+        conn.close()
+
+
+class PooledDatabase:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        database.init_database(db_path)
+
+    def read(self, uid: str):
+        database.get_previous_summary(uid, self.db_path)
+
+    def write(self, uid: str, date_id: str, summary: str):
+        database.save_summary(uid, summary, date_id, db_path=self.db_path)
+
+
+def run(db_cls, threads: int, duration: float, read_ratio: float) -> dict:
+    db = db_cls(os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "summaries.db"))
+    for i in range(USERS):
+        db.write(f"user-{i}", "date_0", "seed summary " * 20)
+
+    counts = [[0, 0] for _ in range(threads)]
+    start_barrier = threading.Barrier(threads + 1)
+
+    def worker(n: int):
+        rng = random.Random(n)
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            uid = f"user-{rng.randrange(USERS)}"
+            if rng.random() < read_ratio:
+                db.read(uid)
+                counts[n][0] += 1
+            else:
+                db.write(uid, f"date_{rng.randrange(1_000_000)}", "so the date went fine " * 20)
+                counts[n][1] += 1
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    database.close_connections()
+
+    reads, writes = sum(c[0] for c in counts), sum(c[1] for c in counts)
+    return {"reads_per_second": reads / elapsed, "writes_per_second": writes / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--read-ratio", type=float, default=0.8)
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        for name, cls in (("per-call", PerCallDatabase), ("pooled", PooledDatabase)):
+            result = run(cls, threads, args.duration, args.read_ratio)
+            print(
+                f"{threads} thread(s) {name:>8}: {result['reads_per_second']:9.0f} reads/s "
+                f"{result['writes_per_second']:9.0f} writes/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Load test of /livetranscript: many simulated devices replay transcript streams (small talk,
+risky topics, "yeah okay so", commands) at a realistic batch cadence against app.main with
+Claude/Letta/OMI/Twilio replaced by latency-configurable stubs (benchmarks.stub_app).
+
+The app runs in-process (lifespan included, over httpx's ASGI transport), in --workers
+local uvicorn workers, or at --url (start it with `uvicorn benchmarks.stub_app:app`).
+Streams are synthetic (seeded) or replayed from a JSONL file of
+{"uid", "offset", "segments"} lines, which --save-stream writes for the synthetic one.
+
+The report is JSON: throughput, p50/p95/p99 latency per response event type, memory growth
+of the serving process(es) and the commit measured; --compare diffs two reports.
+
+    python -m benchmarks.bench_load --users 200 --batches 30 --output after.json
+    python -m benchmarks.bench_load --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from benchmarks.bench_memory_soak import rss_mb
+from benchmarks.bench_session_store import free_port, wait_ready
+
+SMALL_TALK = [
+    "so I was telling her about the hiking trip we did last summer",
+    "she said she has been getting really into pottery lately",
+    "we both ordered the ramen and it was honestly amazing",
+    "her sister just moved to the city for a new job",
+    "haha yeah totally, that sounds like so much fun",
+    "what kind of music have you been listening to recently",
+]
+RISKY_TALK = [
+    "honestly the best part of my week was refactoring our python codebase",
+    "have you ever implemented a hash table from scratch, it's fascinating",
+    "my ex used to say the same thing about my algorithms homework",
+]
+# Words the stubbed analyze_date warns about (see RISKY_TALK)
+WARN_ON = ("python", "hash table", "algorithms")
+STUCK_TALK = "yeah okay so um"
+
+
+def synthetic_stream(users: int, batches: int, cadence: float, ramp: float, seed: int,
+                     risky: float, stuck: float, code_word: float) -> List[Dict]:
+    """
+    One date per user: "start date", `batches` transcript batches `cadence` seconds apart
+    (+-30% jitter), then "end date" (or, for a `code_word` share of users, the code word).
+    Users start spread over `ramp` seconds; offsets are seconds from the start of the run.
+    """
+    rng = random.Random(seed)
+    events = []
+    for n in range(users):
+        uid = f"load-{n}"
+        offset = rng.uniform(0, ramp)
+        events.append({"uid": uid, "offset": offset, "segments": [{"text": "hey, start date"}]})
+        if rng.random() < 0.1:
+            offset += cadence
+            events.append({"uid": uid, "offset": offset, "segments": [{"text": "edit phone number 555 010 1234"}]})
+        for batch in range(batches):
+            offset += cadence * rng.uniform(0.7, 1.3)
+            roll = rng.random()
+            if roll < risky:
+                text = rng.choice(RISKY_TALK)
+            elif roll < risky + stuck:
+                text = STUCK_TALK
+            else:
+                text = rng.choice(SMALL_TALK)
+            speaker = f"SPEAKER_0{batch % 2}"
+            events.append({"uid": uid, "offset": offset, "segments": [
+                {"text": text, "speaker": speaker, "start": batch * cadence, "end": batch * cadence + 2.0}
+            ]})
+        offset += cadence
+        last = "peanuts" if rng.random() < code_word else "okay, end date"
+        events.append({"uid": uid, "offset": offset, "segments": [{"text": last}]})
+    return events
+
+
+def load_stream(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_stream(path: str, events: List[Dict]):
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+
+def event_type(status: int, body) -> str:
+    """What a response was: its event_type, "warning" for an analysis warning, "none" for no notification"""
+    if status == 429:
+        return "rejected"
+    if status != 200:
+        return "error"
+    if not body:
+        return "none"
+    return body.get("event_type") or ("warning" if body.get("should_notify") else "none")
+
+
+async def replay(client: httpx.AsyncClient, events: List[Dict], speed: float) -> List[tuple]:
+    """Send each user's batches in order, none before its offset; returns (event type, seconds) per request"""
+    by_user: Dict[str, List[Dict]] = defaultdict(list)
+    for event in sorted(events, key=lambda e: e["offset"]):
+        by_user[event["uid"]].append(event)
+    results = []
+    start = time.perf_counter()
+
+    async def device(uid: str, batches: List[Dict]):
+        for event in batches:
+            delay = start + event["offset"] / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                response = await client.post("/livetranscript", params={"uid": uid},
+                                             json={"segments": event["segments"]})
+                kind = event_type(response.status_code, response.json() if response.status_code == 200 else None)
+            except httpx.HTTPError:
+                kind = "error"
+            results.append((kind, time.perf_counter() - sent))
+
+    await asyncio.gather(*(device(uid, batches) for uid, batches in by_user.items()))
+    return results
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending sequence"""
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def report(results: List[tuple], elapsed: float) -> Dict:
+    by_type: Dict[str, List[float]] = defaultdict(list)
+    for kind, seconds in results:
+        by_type[kind].append(seconds)
+    return {
+        "requests": len(results),
+        "seconds": elapsed,
+        "requests_per_second": len(results) / elapsed,
+        "errors": len(by_type.get("error", [])),
+        "overall": latency_summary([seconds for _, seconds in results]),
+        "events": {kind: latency_summary(seconds) for kind, seconds in sorted(by_type.items())},
+    }
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of a process and all its descendants (uvicorn's supervisor and workers)"""
+    total = 0.0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) / 1024
+            with open(f"/proc/{current}/task/{current}/children") as children:
+                pending.extend(int(child) for child in children.read().split())
+        except FileNotFoundError:
+            pass
+    return total
+
+
+def stub_env(args) -> Dict[str, str]:
+    env = {
+        "BENCH_CLAUDE_LATENCY": str(args.claude_latency),
+        "BENCH_LETTA_LATENCY": str(args.letta_latency),
+        "BENCH_OMI_LATENCY": str(args.omi_latency),
+        "BENCH_TWILIO_LATENCY": str(args.twilio_latency),
+        "BENCH_WARN_ON": ",".join(WARN_ON),
+        "LOG_LEVEL": "WARNING",
+    }
+    for setting in args.set:
+        key, _, value = setting.partition("=")
+        env[key] = value
+    return env
+
+
+async def run_in_process(events: List[Dict], args) -> Dict:
+    # app.config reads the environment at import, so the stubbed app is imported only now
+    os.environ.update(stub_env(args))
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-load-"), "app.db"))
+    import app.main as main
+    from benchmarks import stub_app
+
+    async with main.lifespan(stub_app.app):
+        transport = httpx.ASGITransport(app=stub_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            memory_before = rss_mb()["rss_mb"]
+            start = time.perf_counter()
+            results = await replay(client, events, args.speed)
+            elapsed = time.perf_counter() - start
+            memory_after = rss_mb()
+    result = report(results, elapsed)
+    result["memory"] = {
+        "rss_before_mb": memory_before,
+        "rss_after_mb": memory_after["rss_mb"],
+        "peak_rss_mb": memory_after["peak_rss_mb"],
+        "growth_mb": memory_after["rss_mb"] - memory_before,
+    }
+    result["stub_calls"] = {
+        "claude": main.claude_service.calls,
+        "letta": main.letta_service.calls,
+        "omi": main.omi_service.calls,
+        "twilio": main.emergency_lane.service.calls,
+    }
+    return result
+
+
+async def run_against(base_url: str, events: List[Dict], args, server_pid: Optional[int] = None) -> Dict:
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        memory_before = process_tree_rss_mb(server_pid) if server_pid else None
+        start = time.perf_counter()
+        results = await replay(client, events, args.speed)
+        elapsed = time.perf_counter() - start
+    result = report(results, elapsed)
+    if server_pid:
+        memory_after = process_tree_rss_mb(server_pid)
+        result["memory"] = {
+            "rss_before_mb": memory_before,
+            "rss_after_mb": memory_after,
+            "growth_mb": memory_after - memory_before,
+        }
+    return result
+
+
+def run_uvicorn(events: List[Dict], args) -> Dict:
+    port = free_port()
+    env = dict(os.environ, DB_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-load-"), "app.db"), **stub_env(args))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_app:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(base_url))
+        return asyncio.run(run_against(base_url, events, args, server.pid))
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path: str, after_path: str):
+    """Print throughput and per-event latency of two reports side by side"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{(new - old) / old:+7.1%}" if old else "    n/a"
+
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    old, new = before["requests_per_second"], after["requests_per_second"]
+    print(f"{'throughput (req/s)':24} {old:10.1f} {new:10.1f} {change(old, new)}")
+    for kind in sorted(set(before["events"]) | set(after["events"])):
+        for stat in ("p50_ms", "p95_ms", "p99_ms"):
+            old = before["events"].get(kind, {}).get(stat)
+            new = after["events"].get(kind, {}).get(stat)
+            if old is None or new is None:
+                continue
+            print(f"{kind + ' ' + stat:24} {old:10.1f} {new:10.1f} {change(old, new)}")
+    if "memory" in before and "memory" in after:
+        old, new = before["memory"]["growth_mb"], after["memory"]["growth_mb"]
+        print(f"{'memory growth (MB)':24} {old:10.1f} {new:10.1f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=20, help="transcript batches per date")
+    parser.add_argument("--cadence", type=float, default=1.0, help="seconds between a user's batches")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which users start")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay this many times faster than real time")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--risky", type=float, default=0.1, help="share of batches on a risky topic")
+    parser.add_argument("--stuck", type=float, default=0.05, help='share of batches with "yeah okay so"')
+    parser.add_argument("--code-word", type=float, default=0.05, help="share of users ending with the code word")
+    parser.add_argument("--stream", help="replay this JSONL stream instead of a synthetic one")
+    parser.add_argument("--save-stream", help="write the replayed stream here as JSONL")
+    parser.add_argument("--workers", type=int, help="serve from this many local uvicorn workers")
+    parser.add_argument("--url", help="load an already running server (benchmarks.stub_app)")
+    parser.add_argument("--connections", type=int, default=200, help="client connection pool size")
+    parser.add_argument("--claude-latency", type=float, default=0.3)
+    parser.add_argument("--letta-latency", type=float, default=1.0)
+    parser.add_argument("--omi-latency", type=float, default=0.1)
+    parser.add_argument("--twilio-latency", type=float, default=0.2)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="app setting for this run, e.g. ANALYSIS_DEBOUNCE_WINDOW=0.5 (repeatable)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two JSON reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.stream:
+        events = load_stream(args.stream)
+    else:
+        events = synthetic_stream(args.users, args.batches, args.cadence, args.ramp, args.seed,
+                                  args.risky, args.stuck, args.code_word)
+    if args.save_stream:
+        save_stream(args.save_stream, events)
+
+    if args.url:
+        target = args.url
+        result = asyncio.run(run_against(args.url, events, args))
+    elif args.workers:
+        target = f"uvicorn x{args.workers}"
+        result = run_uvicorn(events, args)
+    else:
+        target = "in-process"
+        result = asyncio.run(run_in_process(events, args))
+
+    output = {
+        "commit": current_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": target,
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        **result,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"{result['requests']} requests, {result['requests_per_second']:.1f} req/s, "
+              f"p95 {result['overall']['p95_ms']:.0f} ms -> {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
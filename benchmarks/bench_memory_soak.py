@@ -0,0 +1,108 @@
+"""
+Resident memory after --users users have each had a finished date and started another:
+every User and DateObject kept in process (no eviction) vs the session store archiving
+finished dates and evicting least recently used users beyond --max-users.
+
+Each mode runs in its own interpreter so their memory does not mix.
+
+    python -m benchmarks.bench_memory_soak --users 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.models import DateObject, User
+from app.store import SessionStore
+
+SENTENCES = [
+    "so I was telling her about the hiking trip we did last summer",
+    "she said she has been getting really into pottery lately",
+    "we both ordered the ramen and it was honestly amazing",
+    "her sister just moved to the city for a new job",
+]
+
+
+def rss_mb() -> dict:
+    """Current and peak resident set size from /proc"""
+    values = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                name, kb = line.split()[:2]
+                values[name.rstrip(":")] = int(kb) / 1024
+    return {"rss_mb": values.get("VmRSS"), "peak_rss_mb": values.get("VmHWM")}
+
+
+def have_dates(user: User, segments: int):
+    """One finished date, then a second one in progress"""
+    for _ in range(2):
+        user.date_counter += 1
+        date_id = f"date_{user.date_counter}"
+        date = user.dates[date_id] = DateObject(date_id)
+        user.current_date_id = date_id
+        for n in range(segments):
+            date.add_transcript(f"{SENTENCES[n % len(SENTENCES)]} ({user.uid} #{n})")
+        date.count = segments
+        date.add_warning("bro stop talking about python", "CS talk")
+    finished = user.dates[f"date_{user.date_counter - 1}"]
+    finished.finalize()
+
+
+async def soak(mode: str, users: int, segments: int, max_users: int, batch: int) -> dict:
+    start = time.perf_counter()
+    if mode == "unbounded":
+        cache = {}
+        for n in range(users):
+            user = cache[f"user-{n}"] = User(f"user-{n}")
+            have_dates(user, segments)
+        stats = {"cached_users": len(cache)}
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="soak-"), "sessions.db")
+        store = SessionStore(db_path, cache={}, max_users=max_users, idle_ttl=float("inf"))
+        store.init()
+        for n in range(users):
+            have_dates(store.get_or_create(f"user-{n}"), segments)
+            if (n + 1) % batch == 0:
+                await store.flush()
+                store.evict()
+        await store.flush()
+        store.evict()
+        stats = store.stats()
+        stats["db_mb"] = os.path.getsize(db_path) / 1024 / 1024
+    return {"mode": mode, "seconds": time.perf_counter() - start, **stats, **rss_mb()}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--segments", type=int, default=20, help="transcript segments per date")
+    parser.add_argument("--max-users", type=int, default=5000, help="cached users kept by the store")
+    parser.add_argument("--batch", type=int, default=1000, help="users between flush/evict rounds")
+    parser.add_argument("--mode", choices=("unbounded", "evicting"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        result = asyncio.run(soak(args.mode, args.users, args.segments, args.max_users, args.batch))
+        print(json.dumps(result))
+        return
+
+    for mode in ("unbounded", "evicting"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory_soak", *sys.argv[1:], "--mode", mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:>9}: {result['cached_users']:6d} users cached, RSS {result['rss_mb']:7.1f} MB "
+            f"(peak {result['peak_rss_mb']:7.1f} MB), {result['seconds']:5.1f}s"
+            + (f", database {result['db_mb']:.1f} MB" if "db_mb" in result else "")
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
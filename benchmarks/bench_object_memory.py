@@ -0,0 +1,139 @@
+"""
+Bytes per User, DateObject and warning: the compact models (__slots__, epoch-float
+timestamps, interned ids and reasons, warnings as tuples) vs the previous dict-backed
+objects with datetime fields and one dict per warning.
+
+Sizes are measured with tracemalloc over --count objects of each kind, so they include
+everything the object owns (instance dict, timestamps, strings that are not shared).
+
+    python -m benchmarks.bench_object_memory --count 20000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.context import RollingContext
+from app.models import DateObject, User
+from app.transcript import TranscriptBuffer
+
+REASONS = ["CS talk", "Talking too much", "Rude comment"]
+
+# Users rarely have more than a handful of dates, so date ids repeat across users
+DATE_IDS = 10
+
+
+class LegacyDateObject:
+    """The previous DateObject: instance __dict__, datetime fields, warnings as dicts"""
+
+    def __init__(self, date_id: str):
+        self.date_id = date_id
+        self.start_time = datetime.now()
+        self.transcript = TranscriptBuffer()
+        self.is_active = True
+        self.count = 0
+        self.end_time: Optional[datetime] = None
+        self.previous_warnings: List[Dict] = []
+        self.context = RollingContext()
+        self.batches_since_analysis = 0
+
+    def add_warning(self, warning_message: str, reason: str):
+        self.previous_warnings.append({
+            "message": warning_message,
+            "reason": reason,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def finalize(self):
+        self.is_active = False
+        self.end_time = datetime.now()
+
+
+class LegacyUser:
+    """The previous User: instance __dict__"""
+
+    def __init__(self, uid: str):
+        self.uid = uid
+        self.dates: Dict[str, LegacyDateObject] = {}
+        self.current_date_id: Optional[str] = None
+        self.date_counter = 0
+        self.code_word = "peanuts"
+        self.phone_number: Optional[str] = None
+        self.command_carry = ""
+
+
+def fresh(text: str) -> str:
+    """An unshared copy of `text`, like a string parsed from a request or a database row"""
+    return "".join(list(text))
+
+
+def bytes_per_object(build: Callable[[int], object], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(n) for n in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    # the list holding the objects is not part of any one of them
+    return (after - before) / count - 8
+
+
+def with_date(user_cls, date_cls, warnings: int):
+    def build(n: int):
+        user = user_cls(fresh(f"user-{n}"))
+        user.date_counter += 1
+        date = date_cls(fresh(f"date_{user.date_counter}"))
+        user.dates[date.date_id] = date
+        user.current_date_id = fresh(f"date_{user.date_counter}")
+        for k in range(warnings):
+            date.add_warning("bro stop talking about python", fresh(REASONS[k % len(REASONS)]))
+        date.finalize()
+        return user
+    return build
+
+
+def with_warnings(date_cls, warnings: int):
+    def build(n: int):
+        date = date_cls(fresh(f"date_{n % DATE_IDS + 1}"))
+        for k in range(warnings):
+            date.add_warning("bro stop talking about python", fresh(REASONS[k % len(REASONS)]))
+        return date
+    return build
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=20_000, help="objects built per measurement")
+    parser.add_argument("--warnings", type=int, default=5, help="warnings on the dates of the last two rows")
+    args = parser.parse_args()
+
+    cases = [
+        ("user (no dates)", lambda cls: lambda n: cls(fresh(f"user-{n}")), (LegacyUser, User)),
+        ("date (empty)", lambda cls: lambda n: cls(fresh(f"date_{n % DATE_IDS + 1}")),
+         (LegacyDateObject, DateObject)),
+        (f"date + {args.warnings} warnings", lambda cls: with_warnings(cls, args.warnings),
+         (LegacyDateObject, DateObject)),
+        (f"user + finished date + {args.warnings} warnings", lambda pair: with_date(*pair, args.warnings),
+         ((LegacyUser, LegacyDateObject), (User, DateObject))),
+    ]
+
+    start = time.perf_counter()
+    print(f"{'':38} {'before':>9} {'after':>9} {'saved':>7}")
+    for name, factory, (legacy, compact) in cases:
+        before = bytes_per_object(factory(legacy), args.count)
+        after = bytes_per_object(factory(compact), args.count)
+        print(f"{name:38} {before:8.0f}B {after:8.0f}B {1 - after / before:6.0%}")
+
+    warning_before = (bytes_per_object(with_warnings(LegacyDateObject, args.warnings), args.count)
+                      - bytes_per_object(with_warnings(LegacyDateObject, 0), args.count)) / args.warnings
+    warning_after = (bytes_per_object(with_warnings(DateObject, args.warnings), args.count)
+                     - bytes_per_object(with_warnings(DateObject, 0), args.count)) / args.warnings
+    print(f"{'per warning':38} {warning_before:8.0f}B {warning_after:8.0f}B {1 - warning_after / warning_before:6.0%}")
+    print(f"({args.count} objects per measurement, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main_cli()
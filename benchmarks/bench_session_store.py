@@ -0,0 +1,111 @@
+"""
+/livetranscript throughput with 1, 4 and 8 uvicorn workers sharing the SQLite session store.
+
+Each simulated device starts a date and then posts small-talk batches back to back (the
+pre-filter skips them, so no stubbed LLM latency is involved); requests for one user land on
+whichever worker accepts them. Afterwards the session database is checked for every segment
+("behind" write mode can lose some when consecutive batches hit different workers).
+
+    python -m benchmarks.bench_session_store --users 200 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url: str, timeout: float = 180.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def load(base_url: str, users: int, duration: float) -> int:
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def device(uid: str) -> int:
+            await client.post("/livetranscript", params={"uid": uid}, json={"segments": [{"text": "start date"}]})
+            sent = 0
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                response = await client.post(
+                    "/livetranscript", params={"uid": uid},
+                    json={"segments": [{"text": f"haha yeah totally {sent}"}]}
+                )
+                response.raise_for_status()
+                sent += 1
+            return sent
+
+        return sum(await asyncio.gather(*(device(f"user-{i}") for i in range(users))))
+
+
+def run(workers: int, users: int, duration: float, write_mode: str) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-store-"), "sessions.db")
+    port = free_port()
+    env = dict(os.environ, DB_PATH=db_path, SESSION_FLUSH_INTERVAL="0.25", SESSION_WRITE_MODE=write_mode, ANALYSIS_GATE_FORCE_EVERY="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_app:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(base_url))
+        start = time.perf_counter()
+        sent = asyncio.run(load(base_url, users, duration))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    conn = sqlite3.connect(db_path)
+    stored = conn.execute("SELECT COUNT(*) FROM session_segments").fetchone()[0]
+    conn.close()
+    return {
+        "workers": workers,
+        "requests": sent,
+        "requests_per_second": sent / elapsed,
+        "segments_stored": stored,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--write-mode", choices=["sync", "behind"], default="sync")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, SESSION_WRITE_MODE={args.write_mode}")
+    for workers in args.workers:
+        result = run(workers, args.users, args.duration, args.write_mode)
+        print(
+            f"{result['workers']} worker(s): {result['requests']} requests, "
+            f"{result['requests_per_second']:7.1f} req/s, "
+            f"{result['segments_stored']} of {result['requests']} segments persisted"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,131 @@
+"""
+/livetranscript throughput of the uid-sharded deployment (app.dispatcher) with 1 to N workers.
+
+Every simulated device replays one synthetic date (bench_load's stream: small talk, risky
+topics, "yeah okay so", commands) back to back, so throughput is bound by the servers, not by
+the batch cadence. Claude, Letta, OMI and Twilio are stubs with the given latencies. With
+--shared the same load also runs on `uvicorn --workers N` sharing sessions through SQLite
+("sync" write mode), the deployment sharding replaces. After the last run of each size the
+sharded deployment is resized to one more worker under a second wave of load, reporting the
+users moved and how long their requests were held.
+
+    python -m benchmarks.bench_sharding --workers 1 2 4 --users 400 --shared
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.bench_load import WARN_ON, replay, report, synthetic_stream
+from benchmarks.bench_session_store import free_port, wait_ready
+
+# Replay speed that turns a stream's offsets into "as fast as the server answers"
+BACK_TO_BACK = 1e9
+
+
+def stub_env(args, db_path: str) -> Dict[str, str]:
+    return dict(
+        os.environ,
+        DB_PATH=db_path,
+        BENCH_CLAUDE_LATENCY=str(args.claude_latency),
+        BENCH_LETTA_LATENCY=str(args.letta_latency),
+        BENCH_OMI_LATENCY=str(args.omi_latency),
+        BENCH_TWILIO_LATENCY=str(args.twilio_latency),
+        BENCH_WARN_ON=",".join(WARN_ON),
+        LOG_LEVEL="WARNING",
+    )
+
+
+def start_server(mode: str, workers: int, args):
+    port = free_port()
+    env = stub_env(args, os.path.join(tempfile.mkdtemp(prefix="bench-shard-"), "app.db"))
+    if mode == "sharded":
+        env.update(SHARD_WORKERS=str(workers), SHARD_APP="benchmarks.stub_app:app")
+        command = ["app.dispatcher:app"]
+    else:
+        env.update(SESSION_WRITE_MODE="sync")
+        command = ["benchmarks.stub_app:app", "--workers", str(workers)]
+    server = subprocess.Popen(
+        # Idle client connections outlive a resize's worker start-up instead of racing the server's close
+        [sys.executable, "-m", "uvicorn", *command, "--port", str(port), "--timeout-keep-alive", "60",
+         "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def drive(base_url: str, events: List[Dict], connections: int, resize_to: int = 0) -> Dict:
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        start = time.perf_counter()
+        results = await replay(client, events, BACK_TO_BACK)
+        result = report(results, time.perf_counter() - start)
+        if resize_to:
+            # Second wave with the same users, resized once it is under way
+            wave = asyncio.create_task(replay(client, events, BACK_TO_BACK))
+            await asyncio.sleep(0.5)
+            resize = (await client.post("/shard/resize", params={"workers": resize_to})).json()
+            resize["errors"] = sum(1 for kind, _ in await wave if kind == "error")
+            resize.update({key: value for key, value in (await client.get("/shard")).json().items()
+                           if key == "held_requests"})
+            result["resize"] = resize
+    return result
+
+
+def run(mode: str, workers: int, events: List[Dict], args, resize: bool) -> Dict:
+    server, base_url = start_server(mode, workers, args)
+    try:
+        asyncio.run(wait_ready(base_url))
+        return asyncio.run(drive(base_url, events, args.connections, workers + 1 if resize else 0))
+    finally:
+        server.terminate()
+        server.wait(60)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--batches", type=int, default=20, help="transcript batches per date")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--connections", type=int, default=400, help="client connection pool size")
+    parser.add_argument("--claude-latency", type=float, default=0.3)
+    parser.add_argument("--letta-latency", type=float, default=1.0)
+    parser.add_argument("--omi-latency", type=float, default=0.1)
+    parser.add_argument("--twilio-latency", type=float, default=0.2)
+    parser.add_argument("--shared", action="store_true", help="also run uvicorn --workers N on the shared store")
+    parser.add_argument("--resize", action="store_true", help="resize each sharded run to N + 1 under load")
+    args = parser.parse_args()
+
+    events = synthetic_stream(args.users, args.batches, cadence=1.0, ramp=0.0, seed=args.seed,
+                              risky=0.1, stuck=0.05, code_word=0.0)
+    print(f"{os.cpu_count()} CPUs, {len(events)} requests from {args.users} users per run")
+    modes = ["sharded", "shared"] if args.shared else ["sharded"]
+    for mode in modes:
+        baseline = None
+        for workers in args.workers:
+            result = run(mode, workers, events, args, args.resize and mode == "sharded")
+            throughput = result["requests_per_second"]
+            baseline = baseline or throughput / workers
+            print(
+                f"{mode:8} {workers:2} worker(s): {throughput:7.1f} req/s "
+                f"(x{throughput / baseline:.2f}, {throughput / (baseline * workers):4.0%} of linear), "
+                f"p95 {result['overall']['p95_ms']:6.0f} ms, {result['errors']} errors"
+            )
+            if "resize" in result:
+                resize = result["resize"]
+                print(
+                    f"{'':8} resized to {resize['workers']}: {resize['users_moved']} users moved, "
+                    f"{resize['held_requests']} requests held for {resize['handoff_seconds'] * 1000:.0f} ms, "
+                    f"{resize['errors']} errors"
+                )
+
+
+if __name__ == "__main__":
+    main_cli()
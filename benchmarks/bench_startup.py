@@ -0,0 +1,102 @@
+"""
+Cold start of app.main: import time (with `python -X importtime`'s slowest modules) and the
+time from launching uvicorn until the health check answers, each in fresh processes.
+
+Run on the commit before lazy clients and after to see the difference; --max-import-ms fails
+(exit status 1) when the median import is slower, for use as a regression check.
+
+    python -m benchmarks.bench_startup --runs 5 --top 15
+    python -m benchmarks.bench_startup --max-import-ms 1500
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_session_store import free_port, wait_ready
+
+# SDKs that should only be imported when their first client is built
+HEAVY_MODULES = ("anthropic", "letta_client", "twilio.rest", "requests")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+PROBE = (
+    "import sys, time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start); "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def fresh_env(**overrides) -> Dict[str, str]:
+    return dict(os.environ, DB_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-startup-"), "app.db"),
+                LOG_LEVEL="WARNING", **overrides)
+
+
+def measure_import() -> Tuple[float, List[str], List[Tuple[int, int, str]]]:
+    """Seconds to import app.main, heavy SDKs it loaded, and (self us, cumulative us, module) per import"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], env=fresh_env(),
+                            capture_output=True, text=True, check=True)
+    seconds, loaded = result.stdout.splitlines()[:2]
+    modules = [
+        (int(match.group(1)), int(match.group(2)), match.group(4))
+        for match in map(IMPORTTIME_LINE.match, result.stderr.splitlines()) if match
+    ]
+    return float(seconds), [name for name in loaded.split(",") if name], modules
+
+
+def measure_ready(prewarm: bool) -> float:
+    """Seconds from launching uvicorn until GET / answers"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=fresh_env(STARTUP_PREWARM=str(prewarm).lower()), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(wait_ready(f"http://127.0.0.1:{port}"))
+        return time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list (by cumulative time)")
+    parser.add_argument("--skip-server", action="store_true", help="only measure the import")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import takes longer")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_ms = statistics.median(seconds for seconds, _, _ in imports) * 1000
+    loaded = imports[-1][1]
+    print(f"import app.main: median {import_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(s for s, _, _ in imports) * 1000:.0f} ms)")
+    print(f"heavy SDKs imported: {', '.join(loaded) or 'none'}")
+
+    print(f"\nslowest imports (last run, cumulative / self ms):")
+    modules = sorted(imports[-1][2], key=lambda module: module[1], reverse=True)
+    for self_us, cumulative_us, name in modules[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+    if not args.skip_server:
+        print()
+        for prewarm in (False, True):
+            ready = [measure_ready(prewarm) for _ in range(args.runs)]
+            print(f"uvicorn until healthy (STARTUP_PREWARM={str(prewarm).lower()}): "
+                  f"median {statistics.median(ready) * 1000:.0f} ms")
+
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"\nFAIL: import took {import_ms:.0f} ms, budget {args.max_import_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
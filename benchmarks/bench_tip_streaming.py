@@ -0,0 +1,68 @@
+"""
+Time to first sentence of a conversation tip: the blocking call (wait for the whole
+completion) vs streaming and answering with the first complete sentence.
+
+The stubbed model takes --ttft seconds before its first token and --token-latency
+seconds per streamed delta (8 characters), and replies with a tip of a few sentences.
+Tips are requested --concurrency at a time for --requests requests.
+
+    python -m benchmarks.bench_tip_streaming --ttft 0.4 --token-latency 0.03
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services import AsyncClaudeService
+from benchmarks.stubs import AsyncStubAnthropic
+
+TIP = (
+    "Ask her what got her into figure skating in the first place. "
+    "People love talking about how they found their thing, and it keeps the focus on her. "
+    "If she lights up, follow up on the competition she mentioned earlier."
+)
+
+
+async def run(streaming: bool, requests: int, concurrency: int, ttft: float, token_latency: float) -> dict:
+    client = AsyncStubAnthropic(reply=TIP, latency=ttft, token_latency=token_latency)
+    service = AsyncClaudeService(client=client)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            tip = await service.generate_conversation_tip("so she said she skates competitively", streaming=streaming)
+            latencies.append(time.perf_counter() - start)
+            return tip
+
+    tips = await asyncio.gather(*(one() for _ in range(requests)))
+    latencies.sort()
+    return {
+        "mode": "streaming" if streaming else "blocking",
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "tip_chars": len(tips[0]),
+        "tokens_per_tip": client.streamed_tokens / requests if streaming else len(TIP) / 4,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--ttft", type=float, default=0.4, help="stubbed time to first token in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.03, help="seconds per streamed delta")
+    args = parser.parse_args()
+
+    for streaming in (False, True):
+        result = asyncio.run(run(streaming, args.requests, args.concurrency, args.ttft, args.token_latency))
+        print(
+            f"{result['mode']:>9}: time to first sentence p50 {result['p50'] * 1000:6.0f} ms, "
+            f"p95 {result['p95'] * 1000:6.0f} ms, {result['tokens_per_tip']:5.1f} output tokens read, "
+            f"{result['tip_chars']} chars sent"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,92 @@
+"""
+Time and memory of a long date: string concatenation vs the chunked TranscriptBuffer.
+
+Each batch is appended, then read the way the request path reads it. The old storage only
+had the full string, re-read every batch by the analysis prompt; the buffer serves a tail
+view, plus a full-text read every batch with --full-reads (joined afresh each time: the
+buffer keeps no copy of the full text, which is what the retained size measures).
+
+    python -m benchmarks.bench_transcript_buffer --batches 10000
+"""
+import argparse
+import random
+import time
+
+from app.transcript import TranscriptBuffer
+from benchmarks.sizing import deep_getsizeof
+
+WORDS = "so what do you do for fun i like hiking and movies the weather is nice today".split()
+
+
+class ConcatTranscript:
+    """The previous DateObject storage: one string grown with += on every batch"""
+
+    def __init__(self):
+        self.accumulated_transcript = ""
+
+    def add(self, segments):
+        self.accumulated_transcript += " " + " ".join(segment["text"] for segment in segments)
+
+    def text(self):
+        return self.accumulated_transcript
+
+
+class BufferTranscript:
+    def __init__(self):
+        self.buffer = TranscriptBuffer()
+
+    def add(self, segments):
+        self.buffer.extend(segments)
+
+    def text(self):
+        return self.buffer.text()
+
+    def tail(self, max_tokens):
+        return self.buffer.tail(max_tokens)
+
+
+def make_batches(count: int, segments_per_batch: int = 3, words: int = 12):
+    rng = random.Random(7)
+    return [
+        [
+            {"text": " ".join(rng.choice(WORDS) for _ in range(words)), "speaker": f"SPEAKER_0{i % 2}",
+             "start": n * 5.0 + i, "end": n * 5.0 + i + 1}
+            for i in range(segments_per_batch)
+        ]
+        for n in range(count)
+    ]
+
+
+def run(transcript_cls, batches, full_reads: bool, tail_tokens: int):
+    transcript = transcript_cls()
+    start = time.perf_counter()
+    for batch in batches:
+        transcript.add(batch)
+        if isinstance(transcript, ConcatTranscript):
+            transcript.text()
+        else:
+            transcript.tail(tail_tokens)
+            if full_reads:
+                transcript.text()
+    elapsed = time.perf_counter() - start
+    return elapsed, deep_getsizeof(transcript)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=10000)
+    parser.add_argument("--tail-tokens", type=int, default=200)
+    parser.add_argument("--full-reads", action="store_true", help="also read the full text every batch")
+    args = parser.parse_args()
+
+    batches = make_batches(args.batches)
+    for name, cls in (("concat", ConcatTranscript), ("buffer", BufferTranscript)):
+        elapsed, retained = run(cls, batches, args.full_reads, args.tail_tokens)
+        print(
+            f"{name:>7}: {args.batches} batches in {elapsed:7.3f}s "
+            f"({elapsed / args.batches * 1e6:7.1f} us/batch), retained {retained / 1e6:6.2f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""Object size helpers for memory benchmarks"""
+import gc
+import sys
+
+
+def deep_getsizeof(*objects) -> int:
+    """Bytes retained by objects and everything they reference (shared objects counted once)"""
+    seen = set()
+    pending = list(objects)
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return total
@@ -0,0 +1,26 @@
+"""
+app.main with every external service replaced by async stubs, for benchmarks that run real
+uvicorn workers (`uvicorn benchmarks.stub_app:app --workers 4`). Stub latency comes from
+BENCH_STUB_LATENCY (seconds, default 0.2), overridden per service by BENCH_CLAUDE_LATENCY,
+BENCH_LETTA_LATENCY, BENCH_OMI_LATENCY and BENCH_TWILIO_LATENCY. The stubbed analyze_date
+warns when a batch mentions one of the comma-separated BENCH_WARN_ON words.
+"""
+import os
+
+import app.main as main
+from benchmarks import stubs
+
+latency = float(os.environ.get("BENCH_STUB_LATENCY", "0.2"))
+
+
+def stub_latency(service: str) -> float:
+    return float(os.environ.get(f"BENCH_{service}_LATENCY", latency))
+
+
+warn_on = [word for word in os.environ.get("BENCH_WARN_ON", "").split(",") if word]
+main.claude_service = stubs.AsyncStubClaudeService(stub_latency("CLAUDE"), warn_on)
+main.emergency_lane.service = stubs.AsyncStubTwilioService(stub_latency("TWILIO"))
+main.omi_service = stubs.AsyncStubOMIService(stub_latency("OMI"))
+main.letta_service = stubs.AsyncStubLettaService(stub_latency("LETTA"))
+
+app = main.app
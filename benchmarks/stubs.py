@@ -0,0 +1,328 @@
+"""Latency-configurable stand-ins for the external services"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from app.context import estimate_tokens
+
+# How far back (in content blocks) the API looks for an earlier cache entry from a breakpoint
+CACHE_LOOKBACK_BLOCKS = 20
+
+# Price of cache writes and reads relative to uncached input tokens
+CACHE_WRITE_PRICE = 1.25
+CACHE_READ_PRICE = 0.1
+
+
+class StubAnthropic:
+    """
+    Messages API stand-in (`client.messages.create`) that simulates prompt caching.
+
+    Prefixes ending at a `cache_control` block are cached by content; a later request
+    reads the longest cached prefix within CACHE_LOOKBACK_BLOCKS of each breakpoint.
+    Each response carries the usage fields of the real API (tokens estimated as chars / 4)
+    and running totals are kept in `totals`.
+
+    With `tools`, the reply is the input of a tool_use block. With `stream=True` the response
+    is a stream of raw events, one delta per STREAM_CHUNK_CHARS of reply taking
+    `token_latency` seconds each; `streamed_tokens` counts the output tokens actually read.
+    A non-streamed response takes as long as streaming all of it.
+    """
+
+    STREAM_CHUNK_CHARS = 8
+
+    def __init__(self, reply: Union[str, Callable[[List[Dict], List[Dict]], str]] = '{"should_notify": false}',
+                 min_cacheable_tokens: int = 1024, latency: float = 0.0, token_latency: float = 0.0):
+        self.reply = reply
+        self.min_cacheable_tokens = min_cacheable_tokens
+        self.latency = latency
+        self.token_latency = token_latency
+        self.messages = self
+        self.cache = set()
+        self.calls = 0
+        self.streamed_tokens = 0
+        self.totals = {"input_tokens": 0, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+
+    def create(self, *, model: str, max_tokens: int, messages: List[Dict],
+               system: Union[str, List[Dict], None] = None, tools: Optional[List[Dict]] = None,
+               stream: bool = False, **kwargs):
+        time.sleep(self.latency)
+        message = self.respond(model, system, messages, tools)
+        if stream:
+            return StubStream(self, message, time.sleep)
+        time.sleep(self.generation_time(message))
+        return message
+
+    def generation_time(self, message) -> float:
+        """Seconds a non-streamed response takes to generate in full at `token_latency` per delta"""
+        block = message.content[0]
+        text = block.text if block.type == "text" else block.raw_input
+        return self.token_latency * -(-len(text) // self.STREAM_CHUNK_CHARS)
+
+    def stream_events(self, message):
+        """Raw stream events for a response built by respond()"""
+        block = message.content[0]
+        text = block.text if block.type == "text" else block.raw_input
+        start_usage = SimpleNamespace(**{**vars(message.usage), "output_tokens": 1})
+        yield SimpleNamespace(type="message_start", message=SimpleNamespace(usage=start_usage))
+        if block.type == "text":
+            start_block, delta_type, field = SimpleNamespace(type="text", text=""), "text_delta", "text"
+        else:
+            start_block = SimpleNamespace(type="tool_use", name=block.name, input={})
+            delta_type, field = "input_json_delta", "partial_json"
+        yield SimpleNamespace(type="content_block_start", index=0, content_block=start_block)
+        for offset in range(0, len(text), self.STREAM_CHUNK_CHARS):
+            chunk = text[offset:offset + self.STREAM_CHUNK_CHARS]
+            self.streamed_tokens += estimate_tokens(chunk)
+            yield SimpleNamespace(type="content_block_delta", index=0,
+                                  delta=SimpleNamespace(type=delta_type, **{field: chunk}))
+        yield SimpleNamespace(type="content_block_stop", index=0)
+        yield SimpleNamespace(
+            type="message_delta",
+            delta=SimpleNamespace(stop_reason="tool_use" if block.type == "tool_use" else "end_turn"),
+            usage=SimpleNamespace(output_tokens=message.usage.output_tokens),
+        )
+        yield SimpleNamespace(type="message_stop")
+
+    def respond(self, model: str, system, messages: List[Dict], tools: Optional[List[Dict]] = None):
+        system = [{"type": "text", "text": system}] if isinstance(system, str) else (system or [])
+        blocks = list(system)
+        for message in messages:
+            content = message["content"]
+            blocks.extend([{"type": "text", "text": content}] if isinstance(content, str) else content)
+
+        # Prefix keys and cumulative token counts at every block boundary
+        keys, prefix_tokens = [], []
+        key, tokens = model, 0
+        for block in blocks:
+            key = hash((key, block.get("text", "")))
+            tokens += estimate_tokens(block.get("text"))
+            keys.append(key)
+            prefix_tokens.append(tokens)
+
+        cached_upto = 0  # tokens served from or written to the cache so far
+        cache_read = cache_write = 0
+        for index, block in enumerate(blocks):
+            if "cache_control" not in block or prefix_tokens[index] < self.min_cacheable_tokens:
+                continue
+            for hit in range(index, max(index - CACHE_LOOKBACK_BLOCKS, -1), -1):
+                if keys[hit] in self.cache:
+                    cache_read += max(prefix_tokens[hit] - cached_upto, 0)
+                    cached_upto = max(cached_upto, prefix_tokens[hit])
+                    break
+            cache_write += max(prefix_tokens[index] - cached_upto, 0)
+            cached_upto = max(cached_upto, prefix_tokens[index])
+            self.cache.add(keys[index])
+
+        usage = {
+            "input_tokens": tokens - cache_read - cache_write,
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_write,
+        }
+        for field, value in usage.items():
+            self.totals[field] += value
+        self.calls += 1
+
+        text = self.reply(system, messages) if callable(self.reply) else self.reply
+        if tools:
+            # raw_input is streamed as is, so a reply can also stand for truncated or malformed output
+            try:
+                tool_input = json.loads(text)
+            except json.JSONDecodeError:
+                tool_input = None
+            block = SimpleNamespace(type="tool_use", name=tools[0]["name"], input=tool_input, raw_input=text)
+        else:
+            block = SimpleNamespace(type="text", text=text)
+        return SimpleNamespace(
+            content=[block],
+            usage=SimpleNamespace(output_tokens=estimate_tokens(text), **usage),
+        )
+
+    def prompt_tokens(self) -> int:
+        """All prompt tokens sent so far, cached or not"""
+        return sum(self.totals.values())
+
+    def relative_cost(self) -> float:
+        """Prompt cost so far relative to sending every token uncached"""
+        total = self.prompt_tokens()
+        if not total:
+            return 1.0
+        cost = (
+            self.totals["input_tokens"]
+            + CACHE_WRITE_PRICE * self.totals["cache_creation_input_tokens"]
+            + CACHE_READ_PRICE * self.totals["cache_read_input_tokens"]
+        )
+        return cost / total
+
+
+class StubStream:
+    """A streamed stub response: iterate (sync or async) for raw events, close() to stop early"""
+
+    def __init__(self, client: StubAnthropic, message, sleep: Callable):
+        self.events = client.stream_events(message)
+        self.token_latency = client.token_latency
+        self.sleep = sleep
+
+    def __iter__(self):
+        for event in self.events:
+            if event.type == "content_block_delta" and self.token_latency:
+                self.sleep(self.token_latency)
+            yield event
+
+    async def __aiter__(self):
+        for event in self.events:
+            if event.type == "content_block_delta" and self.token_latency:
+                await self.sleep(self.token_latency)
+            yield event
+
+    def close(self):
+        self.events.close()
+
+
+class AsyncStubStream(StubStream):
+    async def close(self):
+        self.events.close()
+
+
+class AsyncStubAnthropic(StubAnthropic):
+    """StubAnthropic with an awaitable `messages.create`, standing in for AsyncAnthropic"""
+
+    async def create(self, *, model: str, max_tokens: int, messages: List[Dict],
+                     system: Union[str, List[Dict], None] = None, tools: Optional[List[Dict]] = None,
+                     stream: bool = False, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = self.respond(model, system, messages, tools)
+        if stream:
+            return AsyncStubStream(self, message, asyncio.sleep)
+        await asyncio.sleep(self.generation_time(message))
+        return message
+
+
+def stub_analysis(current_text: str, warn_on: Sequence[str]) -> Dict:
+    """A warning when the text mentions one of the `warn_on` words, otherwise no notification"""
+    lowered = current_text.lower()
+    for word in warn_on:
+        if word in lowered:
+            return {"should_notify": True, "message": f"bro stop talking about {word}", "reason": "CS talk"}
+    return {"should_notify": False}
+
+
+class StubClaudeService:
+    """Blocking ClaudeService stand-in that sleeps instead of calling the API"""
+
+    def __init__(self, latency: float = 0.2, warn_on: Sequence[str] = ()):
+        self.latency = latency
+        self.warn_on = tuple(warn_on)
+        self.calls = 0
+
+    def analyze_date(self, current_text: str, accumulated_transcript: str,
+                     previous_warnings: Optional[List[Dict]] = None,
+                     earlier_summary: Optional[str] = None,
+                     cached_transcript: Optional[List[str]] = None) -> Dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        return stub_analysis(current_text, self.warn_on)
+
+    def summarize_context(self, previous_summary: Optional[str], new_transcript: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return "They talked about hobbies and food."
+
+    def generate_conversation_tip(self, accumulated_transcript: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return "Ask them what they're looking forward to this week."
+
+
+class AsyncStubClaudeService:
+    """Async ClaudeService stand-in that awaits instead of calling the API"""
+
+    def __init__(self, latency: float = 0.2, warn_on: Sequence[str] = ()):
+        self.latency = latency
+        self.warn_on = tuple(warn_on)
+        self.calls = 0
+
+    async def analyze_date(self, current_text: str, accumulated_transcript: str,
+                           previous_warnings: Optional[List[Dict]] = None,
+                           earlier_summary: Optional[str] = None,
+                           cached_transcript: Optional[List[str]] = None) -> Dict:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return stub_analysis(current_text, self.warn_on)
+
+    async def summarize_context(self, previous_summary: Optional[str], new_transcript: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return "They talked about hobbies and food."
+
+    async def generate_conversation_tip(self, accumulated_transcript: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return "Ask them what they're looking forward to this week."
+
+
+class StubTwilioService:
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.calls = 0
+
+    def make_emergency_call(self, phone_number: Optional[str] = None) -> bool:
+        self.calls += 1
+        time.sleep(self.latency)
+        return True
+
+
+class AsyncStubTwilioService:
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.calls = 0
+
+    async def make_emergency_call(self, phone_number: Optional[str] = None) -> bool:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return True
+
+
+class StubOMIService:
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.calls = 0
+
+    def create_memory(self, user_id: str, summary: str, idempotency_key: Optional[str] = None) -> bool:
+        self.calls += 1
+        time.sleep(self.latency)
+        return True
+
+
+class AsyncStubOMIService:
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.calls = 0
+
+    async def create_memory(self, user_id: str, summary: str, idempotency_key: Optional[str] = None) -> bool:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return True
+
+
+class StubLettaService:
+    def __init__(self, latency: float = 1.0):
+        self.latency = latency
+        self.calls = 0
+
+    def process_date_end(self, user_id: str, transcript: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"# DATE PERFORMANCE REPORT\nStub summary for {user_id}"
+
+
+class AsyncStubLettaService:
+    def __init__(self, latency: float = 1.0):
+        self.latency = latency
+        self.calls = 0
+
+    async def process_date_end(self, user_id: str, transcript: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return f"# DATE PERFORMANCE REPORT\nStub summary for {user_id}"
@@ -0,0 +1,16 @@
+"""Point the app's SQLite database at a throwaway file for the whole test session"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="rizzistant-tests-"), "test.db"))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def app_tables():
+    """Tests drive app.main over the ASGI transport, which skips its lifespan, so create its tables here"""
+    main = sys.modules.get("app.main")
+    if main is not None:
+        main.init_storage()
@@ -0,0 +1,133 @@
+"""Tests for per-user session actors"""
+import asyncio
+import random
+
+import httpx
+import pytest
+
+import app.main as main
+from app import models
+from app.actors import ActorRegistry, MailboxFull
+from app.coalesce import AnalysisCoalescer
+from app.gate import build_gate
+
+
+class RecordingClaude:
+    """Claude stand-in that tracks per-user concurrency and what each call saw"""
+
+    def __init__(self):
+        self.in_flight = {}
+        self.max_in_flight = 0
+        self.seen = []
+
+    async def analyze_date(self, current_text, accumulated_transcript, previous_warnings=None,
+                           earlier_summary=None, cached_transcript=None):
+        uid = current_text.split(":")[0]
+        self.in_flight[uid] = self.in_flight.get(uid, 0) + 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight[uid])
+        window = [*(cached_transcript or []), accumulated_transcript]
+        self.seen.append((current_text, " ".join(part for part in window if part)))
+        try:
+            await asyncio.sleep(random.uniform(0, 0.005))
+        finally:
+            self.in_flight[uid] -= 1
+        return {"should_notify": False}
+
+    async def summarize_context(self, previous_summary, new_transcript):
+        return None
+
+
+def test_messages_for_one_uid_run_in_arrival_order():
+    async def run():
+        order = []
+
+        async def handler(uid, message):
+            await asyncio.sleep(random.uniform(0, 0.002))
+            order.append(message)
+            return message
+
+        registry = ActorRegistry(handler, mailbox_size=1000)
+        results = await asyncio.gather(*(registry.submit("user-1", i) for i in range(200)))
+        await registry.stop()
+        return order, results
+
+    order, results = asyncio.run(run())
+    assert order == list(range(200))
+    assert results == list(range(200))
+
+
+def test_different_users_run_concurrently():
+    async def run():
+        async def handler(uid, message):
+            await asyncio.sleep(0.05)
+
+        registry = ActorRegistry(handler)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(registry.submit(f"user-{i}", None) for i in range(100)))
+        elapsed = loop.time() - start
+        await registry.stop()
+        return elapsed
+
+    assert asyncio.run(run()) < 1.0
+
+
+def test_full_mailbox_rejects_and_idle_actor_is_torn_down():
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(uid, message):
+            await release.wait()
+
+        registry = ActorRegistry(handler, mailbox_size=2, idle_timeout=0.05)
+        pending = [asyncio.create_task(registry.submit("user-1", i)) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(MailboxFull):
+            await registry.submit("user-1", 2)
+        release.set()
+        await asyncio.gather(*pending)
+        await asyncio.sleep(0.2)
+        return registry.actors
+
+    assert asyncio.run(run()) == {}
+
+
+def test_concurrent_batches_for_same_uid_keep_transcript_consistent(monkeypatch):
+    claude = RecordingClaude()
+    monkeypatch.setattr(main, "claude_service", claude)
+    monkeypatch.setattr(main, "analysis_gate", build_gate("off"))
+    monkeypatch.setattr(main, "analysis_coalescer", AnalysisCoalescer(main.analyze_batches, window=0.01))
+    monkeypatch.setattr(main, "session_actors", ActorRegistry(main.handle_session_message, mailbox_size=1000))
+    models.users.clear()
+    users = [f"stress-{i}" for i in range(5)]
+    batches = 100
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post(uid, text):
+                response = await client.post(
+                    "/livetranscript", params={"uid": uid}, json={"segments": [{"text": text}]}
+                )
+                assert response.status_code == 200
+
+            await asyncio.gather(*(post(uid, "start date") for uid in users))
+            await asyncio.gather(*(
+                post(uid, f"{uid}: batch {n}") for n in range(batches) for uid in users
+            ))
+        await main.session_actors.stop()
+
+    asyncio.run(run())
+
+    assert claude.max_in_flight == 1
+    for uid in users:
+        user = models.users[uid]
+        assert user.date_counter == 1
+        date = user.dates[user.current_date_id]
+        assert date.count == batches
+        parts = [part.strip() for part in date.accumulated_transcript.split(f"{uid}:") if part.strip()]
+        assert sorted(parts) == sorted(f"batch {n}" for n in range(batches))
+
+    # Every analysis saw a transcript ending with exactly the batch it was analyzing
+    for current_text, accumulated in claude.seen:
+        assert accumulated.endswith(current_text)
@@ -0,0 +1,152 @@
+"""Tests for the durable, single-flight Letta agent registry"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents import AgentRegistry
+from app.services import AsyncLettaService, LettaService
+
+
+class FakeAsyncLetta:
+    """Counts agents.create calls; creation is slow so concurrent callers overlap"""
+
+    def __init__(self, latency=0.05, fail=0):
+        self.latency = latency
+        self.fail = fail
+        self.created = 0
+        self.agents = SimpleNamespace(create=self._create)
+
+    async def _create(self, **kwargs):
+        self.created += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("letta unavailable")
+        return SimpleNamespace(id=f"agent-{self.created}")
+
+
+class FakeLetta:
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.created = 0
+        self._lock = threading.Lock()
+        self.agents = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        with self._lock:
+            self.created += 1
+            n = self.created
+        time.sleep(self.latency)
+        return SimpleNamespace(id=f"agent-{n}")
+
+
+@pytest.fixture
+def db_path():
+    return os.path.join(tempfile.mkdtemp(prefix="agents-"), "agents.db")
+
+
+@pytest.fixture(autouse=True)
+def letta_key(monkeypatch):
+    monkeypatch.setattr("app.services.LETTA_API_KEY", "test-key")
+
+
+def test_concurrent_callers_share_one_creation(db_path):
+    client = FakeAsyncLetta()
+    service = AsyncLettaService(client=client, registry=AgentRegistry(db_path))
+
+    async def run():
+        return await asyncio.gather(*(service.get_or_create_agent("u") for _ in range(50)))
+
+    ids = asyncio.run(run())
+    assert client.created == 1
+    assert set(ids) == {"agent-1"}
+
+
+def test_agent_survives_restart_and_is_shared_across_workers(db_path):
+    client = FakeAsyncLetta()
+
+    async def run():
+        # Two registries on one database stand in for two worker processes
+        first = AsyncLettaService(client=client, registry=AgentRegistry(db_path))
+        second = AsyncLettaService(client=client, registry=AgentRegistry(db_path))
+        ids = await asyncio.gather(*(
+            service.get_or_create_agent("u") for _ in range(10) for service in (first, second)
+        ))
+        restarted = AsyncLettaService(client=client, registry=AgentRegistry(db_path))
+        return ids, await restarted.get_or_create_agent("u")
+
+    ids, after_restart = asyncio.run(run())
+    assert client.created == 1
+    assert set(ids) == {after_restart} == {"agent-1"}
+
+
+def test_threaded_service_creates_one_agent(db_path):
+    client = FakeLetta()
+    service = LettaService(client=client, registry=AgentRegistry(db_path))
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.append(service.get_or_create_agent("u"))) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.created == 1
+    assert set(ids) == {"agent-1"}
+
+
+def test_failed_creation_is_retried_by_the_next_call(db_path):
+    client = FakeAsyncLetta(fail=1)
+    service = AsyncLettaService(client=client, registry=AgentRegistry(db_path))
+
+    async def run():
+        failed = await asyncio.gather(*(service.get_or_create_agent("u") for _ in range(5)))
+        return failed, await service.get_or_create_agent("u")
+
+    failed, retried = asyncio.run(run())
+    assert failed == [None] * 5
+    assert retried == "agent-2"
+    assert client.created == 2
+
+
+def test_lru_is_bounded_and_falls_back_to_the_database(db_path):
+    registry = AgentRegistry(db_path, cache_size=2)
+    for uid in ("a", "b", "c"):
+        assert registry.try_claim(uid)
+        registry.record(uid, f"agent-{uid}")
+    assert list(registry.cache) == ["b", "c"]
+    assert registry.lookup("a") == "agent-a"
+    assert list(registry.cache) == ["c", "a"]
+
+
+def test_event_loop_keeps_serving_while_the_claim_row_is_locked(db_path):
+    registry = AgentRegistry(db_path)
+    registry.lookup("warm-up")  # creates the table
+    blocker = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")  # another worker holding the write lock
+    threading.Timer(0.3, blocker.rollback).start()
+
+    async def create():
+        return "agent-1"
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        agent_id = await registry.get_or_create("u", create)
+        ticking.cancel()
+        return agent_id, ticks
+
+    agent_id, ticks = asyncio.run(run())
+    assert agent_id == "agent-1"
+    assert ticks >= 10  # the loop ran other tasks while the claim waited on the lock
@@ -0,0 +1,80 @@
+"""Tests for the streamed, schema-constrained analyze_date output"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.analysis import AnalysisStreamParser
+from app.prompts import DATE_ANALYSIS_TOOL
+from app.services import AsyncClaudeService, ClaudeService
+from benchmarks.stubs import AsyncStubAnthropic, StubAnthropic
+
+# A "no" answer that keeps going after should_notify, as a model might
+LONG_NO = json.dumps({"should_notify": False, "reason": "none", "message": "all good " * 30})
+WARNING = json.dumps({"should_notify": True, "reason": "CS talk", "message": "bro really talking about python rn"})
+
+
+def test_stream_is_closed_once_should_notify_is_false():
+    client = StubAnthropic(reply=LONG_NO, min_cacheable_tokens=0)
+    service = ClaudeService(client=client)
+
+    result = service.analyze_date("so anyway", "we were talking about hiking")
+
+    assert result["should_notify"] is False
+    assert "message" not in result
+    assert result["output_tokens"] < 10
+    assert client.streamed_tokens < 10 < len(LONG_NO) // 4
+    stats = service.analysis_stats.snapshot()
+    assert (stats["calls"], stats["early_stops"], stats["parse_failures"]) == (1, 1, 0)
+
+
+def test_warning_is_read_to_the_end_and_parsed():
+    client = AsyncStubAnthropic(reply=WARNING, min_cacheable_tokens=0)
+    service = AsyncClaudeService(client=client)
+
+    result = asyncio.run(service.analyze_date("I love recursion", "we were talking about code"))
+
+    assert result["should_notify"] is True
+    assert result["message"] == "bro really talking about python rn"
+    assert result["reason"] == "CS talk"
+    assert result["output_tokens"] == client.streamed_tokens
+    assert result["prompt_tokens"] == client.prompt_tokens()
+    assert service.analysis_stats.snapshot()["early_stops"] == 0
+
+
+def test_truncated_output_is_counted_as_a_parse_failure():
+    client = StubAnthropic(reply='{"should_notify": true, "message": "yo shut up ab', min_cacheable_tokens=0)
+    service = ClaudeService(client=client)
+
+    result = service.analyze_date("one piece is peak", "")
+
+    assert result["should_notify"] is False
+    assert result["parse_failed"] is True
+    assert service.analysis_stats.snapshot()["parse_failures"] == 1
+
+
+def test_request_forces_the_analysis_tool_with_a_tight_output_cap():
+    seen = {}
+
+    class Recording(StubAnthropic):
+        def create(self, **kwargs):
+            seen.update(kwargs)
+            return super().create(**kwargs)
+
+    ClaudeService(client=Recording()).analyze_date("hi", "")
+
+    assert seen["tools"] == [DATE_ANALYSIS_TOOL]
+    assert seen["tool_choice"] == {"type": "tool", "name": "report_analysis"}
+    assert seen["stream"] is True
+    assert seen["max_tokens"] <= 200
+
+
+def test_parser_finds_should_notify_split_across_deltas():
+    parser = AnalysisStreamParser()
+    events = [
+        SimpleNamespace(type="content_block_start", content_block=SimpleNamespace(type="tool_use")),
+        *(SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="input_json_delta", partial_json=part))
+          for part in ('{"should_no', 'tify"', ': fa', 'lse, "reason"')),
+    ]
+    stops = [parser.feed(event) for event in events]
+    assert stops == [False, False, False, False, True]
+    assert parser.result() == {"should_notify": False}
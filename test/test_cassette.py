@@ -0,0 +1,102 @@
+"""Tests for recording and replaying external service calls"""
+import asyncio
+import time
+
+import pytest
+
+from app.cassette import Cassette, CassetteMiss, call_key
+
+
+class FakeClaude:
+    """Async service stand-in counting the calls that reach it"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+        self.analysis_stats = {"calls": 0}
+
+    async def analyze_date(self, current_text, accumulated_transcript, previous_warnings=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {"should_notify": "python" in current_text, "message": f"reply {self.calls}"}
+
+    async def prewarm(self):
+        raise AssertionError("prewarm must not run on replay")
+
+
+class FakeOMI:
+    """Blocking service stand-in"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create_memory(self, user_id, summary, idempotency_key=None):
+        self.calls += 1
+        return True
+
+
+def test_replay_answers_from_the_recording(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    live = FakeClaude()
+    recorder = Cassette(path, "record").wrap("claude", live)
+    warnings = [("bro stop", "CS talk", 1717000000.5)]
+
+    async def record():
+        first = await recorder.analyze_date("I love python", "at 8:15 pm we met", warnings)
+        second = await recorder.analyze_date("nice weather", "at 8:15 pm we met")
+        return first, second
+
+    recorded = asyncio.run(record())
+    assert live.calls == 2
+    assert recorder.analysis_stats == {"calls": 0}  # non-callables pass through
+
+    player = Cassette(path, "replay", latency_scale=0.0).wrap("claude", FakeClaude())
+
+    async def replay():
+        # Same prompts with a different clock time and warning timestamp
+        first = await player.analyze_date("I love python", "at 9:40 pm we met", [("bro stop", "CS talk", 1718000000.0)])
+        second = await player.analyze_date("nice weather", "at 9:40 pm  we met")
+        await player.prewarm()
+        return first, second
+
+    assert asyncio.run(replay()) == recorded
+    assert player.service.calls == 0
+    assert player.cassette.stats()["replayed"] == 2
+
+
+def test_replay_scales_the_recorded_latency(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    asyncio.run(Cassette(path, "record").wrap("claude", FakeClaude(latency=0.2)).analyze_date("hi", ""))
+
+    for scale, low, high in ((1.0, 0.18, 0.5), (0.25, 0.04, 0.15)):
+        player = Cassette(path, "replay", latency_scale=scale).wrap("claude", FakeClaude())
+        start = time.perf_counter()
+        asyncio.run(player.analyze_date("hi", ""))
+        assert low < time.perf_counter() - start < high
+
+
+def test_misses_reuse_the_method_unless_strict(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = Cassette(path, "record").wrap("omi", FakeOMI())
+    assert recorder.create_memory("u1", "great date", "u1:date_1")
+    # A second recording session appends to the same file
+    Cassette(path, "record").wrap("omi", FakeOMI()).create_memory("u2", "ok date", "u2:date_1")
+    with open(path, "a") as f:
+        f.write('{"k": "trunc')  # interrupted append
+
+    cassette = Cassette(path, "replay", latency_scale=0.0)
+    assert sum(len(pool) for pool in cassette.by_key.values()) == 2
+    player = cassette.wrap("omi", FakeOMI())
+    assert player.create_memory("u3", "unseen", "u3:date_1") is True
+    assert cassette.stats()["misses"] == 1
+
+    strict = Cassette(path, "replay", latency_scale=0.0, strict=True).wrap("omi", FakeOMI())
+    with pytest.raises(CassetteMiss):
+        strict.create_memory("u3", "unseen", "u3:date_1")
+
+
+def test_keys_ignore_timestamps_and_whitespace():
+    base = call_key("claude", "analyze_date", ("met at 2024-05-01T20:15:00",), {"id": "8c1f2a4e-0b9d-4e5f-9a61-3d2c1b0a9f8e"})
+    same = call_key("claude", "analyze_date", ("met  at 2025-01-02 09:00:01",), {"id": "00000000-1111-2222-3333-444444444444"})
+    other = call_key("claude", "analyze_date", ("met at noon",), {})
+    assert base == same != other
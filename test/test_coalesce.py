@@ -0,0 +1,184 @@
+"""Tests for per-user debouncing of analyze_date calls"""
+import asyncio
+
+import httpx
+
+import app.main as main
+from app import models
+from app.coalesce import AnalysisCoalescer
+from app.gate import build_gate
+
+
+class FakeAnalysis:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self.completed = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, uid, text):
+        self.calls.append((uid, text))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        self.completed.append((uid, text))
+        return {"analyzed": text}
+
+
+def test_burst_within_window_is_one_call_answered_on_the_newest_batch():
+    analysis = FakeAnalysis()
+
+    async def run():
+        coalescer = AnalysisCoalescer(analysis, window=0.05, max_tokens=1000, max_delay=1.0)
+        futures = [coalescer.submit("u", f"b{n}") for n in range(5)]
+        futures.append(coalescer.submit("other", "x"))
+        results = await asyncio.gather(*futures)
+        return results, coalescer
+
+    results, coalescer = asyncio.run(run())
+    assert sorted(analysis.calls) == [("other", "x"), ("u", "b0 b1 b2 b3 b4")]
+    assert results[:4] == [None] * 4
+    assert results[4] == {"analyzed": "b0 b1 b2 b3 b4"}
+    assert coalescer.counters["coalesced"] == 4
+    assert coalescer.states == {}
+
+
+def test_token_threshold_flushes_without_waiting_for_the_window():
+    analysis = FakeAnalysis()
+
+    async def run():
+        coalescer = AnalysisCoalescer(analysis, window=60, max_tokens=10, max_delay=60)
+        return await asyncio.wait_for(coalescer.submit("u", "word " * 20), 1)
+
+    assert asyncio.run(run()) == {"analyzed": ("word " * 20)}
+
+
+def test_newer_batch_supersedes_the_in_flight_analysis():
+    analysis = FakeAnalysis(latency=0.05)
+
+    async def run():
+        coalescer = AnalysisCoalescer(analysis, window=0, max_tokens=1000, max_delay=1.0)
+        first = coalescer.submit("u", "a")
+        await asyncio.sleep(0.01)  # "a" is now being analyzed
+        second = coalescer.submit("u", "b")
+        return await asyncio.gather(first, second), coalescer
+
+    (first, second), coalescer = asyncio.run(run())
+    assert first is None
+    assert second == {"analyzed": "a b"}
+    assert analysis.calls == [("u", "a"), ("u", "a b")]
+    assert analysis.completed == [("u", "a b")]
+    assert analysis.max_in_flight == 1
+    assert coalescer.counters["superseded"] == 1
+
+
+def test_analysis_older_than_max_delay_is_not_cancelled():
+    analysis = FakeAnalysis(latency=0.05)
+
+    async def run():
+        coalescer = AnalysisCoalescer(analysis, window=0, max_tokens=1000, max_delay=0)
+        first = coalescer.submit("u", "a")
+        await asyncio.sleep(0.01)
+        second = coalescer.submit("u", "b")
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(run()) == [{"analyzed": "a"}, {"analyzed": "b"}]
+    assert analysis.max_in_flight == 1
+
+
+def test_end_date_is_immediate_and_drops_pending_analysis(monkeypatch):
+    analyzed = []
+
+    class SlowClaude:
+        async def analyze_date(self, current_text, *args, **kwargs):
+            analyzed.append(current_text)
+            return {"should_notify": True, "message": "bro", "reason": "r"}
+
+        async def summarize_context(self, previous_summary, new_transcript):
+            return None
+
+    monkeypatch.setattr(main, "claude_service", SlowClaude())
+    monkeypatch.setattr(main, "analysis_gate", build_gate("off"))
+    monkeypatch.setattr(main, "analysis_coalescer", AnalysisCoalescer(main.analyze_batches, window=0.5))
+
+    async def submit_date_end(uid, date):
+        return 0
+
+    monkeypatch.setattr(main.job_queue, "submit_date_end", submit_date_end)
+    models.users.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post(text):
+                response = await client.post(
+                    "/livetranscript", params={"uid": "debounce"}, json={"segments": [{"text": text}]}
+                )
+                return response.json()
+
+            await post("start date")
+            pending = asyncio.create_task(post("so about python"))
+            await asyncio.sleep(0.05)
+            ended = await asyncio.wait_for(post("ok end date"), 0.3)
+            return ended, await pending
+
+    ended, pending = asyncio.run(run())
+    assert ended["event_type"] == "date_ended"
+    assert pending is None
+    assert analyzed == []
+
+
+def test_analysis_outcome_is_recorded_in_turn_with_the_users_batches(monkeypatch):
+    analyzed = asyncio.Event()
+    tip_done = asyncio.Event()
+    warnings_during_tip = []
+
+    class GatedClaude:
+        async def analyze_date(self, current_text, *args, **kwargs):
+            await analyzed.wait()
+            return {"should_notify": True, "message": "change the topic", "reason": "politics"}
+
+        async def generate_conversation_tip(self, transcript, *args, **kwargs):
+            date = models.users["in-turn"].dates["date_1"]
+            analyzed.set()
+            await asyncio.sleep(0.05)  # the analysis finishes while this batch is on the actor
+            warnings_during_tip.append(len(date.previous_warnings))
+            await tip_done.wait()
+            return "ask about her dog"
+
+        async def summarize_context(self, previous_summary, new_transcript):
+            return None
+
+    monkeypatch.setattr(main, "claude_service", GatedClaude())
+    monkeypatch.setattr(main, "analysis_gate", build_gate("off"))
+    monkeypatch.setattr(main, "analysis_coalescer", AnalysisCoalescer(main.analyze_batches, window=0))
+    monkeypatch.setattr(main, "tip_precomputer", main.TipPrecomputer(main.precompute_tip, enabled=False))
+    models.users.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post(text):
+                response = await client.post(
+                    "/livetranscript", params={"uid": "in-turn"}, json={"segments": [{"text": text}]}
+                )
+                return response.json()
+
+            await post("start date")
+            warning = asyncio.create_task(post("so about the election"))
+            await asyncio.sleep(0.01)
+            tip = asyncio.create_task(post("yeah okay so"))
+            await asyncio.sleep(0.1)
+            tip_done.set()
+            return await warning, await tip
+
+    warning, tip = asyncio.run(run())
+    assert warning["message"] == "change the topic"
+    assert tip["message"] == "ask about her dog"
+    # The warning waited for the tip batch ahead of it on the user's actor
+    assert warnings_during_tip == [0]
+    assert len(models.users["in-turn"].dates["date_1"].previous_warnings) == 1
@@ -0,0 +1,80 @@
+"""Tests for the single-pass command matcher"""
+import asyncio
+
+import app.main as main
+from app.commands import (
+    code_word_conflict,
+    get_command_matcher,
+    CODE_WORD,
+    EDIT_CODE_WORD,
+    END_DATE,
+    START_DATE,
+    STUCK,
+)
+
+
+def kinds(scan):
+    return [command.kind for command in scan.commands()]
+
+
+def test_commands_are_ordered_by_segment_then_priority():
+    scan = get_command_matcher("peanuts").scan([
+        "hello there",
+        "ok end date and Start Date",
+        "peanuts",
+    ])
+    assert kinds(scan) == [START_DATE, END_DATE, CODE_WORD]
+    assert [command.segment for command in scan.commands()] == [1, 1, 2]
+
+
+def test_positions_index_into_the_batch_text():
+    scan = get_command_matcher("peanuts").scan(["well", "edit code word Banana please"])
+    command = scan.commands()[0]
+    assert command.kind == EDIT_CODE_WORD
+    assert scan.text[command.start:command.end] == "edit code word"
+    assert scan.text_after(command).split()[0] == "banana"
+
+
+def test_phrase_split_across_segments_and_requests():
+    matcher = get_command_matcher("peanuts")
+    assert kinds(matcher.scan(["let's start", "date now"])) == [START_DATE]
+
+    first = matcher.scan(["time to end"])
+    assert kinds(first) == []
+    second = matcher.scan(["date for real"], first.carry)
+    assert kinds(second) == [END_DATE]
+    assert second.commands()[0].start < 0
+
+    # A match already reported is not repeated from the carried tail
+    third = matcher.scan(["nothing new"], second.carry)
+    assert kinds(third) == []
+
+
+def test_stuck_cue_ignores_punctuation_and_overlapping_code_word_is_found():
+    assert get_command_matcher("peanuts").scan(["Yeah, okay. So anyway"]).has(STUCK)
+    assert kinds(get_command_matcher("date").scan(["start date"])) == [CODE_WORD, START_DATE]
+
+
+def test_code_word_edit_selects_a_new_matcher():
+    assert kinds(get_command_matcher("pickles").scan(["I love peanuts"])) == []
+    assert kinds(get_command_matcher("pickles").scan(["I love pickles"])) == [CODE_WORD]
+
+
+def test_code_word_colliding_with_a_command_is_rejected():
+    assert code_word_conflict("Start") == "start date"
+    assert code_word_conflict("date.") == "start date"
+    assert code_word_conflict("yeah") == "yeah okay so"
+    assert code_word_conflict("pickles") is None
+
+    uid = "code-word-collision"
+    result = asyncio.run(main.process_transcript(uid, {"segments": [{"text": "edit code word end"}]}))
+    assert result["event_type"] == "code_word_rejected"
+    assert main.session_store.get_or_create(uid).code_word == "peanuts"
+
+
+def test_code_word_inside_a_command_phrase_is_rejected():
+    for code_word in ("art", "Tart!", "ate", "kay"):
+        assert code_word_conflict(code_word) is not None, code_word
+    assert code_word_conflict("start date now") == "start date"
+    # Accepted, "tart" would outrank the phrase and place a call on every "start date"
+    assert kinds(get_command_matcher("tart").scan(["start date"]))[0] == CODE_WORD
@@ -0,0 +1,52 @@
+"""Tests for the token-budgeted rolling analysis context"""
+import asyncio
+
+from app.context import RollingContext, estimate_request_tokens, warnings_digest
+from app.prompts import build_date_analysis_request
+from app.transcript import TranscriptBuffer
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def summarize_context(self, previous_summary, new_transcript):
+        self.calls.append((previous_summary, new_transcript))
+        return f"notes after {len(self.calls)} refreshes"
+
+
+def test_prompt_stays_within_budget_and_summary_covers_older_text():
+    summarizer = FakeSummarizer()
+    context = RollingContext(token_budget=1500, recent_tokens=500, refresh_batches=5, warnings_limit=3)
+    transcript = TranscriptBuffer()
+    warnings = [{"reason": f"reason {i % 4}", "message": "bro stop talking about code"} for i in range(40)]
+    sizes = []
+
+    async def run():
+        for n in range(500):
+            text = f"batch {n} so I was telling her about my weekend hiking trip and the food"
+            transcript.append(text)
+            window = context.build(text, transcript, warnings)
+            request = build_date_analysis_request(text, window.recent_tail, window.warnings, window.summary,
+                                                  window.cached_chunks)
+            sizes.append(estimate_request_tokens(*request))
+            assert window.recent_transcript.endswith(text)
+            context.after_batch(transcript, summarizer)
+            await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert max(sizes) <= 1500
+    assert summarizer.calls
+    assert context.summary.startswith("notes after")
+    assert context.summarized_upto > 0
+    # Each refresh only sends transcript that the previous summary did not cover
+    assert all("batch 0 " not in new_text for _, new_text in summarizer.calls[1:])
+
+
+def test_warnings_digest_keeps_latest_per_reason():
+    warnings = [{"reason": "CS talk", "message": f"m{i}"} for i in range(5)]
+    warnings.append({"reason": "anime", "message": "chill"})
+    digest = warnings_digest(warnings, limit=10)
+    assert [w["message"] for w in digest] == ["m4", "chill"]
+    assert len(warnings_digest(warnings, limit=1)) == 1
@@ -0,0 +1,70 @@
+"""Tests for the pooled SQLite layer and the date summary history"""
+import sqlite3
+import threading
+
+from app import database
+from app.database import (
+    get_connection,
+    get_previous_summary,
+    get_summary_history,
+    init_database,
+    save_summaries,
+    save_summary,
+)
+
+
+def test_history_keeps_every_date_and_latest_wins(tmp_path):
+    db = str(tmp_path / "summaries.db")
+    init_database(db)
+    save_summary("u1", "first date", "date_1", db_path=db)
+    save_summary("u1", "second date", "date_2", db_path=db)
+    save_summary("u1", "second date, retried", "date_2", db_path=db)
+    save_summary("u2", "other user", "date_1", db_path=db)
+
+    assert get_previous_summary("u1", db) == "second date, retried"
+    assert [row["date_id"] for row in get_summary_history("u1", db_path=db)] == ["date_2", "date_1"]
+    assert get_previous_summary("nobody", db) is None
+
+    plan = get_connection(db).execute(
+        "EXPLAIN QUERY PLAN " + database.SELECT_LATEST_SUMMARY, ("u1",)
+    ).fetchall()
+    assert "idx_summary_history_uid_created" in str(plan)
+    assert get_connection(db).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_summaries_from_the_old_table_are_carried_over(tmp_path):
+    db = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE date_summaries (uid TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at TIMESTAMP NOT NULL)")
+    conn.execute("INSERT INTO date_summaries VALUES ('u1', 'old summary', '2025-01-02 03:04:05.000000')")
+    conn.commit()
+    conn.close()
+
+    init_database(db)
+    init_database(db)  # idempotent
+    history = get_summary_history("u1", db_path=db)
+    assert [row["summary"] for row in history] == ["old summary"]
+    assert history[0]["created_at"] == 1735787045.0
+
+
+def test_threads_share_the_database_through_their_own_connections(tmp_path):
+    db = str(tmp_path / "concurrent.db")
+    init_database(db)
+    connections = set()
+
+    def worker(n):
+        connections.add(id(get_connection(db)))
+        save_summaries([(f"user-{n}", f"date_{i}", f"summary {i}") for i in range(50)], db_path=db)
+        for i in range(50):
+            save_summary(f"user-{n}", f"single {i}", f"single_{i}", db_path=db)
+            assert get_previous_summary(f"user-{n}", db) is not None
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(connections) == 8
+    count = get_connection(db).execute("SELECT COUNT(*) FROM summary_history").fetchone()[0]
+    assert count == 8 * 100
@@ -0,0 +1,48 @@
+"""Tests for local warning deduplication"""
+from app.context import warnings_digest
+from app.dedup import COOLDOWN, DUPLICATE, WarningDeduper
+from app.models import DateObject
+
+
+def test_rewordings_and_recent_reasons_are_suppressed():
+    deduper = WarningDeduper(threshold=0.6, cooldown=120)
+    date = DateObject("date_1")
+    date.add_warning("bro stop talking about python", "CS talk")
+    sent_at = date.previous_warnings[0].timestamp
+
+    assert deduper.check(date.previous_warnings, "Bro, stop talking about Python!!", "coding", sent_at + 500) == DUPLICATE
+    assert deduper.check(date.previous_warnings, "dude stop talking about python", "tech", sent_at + 500) == DUPLICATE
+    assert deduper.check(date.previous_warnings, "enough with the compilers", " cs TALK", sent_at + 60) == COOLDOWN
+    # Different topic, or the same reason after the cooldown
+    assert deduper.check(date.previous_warnings, "stop talking about your ex", "ex talk", sent_at + 60) is None
+    assert deduper.check(date.previous_warnings, "enough with the compilers", "CS talk", sent_at + 500) is None
+    assert deduper.stats()["sent"] == 2 and deduper.stats()[DUPLICATE] == 2
+
+
+def test_warnings_without_a_reason_share_no_cooldown():
+    deduper = WarningDeduper(threshold=0.6, cooldown=120)
+    date = DateObject("date_1")
+    date.add_warning("bro stop talking about python", "")
+    sent_at = date.previous_warnings[0].timestamp
+
+    assert deduper.check(date.previous_warnings, "stop talking about your ex", "", sent_at + 10) is None
+    assert deduper.check(date.previous_warnings, "stop talking about your ex", None, sent_at + 10) is None
+    assert deduper.check(date.previous_warnings, "Bro stop talking about Python!", "", sent_at + 10) == DUPLICATE
+
+
+def test_history_is_bounded(monkeypatch):
+    monkeypatch.setattr("app.models.WARNING_HISTORY_LIMIT", 3)
+    date = DateObject("date_1")
+    for n in range(10):
+        date.add_warning(f"warning {n}", f"reason {n}")
+    assert [w.message for w in date.previous_warnings] == ["warning 7", "warning 8", "warning 9"]
+
+
+def test_digest_drops_near_duplicates_under_other_reasons():
+    warnings = [
+        {"reason": "CS talk", "message": "bro stop talking about python"},
+        {"reason": "ex talk", "message": "stop talking about your ex"},
+        {"reason": "coding", "message": "Bro stop talking about Python!"},
+    ]
+    digest = warnings_digest(warnings, limit=10)
+    assert [w["reason"] for w in digest] == ["ex talk", "coding"]
@@ -0,0 +1,169 @@
+"""Tests for the emergency call priority lane"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import app.main as main
+import app.services as services
+from app import models
+from app.actors import ActorRegistry
+from app.emergency import EmergencyLane
+from app.services import AsyncTwilioService
+
+
+class FakeTwilio:
+    """Twilio client stand-in recording when each call reached it and on which thread's loop"""
+
+    def __init__(self, latency=0.0, failures=0, error=ConnectionRefusedError):
+        self.latency = latency
+        self.failures = failures
+        self.error = error
+        self.dialed_at = []
+        self.attempts = 0
+        self.prewarms = 0
+        self.calls = SimpleNamespace(create_async=self._create)
+        self.api = SimpleNamespace(v2010=SimpleNamespace(account=SimpleNamespace(fetch_async=self._fetch)))
+        self.http_client = SimpleNamespace(close=self._close)
+
+    async def _create(self, **kwargs):
+        self.attempts += 1
+        self.dialed_at.append(time.perf_counter())
+        await asyncio.sleep(self.latency)
+        if self.attempts <= self.failures:
+            raise self.error("twilio unavailable")
+        return SimpleNamespace(sid=f"CA{self.attempts}")
+
+    async def _fetch(self):
+        self.prewarms += 1
+
+    async def _close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def twilio_numbers(monkeypatch):
+    monkeypatch.setattr(services, "TWILIO_PHONE_NUMBER", "+15550000000")
+    monkeypatch.setattr(services, "PHONE_NUMBER", "+15551111111")
+
+
+def test_call_is_dialed_while_analysis_load_blocks_the_app_loop():
+    twilio = FakeTwilio()
+    lane = EmergencyLane(AsyncTwilioService(client=twilio), retry_delay=0.001)
+
+    async def analysis(n):
+        # CPU-bound analysis work that never yields to the app loop for 20ms at a time
+        for _ in range(5):
+            time.sleep(0.004)
+            await asyncio.sleep(0)
+
+    async def run():
+        lane.start()
+        load = [asyncio.create_task(analysis(n)) for n in range(100)]
+        await asyncio.sleep(0)
+        detected_at = time.perf_counter()
+        future = lane.dispatch(None, detected_at)
+        await asyncio.gather(*load)
+        placed = await asyncio.wrap_future(future)
+        finished_at = time.perf_counter()
+        await lane.stop()
+        return placed, detected_at, finished_at
+
+    placed, detected_at, finished_at = asyncio.run(run())
+    assert placed
+    assert twilio.prewarms == 1
+    # The load kept the app loop busy for ~2s, the dial did not wait for it
+    assert finished_at - detected_at > 1.0
+    assert twilio.dialed_at[0] - detected_at < 0.2
+    assert lane.latency.count == 1
+    assert lane.latency.max < 0.2
+
+
+def test_calls_that_could_not_connect_are_retried():
+    twilio = FakeTwilio(failures=2)
+    lane = EmergencyLane(AsyncTwilioService(client=twilio), retries=3, retry_delay=0.001)
+
+    async def run():
+        placed = await asyncio.wrap_future(lane.dispatch(None))
+        await lane.stop()
+        return placed
+
+    assert asyncio.run(run())
+    assert twilio.attempts == 3
+    assert lane.stats()["attempts"] == 3
+    assert lane.stats()["failures"] == 0
+
+
+def test_call_gives_up_after_the_retries():
+    twilio = FakeTwilio(failures=10)
+    lane = EmergencyLane(AsyncTwilioService(client=twilio), retries=2, retry_delay=0.001)
+
+    async def run():
+        placed = await asyncio.wrap_future(lane.dispatch(None))
+        await lane.stop()
+        return placed
+
+    assert not asyncio.run(run())
+    assert twilio.attempts == 3
+    assert lane.stats()["failures"] == 1
+    assert lane.latency.count == 0
+
+
+def test_calls_that_may_have_reached_twilio_are_not_retried():
+    twilio = FakeTwilio(failures=10, error=asyncio.TimeoutError)  # sent, but no answer in time
+    lane = EmergencyLane(AsyncTwilioService(client=twilio), retries=3, retry_delay=0.001)
+
+    async def run():
+        placed = await asyncio.wrap_future(lane.dispatch(None))
+        await lane.stop()
+        return placed
+
+    assert not asyncio.run(run())
+    assert twilio.attempts == 1
+    assert lane.stats()["failures"] == 1
+
+
+def test_missing_numbers_are_not_retried(monkeypatch):
+    monkeypatch.setattr(services, "TWILIO_PHONE_NUMBER", None)
+    twilio = FakeTwilio()
+    lane = EmergencyLane(AsyncTwilioService(client=twilio), retries=3, retry_delay=0.001)
+
+    async def run():
+        placed = await asyncio.wrap_future(lane.dispatch(None))
+        await lane.stop()
+        return placed
+
+    assert not asyncio.run(run())
+    assert lane.stats()["attempts"] == 1
+    assert twilio.attempts == 0
+
+
+def test_code_word_response_does_not_wait_for_the_call(monkeypatch):
+    twilio = FakeTwilio(latency=0.5)
+    lane = EmergencyLane(AsyncTwilioService(client=twilio))
+    monkeypatch.setattr(main, "emergency_lane", lane)
+    monkeypatch.setattr(main, "session_actors", ActorRegistry(main.handle_session_message))
+    models.users.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            response = await client.post(
+                "/livetranscript", params={"uid": "u"}, json={"segments": [{"text": "peanuts"}]}
+            )
+            elapsed = time.perf_counter() - start
+            stats = (await client.get("/emergency")).json()
+        await main.session_actors.stop()
+        await lane.stop()
+        return response.json(), elapsed, stats
+
+    body, elapsed, stats = asyncio.run(run())
+    assert body["event_type"] == "date_ended"
+    assert elapsed < 0.4
+    assert stats["calls"] == 1
+    assert twilio.attempts == 1
+    assert lane.latency.count == 1
+
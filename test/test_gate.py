@@ -0,0 +1,79 @@
+"""Tests for the local pre-filter in front of analyze_date"""
+import asyncio
+
+import httpx
+import pytest
+
+import app.main as main
+from app import models
+from app.coalesce import AnalysisCoalescer
+from app.gate import AnalysisGate, LexiconScorer, PassThroughScorer, build_gate
+
+
+def test_lexicon_scores_cs_talk_and_ignores_small_talk():
+    scorer = LexiconScorer()
+    assert scorer.score("haha yeah totally, the pasta here is so good") == 0
+    assert scorer.score("so I've been grinding LeetCode and Binary Search Trees") >= 2
+    assert scorer.score("I love algorithms and data\nstructures") == 2
+    # Word boundaries: "javanese" and "apple" are not java / app
+    assert scorer.score("javanese food and an apple") == 0
+    assert scorer.score("the app") < 1
+
+
+def test_gate_forces_a_check_after_a_run_of_skips_and_counts():
+    gate = AnalysisGate(LexiconScorer(), threshold=1.0, force_every=3)
+    since = 0
+    decisions = []
+    for text in ["hi", "nice weather", "cool", "so", "anyway I write python all day"]:
+        decision = gate.check(text, since)
+        since = 0 if decision.escalate else since + 1
+        decisions.append((decision.escalate, decision.forced))
+
+    assert decisions == [(False, False), (False, False), (True, True), (False, False), (True, False)]
+    stats = gate.stats()
+    assert (stats["escalated"], stats["forced"], stats["skipped"], stats["total"]) == (1, 1, 3, 5)
+    assert stats["skip_rate"] == pytest.approx(0.6)
+
+
+def test_gate_off_escalates_everything():
+    gate = build_gate("off")
+    assert isinstance(gate.scorer, PassThroughScorer)
+    assert gate.check("haha yeah", 0).escalate
+    with pytest.raises(ValueError):
+        build_gate("bogus")
+
+
+def test_only_flagged_batches_reach_claude(monkeypatch):
+    class CountingClaude:
+        def __init__(self):
+            self.analyzed = []
+
+        async def analyze_date(self, current_text, accumulated_transcript, previous_warnings=None,
+                               earlier_summary=None, cached_transcript=None):
+            self.analyzed.append(current_text)
+            return {"should_notify": False}
+
+        async def summarize_context(self, previous_summary, new_transcript):
+            return None
+
+    claude = CountingClaude()
+    monkeypatch.setattr(main, "claude_service", claude)
+    monkeypatch.setattr(main, "analysis_gate", AnalysisGate(LexiconScorer(), threshold=1.0, force_every=0))
+    monkeypatch.setattr(main, "analysis_coalescer", AnalysisCoalescer(main.analyze_batches, window=0))
+    models.users.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for text in ["start date", "haha yeah", "so my recursion homework", "that's funny"]:
+                response = await client.post(
+                    "/livetranscript", params={"uid": "gate-user"}, json={"segments": [{"text": text}]}
+                )
+                assert response.status_code == 200
+            return (await client.get("/gate")).json()
+
+    stats = asyncio.run(run())
+    assert claude.analyzed == ["so my recursion homework"]
+    assert (stats["escalated"], stats["skipped"]) == (1, 2)
+    date = models.users["gate-user"].dates["date_1"]
+    assert date.count == 3 and "that's funny" in date.accumulated_transcript
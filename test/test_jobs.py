@@ -0,0 +1,167 @@
+"""Tests for the persistent end-of-date job queue"""
+import asyncio
+import sqlite3
+import time
+
+import app.jobs as jobs
+from app.jobs import JobQueue, JobWorkerPool, DATE_END_JOB, date_end_handler
+from app.models import DateObject
+
+
+class FakeLetta:
+    def __init__(self, summary="# DATE PERFORMANCE REPORT"):
+        self.summary = summary
+        self.calls = 0
+
+    async def process_date_end(self, user_id, transcript):
+        self.calls += 1
+        return self.summary
+
+
+class FakeOMI:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    async def create_memory(self, user_id, summary, idempotency_key=None):
+        self.calls += 1
+        return self.calls > self.failures
+
+
+def make_queue(tmp_path, **kwargs):
+    queue = JobQueue(str(tmp_path / "jobs.db"), retry_base_delay=0, **kwargs)
+    queue.init()
+    return queue
+
+
+def finished_date():
+    date = DateObject("date_1")
+    date.add_transcript("so what do you do for fun")
+    date.finalize()
+    return date
+
+
+def drain(queue, handler):
+    """Run claimed jobs until none are due"""
+    async def run():
+        pool = JobWorkerPool(queue, {DATE_END_JOB: handler})
+        while (job := queue.claim()) is not None:
+            await pool.run_job(job)
+    asyncio.run(run())
+
+
+def test_date_end_job_summarizes_and_uploads(tmp_path, monkeypatch):
+    saved = []
+    monkeypatch.setattr(jobs, "save_summary", lambda uid, summary, date_id=None: saved.append((uid, date_id, summary)))
+    queue = make_queue(tmp_path)
+    letta, omi = FakeLetta(), FakeOMI()
+
+    queue.enqueue_date_end("user-1", finished_date())
+    drain(queue, date_end_handler(letta, omi))
+
+    assert queue.status()["counts"]["done"] == 1
+    assert (letta.calls, omi.calls) == (1, 1)
+    assert saved == [("user-1", "date_1", "# DATE PERFORMANCE REPORT")]
+
+
+def test_omi_retry_reuses_checkpointed_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "save_summary", lambda uid, summary, date_id=None: None)
+    queue = make_queue(tmp_path)
+    letta, omi = FakeLetta(), FakeOMI(failures=2)
+
+    queue.enqueue_date_end("user-1", finished_date())
+    drain(queue, date_end_handler(letta, omi))
+
+    assert queue.status()["counts"]["done"] == 1
+    assert letta.calls == 1
+    assert omi.calls == 3
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=3)
+    letta = FakeLetta(summary="Unable to generate date summary - Letta agent unavailable.")
+
+    queue.enqueue_date_end("user-1", finished_date())
+    drain(queue, date_end_handler(letta, FakeOMI()))
+
+    status = queue.status()
+    assert status["counts"]["failed"] == 1
+    assert letta.calls == 3
+    assert "Letta agent unavailable" in status["jobs"][0]["last_error"]
+
+
+def test_running_job_is_requeued_only_once_its_lease_expires(tmp_path):
+    queue = make_queue(tmp_path, lease_timeout=0.2)
+    queue.enqueue_date_end("user-1", finished_date())
+    assert queue.claim() is not None
+    assert queue.claim() is None
+
+    # Another worker (or a restart) sharing the database leaves a job with a live lease alone
+    other = make_queue(tmp_path)
+    assert other.claim() is None
+
+    time.sleep(0.25)
+    job = other.claim()
+    assert job is not None
+    assert job.attempts == 2
+    assert queue.status()["jobs"][0]["owner"] == other.owner
+
+
+def test_lease_is_renewed_while_the_handler_runs(tmp_path):
+    queue = make_queue(tmp_path, lease_timeout=0.15)
+    other = make_queue(tmp_path)
+    queue.enqueue_date_end("user-1", finished_date())
+    taken_over = []
+
+    async def slow_handler(job, queue):
+        for _ in range(4):
+            await asyncio.sleep(0.1)
+            taken_over.append(other.claim())
+
+    async def run():
+        await JobWorkerPool(queue, {DATE_END_JOB: slow_handler}).run_job(queue.claim())
+
+    asyncio.run(run())
+    assert taken_over == [None] * 4
+    assert queue.status()["counts"]["done"] == 1
+
+
+def test_running_rows_from_before_leases_are_claimed_again(tmp_path):
+    conn = sqlite3.connect(tmp_path / "jobs.db")
+    conn.execute("""
+        CREATE TABLE jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, uid TEXT NOT NULL, payload TEXT NOT NULL,
+            status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,
+            last_error TEXT, run_after REAL NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("INSERT INTO jobs VALUES (1, 'date_end', 'user-1', '{}', 'running', 1, 5, NULL, 0, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    job = make_queue(tmp_path).claim()
+    assert (job.id, job.attempts) == (1, 2)
+
+
+def test_stopped_pool_hands_its_running_job_back(tmp_path):
+    queue = make_queue(tmp_path)
+    restarted = make_queue(tmp_path)  # e.g. a shard worker started while this one still runs
+    queue.enqueue_date_end("user-1", finished_date())
+    started = asyncio.Event()
+    claimed_meanwhile = []
+
+    async def stuck_handler(job, queue):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def run():
+        pool = JobWorkerPool(queue, {DATE_END_JOB: stuck_handler}, concurrency=2, poll_interval=60)
+        pool.start()
+        await started.wait()
+        claimed_meanwhile.append(restarted.claim())
+        await pool.stop()
+
+    asyncio.run(run())
+    assert claimed_meanwhile == [None]
+    job = restarted.claim()
+    assert job is not None and job.attempts == 1
@@ -0,0 +1,77 @@
+"""Tests for the metrics registry, its Prometheus rendering and the /metrics endpoint"""
+import asyncio
+
+import httpx
+import pytest
+
+import app.main as main
+from app import models
+from app.actors import ActorRegistry
+from app.metrics import Histogram, Registry, external_call
+
+
+def test_histogram_quantiles():
+    histogram = Histogram((0.1, 1.0))
+    for seconds in (0.05, 0.05, 0.5, 3.0):
+        histogram.observe(seconds)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == 3.0
+    assert histogram.snapshot()["buckets"] == {"le_0.1": 2, "le_1.0": 1, "le_inf": 1}
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", labels=("route",))
+    in_flight = registry.gauge("in_flight", "Calls in flight")
+    latency = registry.histogram("latency_seconds", "Latency", labels=("stage",), buckets=(0.1, 1.0))
+    requests.labels('/a"b').inc(2)
+    in_flight.set_function(lambda: 3)
+    for seconds in (0.05, 0.5, 2.0):
+        latency.labels("gate").observe(seconds)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a\\"b"} 2.0' in lines
+    assert "in_flight 3" in lines
+    assert 'latency_seconds_bucket{stage="gate",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="gate",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{stage="gate",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{stage="gate"} 3' in lines
+    with pytest.raises(ValueError):
+        latency.labels("gate", "extra")
+
+
+def test_external_call_counts_errors_and_in_flight():
+    with external_call("test", "ok"):
+        pass
+    with pytest.raises(RuntimeError):
+        with external_call("test", "boom"):
+            raise RuntimeError("down")
+
+    text = main.REGISTRY.render()
+    assert 'rizz_external_call_seconds_count{service="test",call="ok"} 1' in text
+    assert 'rizz_external_call_errors_total{service="test",call="boom"} 1.0' in text
+    assert 'rizz_external_calls_in_flight{service="test"} 0.0' in text
+
+
+def test_metrics_endpoint_after_a_batch(monkeypatch):
+    monkeypatch.setattr(main, "session_actors", ActorRegistry(main.handle_session_message))
+    models.users.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/livetranscript", params={"uid": "m"}, json={"segments": [{"text": "start date"}]})
+            response = await client.get("/metrics")
+        await main.session_actors.stop()
+        return response
+
+    response = asyncio.run(run())
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'rizz_request_seconds_count{method="POST",route="/livetranscript"}' in text
+    assert 'rizz_stage_seconds_count{stage="command_parse"}' in text
+    assert 'rizz_notifications_total{event_type="date_started"}' in text
+    assert "rizz_active_dates 1" in text
+    assert "rizz_emergency_detection_to_dial_seconds_bucket" in text
@@ -0,0 +1,135 @@
+"""Tests for the pooled, retrying OMI client against a local stand-in server"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app.services as services
+from app.services import AsyncOMIService, OMIService
+
+
+class StandInOMI(ThreadingHTTPServer):
+    """Answers memory imports with scripted (status, delay) replies, then 200s"""
+
+    daemon_threads = True
+
+    def __init__(self, replies=()):
+        super().__init__(("127.0.0.1", 0), OMIHandler)
+        self.replies = list(replies)
+        self.requests = []
+        self.connections = set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v2"
+
+
+class OMIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.connections.add(self.client_address)
+        self.server.requests.append({"path": self.path, "headers": dict(self.headers), "body": body})
+        status, delay = self.server.replies.pop(0) if self.server.replies else (200, 0)
+        time.sleep(delay)
+        reply = b"{}"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def omi(monkeypatch):
+    servers = []
+
+    def start(replies=()):
+        server = StandInOMI(replies)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(services, "OMI_BASE_URL", server.url)
+        return server
+
+    monkeypatch.setattr(services, "OMI_APP_ID", "app-1")
+    monkeypatch.setattr(services, "OMI_API_KEY", "key-1")
+    monkeypatch.setattr(services, "OMI_RETRY_BASE_DELAY", 0.01)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_uploads_reuse_one_pooled_connection(omi):
+    server = omi()
+    service = OMIService()
+    for n in range(5):
+        assert service.create_memory("u", f"summary {n}", idempotency_key=f"u:date_{n}")
+
+    assert len(server.requests) == 5
+    assert len(server.connections) == 1
+    first = server.requests[0]
+    assert first["path"] == "/v2/integrations/app-1/user/memories?uid=u"
+    assert first["headers"]["Authorization"] == "Bearer key-1"
+    assert first["headers"]["Idempotency-Key"] == "u:date_0"
+
+
+def test_retries_429_and_5xx_with_the_same_idempotency_key(omi):
+    server = omi([(503, 0), (429, 0), (502, 0)])
+    assert OMIService().create_memory("u", "summary")
+
+    keys = {request["headers"]["Idempotency-Key"] for request in server.requests}
+    assert len(server.requests) == 4
+    assert len(keys) == 1
+
+
+def test_client_errors_are_not_retried(omi):
+    server = omi([(400, 0)])
+    assert not OMIService().create_memory("u", "summary")
+    assert len(server.requests) == 1
+
+
+def test_stalled_server_times_out_instead_of_hanging(omi):
+    server = omi([(200, 1.0)] * 2)
+    service = OMIService(max_retries=1)
+    service.timeout = (1.0, 0.1)
+
+    start = time.perf_counter()
+    assert not service.create_memory("u", "summary")
+    assert time.perf_counter() - start < 0.9
+    assert len(server.requests) == 2
+
+
+def test_bulk_upload_sends_one_request_for_several_memories(omi):
+    server = omi()
+    assert OMIService().create_memories("u", ["first date", "second date", "third date"], "u:bulk")
+
+    assert len(server.requests) == 1
+    memories = server.requests[0]["body"]["memories"]
+    assert [memory["content"] for memory in memories] == ["first date", "second date", "third date"]
+
+
+def test_async_client_retries_and_pools(omi):
+    server = omi([(500, 0)])
+
+    async def run():
+        service = AsyncOMIService()
+        try:
+            first = await service.create_memory("u", "summary", "u:date_1")
+            second = await service.create_memories("u", ["a", "b"], "u:date_2")
+        finally:
+            await service.client.aclose()
+        return first, second
+
+    assert asyncio.run(run()) == (True, True)
+    assert [request["headers"]["Idempotency-Key"] for request in server.requests] == ["u:date_1"] * 2 + ["u:date_2"]
+    assert len(server.connections) == 1
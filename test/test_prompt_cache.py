@@ -0,0 +1,76 @@
+"""Tests for prompt caching of the analysis instructions and the already-seen transcript"""
+import asyncio
+
+from app.context import RollingContext
+from app.prompts import text_block
+from app.services import AsyncClaudeService, ClaudeService
+from app.transcript import TranscriptBuffer
+from benchmarks.stubs import AsyncStubAnthropic, StubAnthropic
+
+
+def stub_reply(system, messages):
+    if "running notes" in system[0]["text"]:
+        return "They talked about hiking, food and her job."
+    return '{"should_notify": false}'
+
+
+def test_stub_reads_the_longest_cached_prefix():
+    client = StubAnthropic(min_cacheable_tokens=0)
+    system = [text_block("s" * 400, cache=True)]
+    first = [{"role": "user", "content": [text_block("a" * 400, cache=True), text_block("q" * 40)]}]
+    second = [{"role": "user", "content": [text_block("a" * 400), text_block("b" * 400, cache=True),
+                                           text_block("q" * 40)]}]
+
+    usage = client.messages.create(model="m", max_tokens=10, system=system, messages=first).usage
+    assert (usage.cache_read_input_tokens, usage.cache_creation_input_tokens, usage.input_tokens) == (0, 200, 10)
+
+    usage = client.messages.create(model="m", max_tokens=10, system=system, messages=second).usage
+    assert (usage.cache_read_input_tokens, usage.cache_creation_input_tokens, usage.input_tokens) == (200, 100, 10)
+
+    # Different model, different cache
+    usage = client.messages.create(model="other", max_tokens=10, system=system, messages=first).usage
+    assert usage.cache_read_input_tokens == 0
+
+
+def test_analyze_date_reports_cached_prompt_tokens():
+    client = StubAnthropic(min_cacheable_tokens=0)
+    service = ClaudeService(client=client)
+    chunks = ["so I was telling her about my weekend " * 20]
+
+    first = service.analyze_date("hi", "and the food", cached_transcript=chunks)
+    second = service.analyze_date("there", "and the food was great", cached_transcript=chunks)
+
+    assert first["should_notify"] is False
+    assert first["prompt_tokens"] + second["prompt_tokens"] == client.prompt_tokens()
+    assert client.totals["cache_read_input_tokens"] > second["prompt_tokens"] * 0.9
+
+
+def test_long_date_mostly_reads_the_cache():
+    client = AsyncStubAnthropic(reply=stub_reply)
+    service = AsyncClaudeService(client=client)
+    context = RollingContext(token_budget=4000, recent_tokens=1500, refresh_batches=50, cache_chunk_tokens=128)
+    transcript = TranscriptBuffer()
+
+    async def run():
+        previous = None
+        for n in range(400):
+            text = f"batch {n} so I was telling her about my weekend hiking trip and the food we had after"
+            transcript.append(text)
+            window = context.build(text, transcript, [])
+            if previous is not None and previous.summary == window.summary and len(window.cached_chunks) > 1:
+                # Between window jumps the cached prefix only ever grows
+                assert window.cached_chunks[:len(previous.cached_chunks)] == previous.cached_chunks
+            await service.analyze_date(text, window.recent_tail, window.warnings, window.summary,
+                                       cached_transcript=window.cached_chunks)
+            context.after_batch(transcript, service)
+            previous = window
+            await asyncio.sleep(0)
+        if context.refresh_task is not None:
+            await context.refresh_task
+
+    asyncio.run(run())
+
+    totals = client.totals
+    assert context.summary
+    assert totals["cache_read_input_tokens"] > 3 * (totals["input_tokens"] + totals["cache_creation_input_tokens"])
+    assert client.relative_cost() < 0.4
@@ -0,0 +1,122 @@
+"""Tests for uid sharding: rendezvous ownership, user handoff and the dispatcher's resize"""
+import asyncio
+from collections import Counter
+
+import httpx
+
+from app.actors import ActorRegistry
+from app.shard import ShardDispatcher, rendezvous_owner, worker_name
+from app.models import DateObject
+from app.store import SessionStore
+
+
+def test_rendezvous_balances_and_moves_only_to_the_new_worker():
+    uids = [f"user-{n}" for n in range(4000)]
+    four = [worker_name(i) for i in range(4)]
+    five = [*four, worker_name(4)]
+    owners = {uid: rendezvous_owner(uid, four) for uid in uids}
+    assert all(800 < count < 1200 for count in Counter(owners.values()).values())
+
+    moved = [uid for uid in uids if rendezvous_owner(uid, five) != owners[uid]]
+    assert all(rendezvous_owner(uid, five) == "shard-4" for uid in moved)
+    assert 600 < len(moved) < 1000  # about a fifth
+
+
+def test_release_hands_users_to_another_worker(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    old_owner = SessionStore(path, cache={}, write_mode="behind", exclusive=True)
+    old_owner.init()
+    user = old_owner.get_or_create("u1")
+    user.dates["date_1"] = DateObject("date_1")
+    user.current_date_id = "date_1"
+    user.dates["date_1"].add_transcript("we both love ramen")
+    old_owner.get_or_create("u2")
+
+    asyncio.run(old_owner.release(["u1"]))
+    assert list(old_owner.cache) == ["u2"]
+    assert old_owner.stats()["released"] == 1
+
+    new_owner = SessionStore(path, cache={}, write_mode="behind", exclusive=True)
+    user = new_owner.get_or_create("u1")
+    assert user.dates["date_1"].accumulated_transcript == "we both love ramen"
+
+
+def test_retire_finishes_queued_messages_first():
+    handled = []
+
+    async def handler(uid, message):
+        await asyncio.sleep(0.001)
+        handled.append(message)
+
+    async def run():
+        registry = ActorRegistry(handler)
+        pending = [asyncio.create_task(registry.submit("u", n)) for n in range(3)]
+        await asyncio.sleep(0)
+        await registry.retire("u")
+        await asyncio.gather(*pending)
+        return registry
+
+    registry = asyncio.run(run())
+    assert handled == [0, 1, 2]
+    assert "u" not in registry.actors
+
+
+class FakeWorker:
+    """Shard worker stand-in: holds /livetranscript until `open` is set and records releases"""
+
+    def __init__(self, name):
+        self.name = name
+        self.open = asyncio.Event()
+        self.calls = []
+        self.stopped = False
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        self.stopped = True
+
+    async def request(self, method, path, **kwargs):
+        self.calls.append((path, kwargs.get("json") or kwargs.get("params")))
+        if path == "/shard/release":
+            return httpx.Response(200, json={"released": 1}, request=httpx.Request(method, path))
+        await self.open.wait()
+        return httpx.Response(200, json={"worker": self.name}, request=httpx.Request(method, path))
+
+
+class FakeDispatcher(ShardDispatcher):
+    def _worker(self, name):
+        return self.workers.setdefault(name, FakeWorker(name))
+
+
+def test_resize_holds_moving_users_until_their_old_owner_releases_them():
+    two = [worker_name(0), worker_name(1)]
+    moving = next(f"u{n}" for n in range(100) if rendezvous_owner(f"u{n}", two) == "shard-1")
+
+    async def run():
+        dispatcher = FakeDispatcher(workers=2)
+        await dispatcher.start()
+        old_owner = dispatcher.workers["shard-1"]
+        in_flight = asyncio.create_task(dispatcher.forward(moving, "POST", "/livetranscript"))
+        await asyncio.sleep(0)
+
+        resize = asyncio.create_task(dispatcher.resize(1))
+        await asyncio.sleep(0.01)
+        held = asyncio.create_task(dispatcher.forward(moving, "POST", "/livetranscript"))
+        await asyncio.sleep(0.01)
+        # Nothing is released while the user's request is still at its old owner
+        assert not any(path == "/shard/release" for path, _ in old_owner.calls)
+        assert not held.done()
+
+        old_owner.open.set()
+        dispatcher.workers["shard-0"].open.set()
+        assert (await in_flight).json() == {"worker": "shard-1"}
+        result = await resize
+        assert (await held).json() == {"worker": "shard-0"}
+        return dispatcher, old_owner, result
+
+    dispatcher, old_owner, result = asyncio.run(run())
+    assert ("/shard/release", ["shard-0"]) in old_owner.calls
+    assert old_owner.stopped and list(dispatcher.workers) == ["shard-0"]
+    assert result["users_moved"] == 2  # one per old worker in the fake
+    assert dispatcher.counters["held_requests"] == 1
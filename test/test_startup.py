@@ -0,0 +1,57 @@
+"""Tests that importing the app stays cheap: no SDK imports, clients or database work until needed"""
+import os
+import subprocess
+import sys
+
+from app.services import (
+    AsyncClaudeService,
+    AsyncTwilioService,
+    LazyClient,
+    OMIService,
+    ThreadedService,
+    prewarm_clients,
+)
+
+
+def test_import_defers_sdks_and_database(tmp_path):
+    db_path = tmp_path / "app.db"
+    probe = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('anthropic', 'letta_client', 'twilio.rest', 'requests') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], env=dict(os.environ, DB_PATH=str(db_path)),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+    assert not db_path.exists()
+
+
+def test_clients_are_built_once_on_first_use():
+    built = []
+
+    class Service:
+        client = LazyClient(lambda: built.append("client") or object())
+
+        def __init__(self, client=None):
+            self.client = client
+
+    service = Service()
+    assert built == []
+    assert service.client is service.client
+    assert built == ["client"]
+
+    injected = object()
+    assert Service(injected).client is injected and built == ["client"]
+
+
+def test_prewarm_builds_clients_and_skips_stubs():
+    service = AsyncClaudeService()
+    assert vars(service).get("_client") is None
+    prewarm_clients(service, object())
+    assert vars(service)["_client"] is not None
+
+
+def test_prewarm_builds_every_lazy_client_except_loop_bound_ones():
+    omi, twilio = OMIService(), AsyncTwilioService()
+    prewarm_clients(ThreadedService(omi), twilio)
+    assert vars(omi)["_session"] is not None
+    assert vars(twilio).get("_client") is None  # built on the event loop by its own prewarm()
@@ -0,0 +1,258 @@
+"""Tests for the SQLite-backed session store"""
+import asyncio
+import threading
+from datetime import datetime
+
+import httpx
+import pytest
+
+import app.main as main
+from app.coalesce import AnalysisCoalescer
+from app.gate import build_gate
+from app.models import DateObject
+from app.store import SessionStore
+
+
+def make_store(path, **kwargs):
+    store = SessionStore(str(path), cache={}, **kwargs)
+    store.init()
+    return store
+
+
+def start_date(user):
+    user.date_counter += 1
+    date_id = f"date_{user.date_counter}"
+    user.dates[date_id] = DateObject(date_id)
+    user.current_date_id = date_id
+    return user.dates[date_id]
+
+
+def test_restart_resumes_the_active_date(tmp_path):
+    path = tmp_path / "sessions.db"
+    store = make_store(path)
+    user = store.get_or_create("u1")
+    user.code_word = "pickles"
+    user.phone_number = "+15550001111"
+    date = start_date(user)
+    date.add_transcript("", [{"text": "hi there", "speaker": "SPEAKER_00", "start": 0.0, "end": 1.0}])
+    date.add_transcript("so what do you do")
+    date.count = 2
+    date.add_warning("bro stop", "CS talk")
+    date.context.summary = "they met for coffee"
+    asyncio.run(store.flush())
+
+    restarted = make_store(path)
+    resumed = restarted.get_or_create("u1")
+    assert (resumed.code_word, resumed.phone_number, resumed.current_date_id) == ("pickles", "+15550001111", "date_1")
+    resumed_date = resumed.dates["date_1"]
+    assert resumed_date.is_active and resumed_date.count == 2
+    assert resumed_date.accumulated_transcript == "hi there so what do you do"
+    assert resumed_date.transcript.segments[0].speaker == "SPEAKER_00"
+    assert resumed_date.previous_warnings[0]["reason"] == "CS talk"
+    assert resumed_date.context.summary == "they met for coffee"
+
+    # Later flushes only append the new segments
+    resumed_date.add_transcript("I like hiking")
+    asyncio.run(restarted.flush())
+    rows = restarted.conn.execute("SELECT text FROM session_segments ORDER BY id").fetchall()
+    assert rows == [("hi there",), ("so what do you do",), ("I like hiking",)]
+
+
+def test_workers_see_each_others_flushed_changes(tmp_path):
+    path = tmp_path / "sessions.db"
+    worker_a, worker_b = make_store(path), make_store(path)
+
+    start_date(worker_a.get_or_create("shared"))
+    asyncio.run(worker_a.flush())
+
+    user_b = worker_b.get_or_create("shared")
+    assert user_b.current_date_id == "date_1"
+    user_b.dates["date_1"].finalize()
+    user_b.current_date_id = None
+    asyncio.run(worker_b.flush())
+
+    # Worker A's cached copy is stale and gets reloaded on its next access
+    user_a = worker_a.get_or_create("shared")
+    assert user_a.current_date_id is None
+    assert user_a.date_counter == 1
+
+
+def test_get_checks_and_loads_off_the_event_loop(tmp_path, monkeypatch):
+    path = tmp_path / "sessions.db"
+    worker_a, worker_b = make_store(path), make_store(path)
+    start_date(worker_b.get_or_create("shared"))
+    asyncio.run(worker_b.flush())
+
+    read_on = []
+    read = SessionStore._read
+
+    def recording_read(self, *args):
+        read_on.append(threading.get_ident())
+        return read(self, *args)
+
+    monkeypatch.setattr(SessionStore, "_read", recording_read)
+
+    async def access():
+        loaded = await worker_a.get("shared")  # not cached: loaded
+        await worker_a.flush()
+        cached = await worker_a.get("shared")  # cached and clean: version check only
+        await worker_a.get("shared")  # cached with unflushed changes: no SQLite at all
+        return threading.get_ident(), loaded, cached
+
+    loop_thread, loaded, cached = asyncio.run(access())
+    assert loaded.current_date_id == "date_1" and cached is loaded
+    assert len(read_on) == 2 and loop_thread not in read_on
+
+
+def test_dirty_users_are_written_in_one_batched_flush(tmp_path):
+    store = make_store(tmp_path / "sessions.db", flush_interval=0.01)
+
+    async def run():
+        store.start()
+        for i in range(200):
+            start_date(store.get_or_create(f"user-{i}")).add_transcript(f"batch from {i}")
+        await asyncio.sleep(0.1)
+        await store.stop()
+
+    asyncio.run(run())
+    assert store.flushes == 1
+    assert store.conn.execute("SELECT COUNT(*) FROM session_users").fetchone()[0] == 200
+    assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_finished_date_is_archived_compressed_and_dropped_from_memory(tmp_path):
+    store = make_store(tmp_path / "sessions.db")
+    user = store.get_or_create("u1")
+    date = start_date(user)
+    for n in range(50):
+        date.add_transcript(f"batch {n} about the hiking trip and the food")
+    date.add_warning("bro stop", "CS talk")
+    date.finalize()
+    user.current_date_id = None
+    asyncio.run(store.flush())
+
+    assert user.dates == {}
+    assert store.counters["dates_archived"] == 1
+    conn = store.conn
+    assert conn.execute("SELECT COUNT(*) FROM session_segments").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM session_dates").fetchone()[0] == 0
+    blob = conn.execute("SELECT data FROM session_archive").fetchone()[0]
+    assert len(blob) < len(date.accumulated_transcript) / 2
+
+    restored = store.load_date("u1", "date_1")
+    assert restored.accumulated_transcript == date.accumulated_transcript
+    assert restored.previous_warnings == date.previous_warnings
+    assert not restored.is_active and restored.end_time == date.end_time
+
+
+def test_idle_users_are_evicted_and_reloaded_lazily(tmp_path):
+    store = make_store(tmp_path / "sessions.db", idle_ttl=0.05)
+    user = store.get_or_create("idle")
+    start_date(user).add_transcript("hi there")
+    store.get_or_create("busy")
+    store.pinned = lambda uid: uid == "busy"
+    asyncio.run(store.flush())
+
+    store.get_or_create("fresh")  # dirty, never evicted before its flush
+    asyncio.run(asyncio.sleep(0.06))
+    assert store.evict() == 1
+    assert set(store.cache) == {"busy", "fresh"}
+
+    reloaded = store.get_or_create("idle")
+    assert reloaded is not user
+    assert reloaded.dates["date_1"].accumulated_transcript == "hi there"
+    assert store.counters["reloads"] == 1
+
+
+def test_least_recently_used_users_go_first_over_the_ceiling(tmp_path):
+    store = make_store(tmp_path / "sessions.db", max_users=3)
+    for n in range(5):
+        store.get_or_create(f"u{n}")
+    asyncio.run(store.flush())
+    store.get_or_create("u0")  # touched again: now most recent, but dirty
+    asyncio.run(store.flush())
+
+    assert store.evict() == 2
+    assert set(store.cache) == {"u3", "u4", "u0"}
+
+    store.memory_limit = 0
+    store.max_users = 100
+    store.evict()
+    assert store.cache == {}
+    assert store.counters["evicted_pressure"] == 5
+
+
+def test_dict_warnings_from_older_rows_still_load(tmp_path):
+    store = make_store(tmp_path / "sessions.db")
+    user = store.get_or_create("u1")
+    date = start_date(user)
+    date.add_warning("bro stop", "CS talk")
+    asyncio.run(store.flush())
+    store.conn.execute(
+        "UPDATE session_dates SET previous_warnings = ?",
+        ('[{"message": "bro stop", "reason": "CS talk", "timestamp": "2024-05-01T20:15:00"}]',)
+    )
+
+    warning = make_store(tmp_path / "sessions.db").get_or_create("u1").dates["date_1"].previous_warnings[0]
+    assert warning["message"] == "bro stop" and warning.get("reason") == "CS talk"
+    assert warning.get("count") is None and warning.get("index", "n/a") == "n/a"
+    with pytest.raises(KeyError):
+        warning["count"]
+    assert datetime.fromtimestamp(warning.timestamp) == datetime(2024, 5, 1, 20, 15)
+
+
+def test_store_flushes_on_a_second_event_loop(tmp_path):
+    store = make_store(tmp_path / "sessions.db")
+
+    async def concurrent_flushes(uid):
+        start_date(store.get_or_create(uid))
+        # Contended, so the flush lock waits on a future of the running loop
+        await asyncio.gather(store.flush(), store.flush())
+
+    asyncio.run(concurrent_flushes("u1"))
+    asyncio.run(concurrent_flushes("u2"))
+    assert store.flushes == 2
+    assert make_store(tmp_path / "sessions.db").get_or_create("u2").current_date_id == "date_1"
+
+
+def test_sync_mode_answers_after_the_analysis_warning_is_written(monkeypatch):
+    class WarningClaude:
+        async def analyze_date(self, current_text, *args, **kwargs):
+            return {"should_notify": True, "message": "maybe not politics", "reason": "politics"}
+
+        async def summarize_context(self, previous_summary, new_transcript):
+            return None
+
+    monkeypatch.setattr(main, "claude_service", WarningClaude())
+    monkeypatch.setattr(main, "analysis_gate", build_gate("off"))
+    monkeypatch.setattr(main, "analysis_coalescer", AnalysisCoalescer(main.analyze_batches, window=0))
+    monkeypatch.setattr(main.session_store, "write_mode", "sync")
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for text in ("start date", "so about the election"):
+                response = await client.post(
+                    "/livetranscript", params={"uid": "synced"}, json={"segments": [{"text": text}]}
+                )
+        return response.json()
+
+    assert asyncio.run(run())["message"] == "maybe not politics"
+    # What another worker loads once the response is out
+    other_worker = SessionStore(main.session_store.db_path, cache={})
+    user = other_worker.get_or_create("synced")
+    assert [w["reason"] for w in user.dates[user.current_date_id].previous_warnings] == ["politics"]
+
+
+def test_evicted_and_released_users_are_reported(tmp_path):
+    store = make_store(tmp_path / "sessions.db", idle_ttl=0.05)
+    evicted = []
+    store.on_evict = evicted.append
+    store.get_or_create("idle")
+    asyncio.run(store.flush())
+    asyncio.run(asyncio.sleep(0.06))
+    store.get_or_create("handed-off")
+
+    store.evict()
+    asyncio.run(store.release(["handed-off"]))
+    assert evicted == ["idle", "handed-off"]
@@ -0,0 +1,204 @@
+"""Tests for streamed conversation tips cut off at the first sentence"""
+import asyncio
+import time
+
+import httpx
+
+import app.main as main
+from app import models
+from app.actors import ActorRegistry
+from app.gate import build_gate
+from app.models import DateObject
+from app.services import AsyncClaudeService, ClaudeService, first_sentence
+from app.tips import TipPrecomputer
+from benchmarks.stubs import AsyncStubAnthropic, StubAnthropic
+
+TIP = "Ask her about the skating trip. She brought it up twice, so it clearly matters to her. Then share yours."
+
+
+def test_first_sentence_waits_for_a_complete_sentence():
+    assert first_sentence("Ask her about the") is None
+    assert first_sentence("Ask her about the trip.") is None  # might still be "trip.com"
+    assert first_sentence("Ask her about the trip. She") == "Ask her about the trip."
+    assert first_sentence('Say "no way!" and') == 'Say "no way!"'
+    assert first_sentence("Ask what she loves\nor") == "Ask what she loves"
+
+
+def test_streaming_tip_returns_the_first_sentence_and_stops_generating():
+    client = StubAnthropic(reply=TIP)
+    tip = ClaudeService(client=client).generate_conversation_tip("we talked about skating", streaming=True)
+
+    assert tip == "Ask her about the skating trip."
+    assert client.streamed_tokens < len(TIP) // 4 // 2
+
+
+def test_blocking_tip_returns_the_whole_completion():
+    client = StubAnthropic(reply=TIP)
+    assert ClaudeService(client=client).generate_conversation_tip("", streaming=False) == TIP
+
+
+def test_streaming_tip_without_a_sentence_end_returns_everything():
+    client = AsyncStubAnthropic(reply="ask about her dog")
+    tip = asyncio.run(AsyncClaudeService(client=client).generate_conversation_tip("", streaming=True))
+    assert tip == "ask about her dog"
+
+
+def test_stuck_phrase_answers_with_the_first_sentence(monkeypatch):
+    client = AsyncStubAnthropic(reply=TIP, token_latency=0.01)
+    monkeypatch.setattr(main, "claude_service", AsyncClaudeService(client=client))
+    monkeypatch.setattr(main, "analysis_gate", build_gate("off"))
+    monkeypatch.setattr(main, "session_actors", ActorRegistry(main.handle_session_message))
+    models.users.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/livetranscript", params={"uid": "u"}, json={"segments": [{"text": "start date"}]})
+            response = await client.post(
+                "/livetranscript", params={"uid": "u"}, json={"segments": [{"text": "yeah okay so"}]}
+            )
+        await main.session_actors.stop()
+        return response.json()
+
+    body = asyncio.run(run())
+    assert body["event_type"] == "conversation_tip"
+    assert body["message"] == "Ask her about the skating trip."
+
+
+class FakeTips:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+
+    async def __call__(self, uid, text):
+        self.calls.append(text)
+        await asyncio.sleep(self.latency)
+        return f"tip {len(self.calls)}"
+
+
+def talk(date, words):
+    date.add_transcript(" ".join(f"word{n}" for n in range(words)))
+
+
+def precomputer(generate, **kwargs):
+    options = dict(enabled=True, refresh_chars=300, min_interval=0, max_age=60, max_stale_chars=1000, per_hour=100)
+    options.update(kwargs)
+    return TipPrecomputer(generate, **options)
+
+
+def test_precomputed_tip_is_served_once_and_refreshed_as_the_transcript_grows():
+    generate = FakeTips()
+    tips = precomputer(generate)
+    date = DateObject("date_1")
+
+    async def run():
+        talk(date, 10)
+        tips.observe("u", date)  # too little transcript to bother
+        talk(date, 40)
+        tips.observe("u", date)
+        await asyncio.sleep(0)
+        tips.observe("u", date)  # unchanged transcript: no new generation
+        await asyncio.sleep(0.01)
+        first = tips.take("u", date)
+        second = tips.take("u", date)
+        talk(date, 5)
+        tips.observe("u", date)  # nothing cached any more: regenerate
+        await asyncio.sleep(0.01)
+        return first, second, tips.take("u", date)
+
+    assert asyncio.run(run()) == ("tip 1", None, "tip 2")
+    stats = tips.stats()
+    assert (stats["hits"], stats["misses"], stats["precomputed"]) == (2, 1, 2)
+    assert stats["hit_rate"] == 2 / 3
+
+
+def test_stale_candidates_are_not_served():
+    tips = precomputer(FakeTips(), max_age=0.01, max_stale_chars=100)
+    date = DateObject("date_1")
+
+    async def run():
+        talk(date, 50)
+        tips.observe("u", date)
+        await asyncio.sleep(0.05)
+        too_old = tips.take("u", date)
+        tips.max_age = 60
+        talk(date, 5)
+        tips.observe("u", date)
+        await asyncio.sleep(0.01)
+        talk(date, 50)
+        behind = tips.take("u", date)
+        return too_old, behind
+
+    assert asyncio.run(run()) == (None, None)
+    assert (tips.counters["stale_age"], tips.counters["stale_transcript"]) == (1, 1)
+
+
+def test_generations_are_capped_per_user():
+    generate = FakeTips()
+    tips = precomputer(generate, refresh_chars=1, per_hour=2)
+    date = DateObject("date_1")
+
+    async def run():
+        for _ in range(5):
+            talk(date, 50)
+            tips.observe("u", date)
+            await asyncio.sleep(0.01)
+        talk(date, 50)
+        tips.observe("other", date)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert len(generate.calls) == 3
+    assert tips.counters["budget_skips"] == 3
+
+
+def test_stuck_phrase_is_answered_from_the_precomputed_tip(monkeypatch):
+    generate = FakeTips()
+    tips = precomputer(generate)
+    claude = AsyncClaudeService(client=AsyncStubAnthropic(reply=TIP, latency=0.5))
+    monkeypatch.setattr(main, "claude_service", claude)
+    monkeypatch.setattr(main, "tip_precomputer", tips)
+    monkeypatch.setattr(main, "analysis_gate", build_gate("off"))
+    monkeypatch.setattr(main, "analysis_coalescer", main.AnalysisCoalescer(main.analyze_batches, window=0))
+    monkeypatch.setattr(main, "session_actors", ActorRegistry(main.handle_session_message))
+    models.users.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post(text):
+                return await client.post("/livetranscript", params={"uid": "u"}, json={"segments": [{"text": text}]})
+
+            await post("start date")
+            await post("she told me all about her figure skating competitions and the trip to Oslo " * 4)
+            await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            response = await post("yeah okay so")
+            elapsed = time.perf_counter() - start
+            stats = (await client.get("/tips")).json()
+        await main.session_actors.stop()
+        await tips.stop()
+        return response.json(), elapsed, stats
+
+    body, elapsed, stats = asyncio.run(run())
+    assert body["message"] == "tip 1"
+    assert elapsed < 0.1
+    assert stats["hits"] == 1
+
+
+def test_tip_state_goes_when_the_session_store_releases_the_user(monkeypatch):
+    tips = precomputer(FakeTips())
+    monkeypatch.setattr(main, "tip_precomputer", tips)
+    store = main.session_store
+    date = DateObject("date_1")
+
+    async def run():
+        talk(date, 50)
+        tips.observe("gone", date)
+        await asyncio.sleep(0.01)
+        store.get_or_create("gone")
+        await store.release(["gone"])
+
+    asyncio.run(run())
+    assert "gone" not in store.cache
+    assert tips.states == {}